@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# ==============================================================================
+# Sovereign Stack - ARP Sweep Engine
+# ==============================================================================
+#
+# DESCRIPTION:
+# Pure-Python ARP sweep over a raw AF_PACKET socket. A fast, optional
+# alternative to forking Nmap for IP/MAC discovery on directly attached
+# subnets (see NETWORK_SCAN_BACKEND in scan_network.py).
+#
+# WHAT IT DOES:
+# 1. Reads the MAC and IPv4 address of the outgoing interface via ioctl
+# 2. Sends ARP requests for every address of the subnet in batches
+# 3. Collects replies in a single receive loop
+# 4. Retries unanswered addresses, with a wait window derived from the
+#    response times observed so far
+#
+# DEPENDENCIES:
+#    - Python standard library only (Linux AF_PACKET sockets)
+#    - CAP_NET_RAW (root, or the NET_RAW capability of the nmap-scanner
+#      container)
+#
+# USAGE:
+#    python3 arp_sweep.py <subnet> [interface]
+#
+#    Testing on a plain Linux box with a veth pair and a network namespace:
+#      ip netns add arptest
+#      ip link add veth0 type veth peer name veth1
+#      ip link set veth1 netns arptest
+#      ip addr add 10.99.0.1/24 dev veth0 && ip link set veth0 up
+#      ip netns exec arptest ip addr add 10.99.0.2/24 dev veth1
+#      ip netns exec arptest ip link set veth1 up
+#      python3 arp_sweep.py 10.99.0.0/24 veth0
+#      ip netns del arptest
+#
+# ==============================================================================
+# Copyright (C) 2026 Henk van Hoek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses.
+# ==============================================================================
+
+import sys
+import time
+import errno
+import fcntl
+import select
+import socket
+import struct
+import ipaddress
+
+ETH_P_ARP = 0x0806
+ARP_REQUEST = 1
+ARP_REPLY = 2
+SIOCGIFADDR = 0x8915
+SIOCGIFHWADDR = 0x8927
+BROADCAST_MAC = b"\xff" * 6
+RTF_GATEWAY = 0x2
+
+# Wait window (seconds) after the last batch of a round; adapted to the
+# observed response times, but never outside these bounds.
+MIN_WINDOW = 0.05
+MAX_WINDOW = 1.0
+
+# First wait (seconds) when the transmit queue is full; doubled per attempt
+# until MAX_WINDOW, after which the address is left for the next round.
+SEND_BACKOFF = 0.005
+
+
+def _ioctl(ifname, request):
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        return fcntl.ioctl(
+            sock.fileno(), request, struct.pack("256s", ifname.encode()[:15])
+        )
+
+
+def interface_addresses(ifname):
+    """Return (mac_bytes, ipv4_string) of a network interface."""
+    mac = _ioctl(ifname, SIOCGIFHWADDR)[18:24]
+    ip = socket.inet_ntoa(_ioctl(ifname, SIOCGIFADDR)[20:24])
+    return mac, ip
+
+
+def interface_for_subnet(subnet):
+    """Pick the interface the subnet is attached to, from /proc/net/route.
+
+    Routes via a gateway (including the default route) are ignored: ARP only
+    reaches the local link, so an OSError is raised for remote subnets.
+    """
+    network = ipaddress.ip_network(subnet, strict=False)
+    best, best_len = None, -1
+    with open("/proc/net/route") as f:
+        next(f)
+        for line in f:
+            fields = line.split()
+            if int(fields[3], 16) & RTF_GATEWAY:
+                continue
+            dest = ipaddress.ip_address(struct.pack("<I", int(fields[1], 16)))
+            mask = ipaddress.ip_address(struct.pack("<I", int(fields[7], 16)))
+            route = ipaddress.ip_network(f"{dest}/{mask}", strict=False)
+            if network.subnet_of(route) and route.prefixlen > best_len:
+                best, best_len = fields[0], route.prefixlen
+    if best is None:
+        raise OSError(f"{subnet} is not directly attached")
+    return best
+
+
+def format_mac(raw):
+    return ":".join(f"{b:02X}" for b in raw)
+
+
+def build_arp_request(src_mac, src_ip, target_ip):
+    """Return a broadcast Ethernet frame with an ARP who-has request."""
+    ethernet = BROADCAST_MAC + src_mac + struct.pack("!H", ETH_P_ARP)
+    arp = struct.pack(
+        "!HHBBH6s4s6s4s",
+        1,  # hardware type: Ethernet
+        0x0800,  # protocol type: IPv4
+        6,
+        4,
+        ARP_REQUEST,
+        src_mac,
+        socket.inet_aton(src_ip),
+        b"\x00" * 6,
+        socket.inet_aton(target_ip),
+    )
+    return ethernet + arp
+
+
+def parse_arp_reply(frame):
+    """Return (ip, mac) for an ARP reply frame, or None."""
+    if len(frame) < 42 or struct.unpack("!H", frame[12:14])[0] != ETH_P_ARP:
+        return None
+    opcode = struct.unpack("!H", frame[20:22])[0]
+    if opcode != ARP_REPLY:
+        return None
+    return socket.inet_ntoa(frame[28:32]), format_mac(frame[22:28])
+
+
+def arp_sweep(subnet, interface=None, retries=2, timeout=MAX_WINDOW, batch=64):
+    """ARP-sweep a subnet and return [{"ip", "mac"}, ...].
+
+    Requests go out in batches of `batch` frames; replies are drained between
+    batches and after each round. Unanswered addresses are retried up to
+    `retries` times, waiting roughly three times the slowest response seen so
+    far (bounded by MIN_WINDOW and `timeout`).
+    """
+    interface = interface or interface_for_subnet(subnet)
+    src_mac, src_ip = interface_addresses(interface)
+    network = ipaddress.ip_network(subnet, strict=False)
+    pending = {str(ip) for ip in network.hosts()} - {src_ip}
+
+    found = {}
+    sent_at = {}
+    slowest = 0.0
+
+    def send(sock, frame):
+        """Send a frame; return False if the transmit queue stays full."""
+        backoff = SEND_BACKOFF
+        while True:
+            try:
+                sock.send(frame)
+                return True
+            except OSError as e:
+                if e.errno not in (errno.EAGAIN, errno.ENOBUFS):
+                    raise
+                if backoff > MAX_WINDOW:
+                    return False
+                # Read replies while the queue drains
+                drain(sock, time.monotonic() + backoff)
+                backoff *= 2
+
+    def drain(sock, deadline):
+        nonlocal slowest
+        while pending:
+            # A deadline in the past still polls once without blocking
+            wait = max(0.0, deadline - time.monotonic())
+            readable, _, _ = select.select([sock], [], [], wait)
+            if not readable:
+                return
+            while True:
+                try:
+                    frame = sock.recv(2048)
+                except BlockingIOError:
+                    break
+                reply = parse_arp_reply(frame)
+                if reply is None or reply[0] not in pending:
+                    continue
+                ip, mac = reply
+                pending.discard(ip)
+                found[ip] = mac
+                slowest = max(slowest, time.monotonic() - sent_at.get(ip, 0))
+            if time.monotonic() >= deadline:
+                return
+
+    with socket.socket(
+        socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ARP)
+    ) as sock:
+        sock.bind((interface, ETH_P_ARP))
+        sock.setblocking(False)
+
+        for _ in range(retries + 1):
+            targets = sorted(pending, key=lambda a: ipaddress.ip_address(a))
+            for i in range(0, len(targets), batch):
+                for ip in targets[i : i + batch]:  # noqa: E203
+                    sent_at[ip] = time.monotonic()
+                    if not send(sock, build_arp_request(src_mac, src_ip, ip)):
+                        break  # unsent addresses stay pending for the next round
+                drain(sock, time.monotonic())
+
+            window = min(timeout, max(MIN_WINDOW, 3 * slowest)) if found else timeout
+            drain(sock, time.monotonic() + window)
+            if not pending:
+                break
+
+    return [
+        {"ip": ip, "mac": found[ip]}
+        for ip in sorted(found, key=lambda a: ipaddress.ip_address(a))
+    ]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit(f"Usage: {sys.argv[0]} <subnet> [interface]")
+    started = time.monotonic()
+    devices = arp_sweep(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+    for device in devices:
+        print(f"{device['ip']:<16} {device['mac']}")
+    print(f"{len(devices)} devices in {time.monotonic() - started:.2f}s")
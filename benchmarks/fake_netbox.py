@@ -0,0 +1,290 @@
+# ==============================================================================
+# Sovereign Stack - Benchmark: Fake NetBox REST Server
+# ==============================================================================
+#
+# DESCRIPTION:
+# In-memory stand-in for the NetBox REST API, good enough for pynetbox and
+# the Sovereign Stack sync scripts: list/filter with pagination, get by id,
+# single and bulk create/update, delete. Every request can be delayed to
+# simulate a remote (or overloaded) NetBox.
+#
+# WHAT IT DOES:
+# 1. Keeps objects per API path (e.g. "virtualization/virtual-machines")
+# 2. Supports the filters the scripts use: exact match (case-insensitive),
+#    <fk>_id, __n, __isw, and parent=<prefix> for IP addresses
+# 3. Renders foreign keys, assigned objects and choice fields as nested
+#    objects, like NetBox
+# 4. Counts requests per method and path
+#
+# USAGE:
+#    from fake_netbox import FakeNetBox
+#    netbox = FakeNetBox(latency=0.01).start()
+#    ... point NETBOX_URL at netbox.url ...
+#    netbox.stop()
+#
+# ==============================================================================
+# Copyright (C) 2026 Henk van Hoek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses.
+# ==============================================================================
+
+import json
+import time
+import threading
+import ipaddress
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+NETBOX_VERSION = "4.2.0"
+
+# Fields rendered as nested objects, with the API path they point to
+FK_FIELDS = {
+    "cluster": "virtualization/clusters",
+    "type": "virtualization/cluster-types",
+    "site": "dcim/sites",
+    "role": "dcim/device-roles",
+    "device_type": "dcim/device-types",
+    "manufacturer": "dcim/manufacturers",
+    "device": "dcim/devices",
+    "virtual_machine": "virtualization/virtual-machines",
+    "primary_ip4": "ipam/ip-addresses",
+}
+CHOICE_FIELDS = {"status", "kind"}
+# Generic foreign keys (assigned_object_type) and the API path they point to
+OBJECT_TYPES = {
+    "dcim.interface": "dcim/interfaces",
+    "virtualization.vminterface": "virtualization/interfaces",
+}
+IGNORED_PARAMS = {"limit", "offset", "brief", "exclude", "q"}
+
+
+class FakeNetBox:
+    """Threaded HTTP server holding an in-memory NetBox."""
+
+    def __init__(self, latency=0.0, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.tables = {}
+        self.requests = Counter()
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _handler_for(self))
+        self._server.daemon_threads = True
+        self.url = f"http://{host}:{self._server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(
+            target=self._server.serve_forever, name="fake-netbox", daemon=True
+        ).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def table(self, path):
+        return self.tables.setdefault(path, {})
+
+    def add(self, path, **fields):
+        """Insert an object directly (e.g. to seed devices); return its id."""
+        with self._lock:
+            return self._insert(path, fields)["id"]
+
+    def _insert(self, path, fields):
+        obj = dict(fields, id=self._next_id)
+        self._next_id += 1
+        self.table(path)[obj["id"]] = obj
+        return obj
+
+    def request_counts(self):
+        """Return {method: count} of the requests served so far."""
+        counts = Counter()
+        for (method, _), count in self.requests.items():
+            counts[method] += count
+        return dict(counts)
+
+    # --- Rendering and filtering ---
+
+    def render(self, path, obj):
+        out = {
+            "id": obj["id"],
+            "url": f"{self.url}/api/{path}/{obj['id']}/",
+            "display": obj.get("name") or obj.get("address") or str(obj["id"]),
+        }
+        for key, value in obj.items():
+            if key in FK_FIELDS and value is not None:
+                ref = self.table(FK_FIELDS[key]).get(value, {})
+                out[key] = {
+                    "id": value,
+                    "url": f"{self.url}/api/{FK_FIELDS[key]}/{value}/",
+                    "name": ref.get("name"),
+                    "display": ref.get("name") or str(value),
+                }
+            elif key in CHOICE_FIELDS and value is not None:
+                out[key] = {"value": value, "label": str(value).title()}
+            else:
+                out[key] = value
+        ref_path = OBJECT_TYPES.get(obj.get("assigned_object_type"))
+        ref = self.table(ref_path).get(obj.get("assigned_object_id"))
+        if ref_path and ref:
+            out["assigned_object"] = self.render(ref_path, ref)
+        out.setdefault("custom_fields", {})
+        return out
+
+    def matches(self, obj, query):
+        for key, values in query.items():
+            if key in IGNORED_PARAMS:
+                continue
+            field, _, op = key.partition("__")
+            if field.endswith("_id") and field[:-3] in FK_FIELDS:
+                field = field[:-3]
+            if field == "parent":
+                address = obj.get("address")
+                if not address or not any(
+                    ipaddress.ip_interface(address).ip
+                    in ipaddress.ip_network(v, strict=False)
+                    for v in values
+                ):
+                    return False
+                continue
+
+            value = obj.get(field)
+            if field == "cluster" and "virtual_machine" in obj:
+                # VM interfaces are filtered by the cluster of their VM
+                vm = self.table("virtualization/virtual-machines").get(
+                    obj["virtual_machine"], {}
+                )
+                value = vm.get("cluster")
+            if op == "isw":
+                if not str(value or "").startswith(values[0]):
+                    return False
+            elif op == "n":
+                if str(value) in values:
+                    return False
+            elif str(value).upper() not in [v.upper() for v in values]:
+                return False
+        return True
+
+    def handle(self, method, raw_path, body):
+        """Return (status, response body) for one API request."""
+        if self.latency:
+            time.sleep(self.latency)
+        parts = urlsplit(raw_path)
+        segments = [s for s in parts.path.split("/") if s][1:]  # drop "api"
+        obj_id = int(segments.pop()) if segments and segments[-1].isdigit() else None
+        path = "/".join(segments)
+        query = parse_qs(parts.query)
+
+        with self._lock:
+            self.requests[(method, path)] += 1
+            if path == "status":
+                return 200, {"netbox-version": NETBOX_VERSION}
+            if path == "":
+                return 200, {}
+            table = self.table(path)
+
+            if method == "GET":
+                if obj_id is not None:
+                    if obj_id not in table:
+                        return 404, {"detail": "Not found."}
+                    return 200, self.render(path, table[obj_id])
+                return 200, self._list(path, table, query)
+
+            if method == "POST":
+                items = body if isinstance(body, list) else [body]
+                created = [self.render(path, self._insert(path, i)) for i in items]
+                return 201, created if isinstance(body, list) else created[0]
+
+            if method == "PATCH":
+                items = body if isinstance(body, list) else [body]
+                updated = []
+                for item in items:
+                    obj = table.get(item.get("id", obj_id))
+                    if obj is None:
+                        return 404, {"detail": "Not found."}
+                    for key, value in item.items():
+                        if key == "custom_fields":
+                            obj.setdefault("custom_fields", {}).update(value)
+                        elif key != "id":
+                            obj[key] = value
+                    updated.append(self.render(path, obj))
+                return 200, updated if isinstance(body, list) else updated[0]
+
+            if method == "DELETE":
+                items = body if isinstance(body, list) else [{"id": obj_id}]
+                for item in items:
+                    table.pop(item.get("id"), None)
+                return 204, None
+        return 405, {"detail": "Method not allowed."}
+
+    def _list(self, path, table, query):
+        items = [o for o in table.values() if self.matches(o, query)]
+        limit = int(query.get("limit", ["50"])[0]) or 1000
+        offset = int(query.get("offset", ["0"])[0])
+        next_url = None
+        if offset + limit < len(items):
+            params = "".join(
+                f"&{k}={v}"
+                for k, values in query.items()
+                if k not in ("limit", "offset")
+                for v in values
+            )
+            next_url = (
+                f"{self.url}/api/{path}/?limit={limit}&offset={offset + limit}{params}"
+            )
+        return {
+            "count": len(items),
+            "next": next_url,
+            "previous": None,
+            "results": [
+                self.render(path, o) for o in items[offset : offset + limit]  # noqa
+            ],
+        }
+
+
+def _handler_for(netbox):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body are separate writes; with Nagle on, keep-alive
+        # requests would wait ~40ms for the client's delayed ACK
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _dispatch(self, method):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"null")
+            status, payload = netbox.handle(method, self.path, body)
+            data = b"" if payload is None else json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("API-Version", NETBOX_VERSION.rsplit(".", 1)[0])
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            self._dispatch("GET")
+
+        def do_POST(self):
+            self._dispatch("POST")
+
+        def do_PATCH(self):
+            self._dispatch("PATCH")
+
+        def do_DELETE(self):
+            self._dispatch("DELETE")
+
+    return Handler
@@ -0,0 +1,316 @@
+# ==============================================================================
+# Sovereign Stack - Benchmark: Fake SSH Hosts
+# ==============================================================================
+#
+# DESCRIPTION:
+# A paramiko SSH server that impersonates any number of scan targets. Every
+# loopback address (127.x.y.z) is a separate host with its own synthetic
+# VirtualBox VMs, Docker containers and disks, so infra_scanner.py can be
+# benchmarked without real Pis.
+#
+# WHAT IT DOES:
+# 1. Accepts SSH connections on one port for all loopback addresses; the
+#    address that was connected to selects the synthetic host
+# 2. Answers the commands infra_scanner.py sends (vboxmanage, docker ps,
+#    df, wmic) as well as the collector and resource sampler payloads;
+#    anything else (e.g. the Docker API bridge) fails as "command not found"
+# 3. Optionally delays every command to simulate slow hosts
+# 4. Counts connections and commands
+#
+# DEPENDENCIES:
+#    - paramiko
+#
+# USAGE:
+#    from fake_ssh import FakeSSHServer
+#    server = FakeSSHServer(vms=2, containers=5).start()
+#    ... scan hosts 127.1.0.1, 127.1.0.2, ... with "ssh_port": server.port ...
+#    server.stop()
+#
+# ==============================================================================
+# Copyright (C) 2026 Henk van Hoek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses.
+# ==============================================================================
+
+import json
+import time
+import socket
+import shlex
+import logging
+import threading
+import ipaddress
+from collections import Counter
+
+import paramiko
+
+logger = logging.getLogger("FakeSSH")
+
+SECTION = "@@SOVEREIGN-SECTION@@"
+
+# Seconds to wait for the client to close a finished command's channel
+CLOSE_TIMEOUT = 30
+
+
+def host_address(index):
+    """Loopback address of the n-th synthetic host (0-based)."""
+    return f"127.1.{index // 250}.{index % 250 + 1}"
+
+
+class SyntheticHost:
+    """Deterministic remote facts of one fake host."""
+
+    def __init__(self, ip, vms, containers, windows=False):
+        self.ip = ip
+        self.windows = windows
+        self.tag = ip.replace(".", "-")
+        self.index = int(ipaddress.ip_address(ip)) & 0xFFFF
+        self.vms = [f"vm-{self.tag}-{i}" for i in range(vms)]
+        self.containers = [f"ct-{self.tag}-{i}" for i in range(containers)]
+
+    def list_vms(self):
+        return "".join(
+            f'"{name}" {{00000000-0000-0000-{self.index:04x}-{i:012x}}}\n'
+            for i, name in enumerate(self.vms)
+        )
+
+    def vm_info(self, name):
+        i = self.vms.index(name)
+        return (
+            f'name="{name}"\nmemory={1024 * (1 + i % 4)}\ncpus={1 + i % 2}\n'
+            f'"SATA-ImageUUID-0-0"="d15c0000-0000-0000-{self.index:04x}-{i:012x}"\n'
+        )
+
+    def medium_info(self, uuid):
+        capacity = 20480 + 1024 * (int(uuid[-4:], 16) % 8)
+        return f"UUID: {uuid}\nCapacity: {capacity} MBytes\n"
+
+    def guest_ip(self, name):
+        i = self.vms.index(name)
+        return f"Value: 10.{self.index // 256}.{self.index % 256}.{10 + i}\n"
+
+    def docker_ps(self):
+        return "".join(
+            json.dumps(
+                {
+                    "name": name,
+                    "image": f"example/app{i % 7}:1.{i % 3}",
+                    "created": "2026-01-01 12:00:00 +0000 UTC",
+                    "ports": f"0.0.0.0:{8000 + i}->80/tcp",
+                }
+            )
+            + "\n"
+            for i, name in enumerate(self.containers)
+        )
+
+    def df(self):
+        used = 20 + self.index % 50
+        return (
+            f"/dev/sda1 100G {used}G {100 - used}G {used}% /\n"
+            f"/dev/sdb1 1000G 400G 600G 40% /mnt/data\n"
+        )
+
+    def wmic(self):
+        free = (80 - self.index % 50) * 1024**3
+        return "Caption  FreeSpace     Size\r\n" f"C:       {free}  {100 * 1024**3}\r\n"
+
+    def docker_stats(self):
+        return "".join(
+            json.dumps(
+                {
+                    "Name": name,
+                    "CPUPerc": f"{(i * 7) % 100}.00%",
+                    "MemUsage": f"{64 + i}MiB / 1GiB",
+                    "NetIO": f"{i}MB / 1MB",
+                    "BlockIO": f"{i}MB / 0B",
+                }
+            )
+            + "\n"
+            for i, name in enumerate(self.containers)
+        )
+
+    def collector(self, skip_docker=False):
+        """Framed output of infra_scanner's COLLECTOR_SH payload."""
+        out = ["@@SOVEREIGN-COLLECT-BEGIN@@", f"{SECTION} vms", self.list_vms()]
+        for name in self.vms:
+            out += [f"{SECTION} vminfo {name}", self.vm_info(name)]
+            uuid = self.vm_info(name).split('ImageUUID-0-0"="')[1].split('"')[0]
+            out += [f"{SECTION} medium {name}", self.medium_info(uuid)]
+            out += [f"{SECTION} guestip {name}", self.guest_ip(name)]
+        if not skip_docker:
+            out += [f"{SECTION} docker", self.docker_ps()]
+        out += [f"{SECTION} df", self.df(), "@@SOVEREIGN-COLLECT-END@@"]
+        return "\n".join(out) + "\n"
+
+    def sample(self):
+        """Output of resource_sampler's SAMPLE_SH payload."""
+        return (
+            f"{SECTION} loadavg\n0.{self.index % 100:02d} 0.50 0.40 1/200 1234\n"
+            f"{SECTION} docker\n{self.docker_stats()}"
+        )
+
+    def respond(self, command, stdin=""):
+        """Return (stdout, exit status) for a command."""
+        if command.endswith("sh -s"):
+            if "@@SOVEREIGN-COLLECT-BEGIN@@" in stdin:
+                return self.collector("SOVEREIGN_SKIP_DOCKER=1" in command), 0
+            if "frame loadavg" in stdin:
+                return self.sample(), 0
+            return "", 0
+        if command == "true" or "vboxmanage metrics setup" in command:
+            return "", 0
+        if command.startswith("docker ps"):
+            return self.docker_ps(), 0
+        if command.startswith("df ") and not self.windows:
+            return self.df(), 0
+        if command.startswith("wmic logicaldisk") and self.windows:
+            return self.wmic(), 0
+        if command.startswith("vboxmanage"):
+            args = shlex.split(command)[1:]
+            if args[:2] == ["list", "vms"]:
+                return self.list_vms(), 0
+            if args[0] == "showvminfo" and args[1] in self.vms:
+                return self.vm_info(args[1]), 0
+            if args[0] == "showmediuminfo":
+                return self.medium_info(args[-1]), 0
+            if args[:2] == ["guestproperty", "get"] and args[2] in self.vms:
+                return self.guest_ip(args[2]), 0
+            return "", 1
+        return "", 127  # command not found (e.g. the Docker API bridge)
+
+
+class _Server(paramiko.ServerInterface):
+    def __init__(self, fake, host):
+        self.fake = fake
+        self.host = host
+
+    def check_auth_password(self, username, password):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_exec_request(self, channel, command):
+        threading.Thread(
+            target=self.fake._execute,
+            args=(self.host, channel, command.decode()),
+            daemon=True,
+        ).start()
+        return True
+
+
+class FakeSSHServer:
+    """One listening socket serving all synthetic hosts on 127.0.0.0/8."""
+
+    def __init__(self, vms=2, containers=5, latency=0.0, port=0, windows=0):
+        self.vms = vms
+        self.containers = containers
+        # The first `windows` hosts answer wmic instead of df
+        self.windows = {host_address(i) for i in range(windows)}
+        self.latency = latency
+        self.host_key = paramiko.RSAKey.generate(2048)
+        self.stats = Counter()
+        self._hosts = {}
+        self._lock = threading.Lock()
+        self._transports = []
+        # Bound to all addresses so every 127.x.y.z is reachable; anything
+        # that is not loopback is rejected in _accept().
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(("0.0.0.0", port))
+        self._sock.listen(512)
+        self.port = self._sock.getsockname()[1]
+        self._stopped = threading.Event()
+
+    def host(self, ip):
+        with self._lock:
+            if ip not in self._hosts:
+                self._hosts[ip] = SyntheticHost(
+                    ip, self.vms, self.containers, ip in self.windows
+                )
+            return self._hosts[ip]
+
+    def start(self):
+        threading.Thread(target=self._accept, name="fake-ssh", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._sock.close()
+        with self._lock:
+            transports, self._transports = self._transports, []
+        for transport in transports:
+            transport.close()
+
+    def _accept(self):
+        while not self._stopped.is_set():
+            try:
+                conn, peer = self._sock.accept()
+            except OSError:
+                return
+            if not ipaddress.ip_address(peer[0]).is_loopback:
+                conn.close()
+                continue
+            # start_server() blocks until the key exchange is done
+            threading.Thread(target=self._serve, args=(conn, peer), daemon=True).start()
+
+    def _serve(self, conn, peer):
+        transport = paramiko.Transport(conn)
+        transport.add_server_key(self.host_key)
+        try:
+            transport.start_server(
+                server=_Server(self, self.host(conn.getsockname()[0]))
+            )
+        except (paramiko.SSHException, EOFError) as e:
+            logger.debug(f"Handshake with {peer} failed: {e}")
+            return
+        with self._lock:
+            self.stats["connections"] += 1
+            self._transports.append(transport)
+
+    def _execute(self, host, channel, command):
+        try:
+            stdin = ""
+            if command.endswith("sh -s"):
+                chunks = []
+                while True:
+                    data = channel.recv(65536)
+                    if not data:
+                        break
+                    chunks.append(data)
+                stdin = b"".join(chunks).decode(errors="replace")
+            if self.latency:
+                time.sleep(self.latency)
+            output, status = host.respond(command, stdin)
+            with self._lock:
+                self.stats["commands"] += 1
+            channel.sendall(output.encode())
+            channel.send_exit_status(status)
+            channel.shutdown_write()
+            if not stdin:
+                # The exec request is acknowledged only after it was
+                # dispatched here; closing first would make the client fail
+                # with "Channel closed". Wait for the client to hang up.
+                channel.settimeout(CLOSE_TIMEOUT)
+                while channel.recv(65536):
+                    pass
+        except (OSError, EOFError, paramiko.SSHException) as e:
+            # socket.timeout is an OSError: the client never closed
+            logger.debug(f"Command on {host.ip} failed: {e}")
+        finally:
+            channel.close()
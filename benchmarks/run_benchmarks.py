@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+# ==============================================================================
+# Sovereign Stack - Offline Benchmark Runner
+# ==============================================================================
+#
+# DESCRIPTION:
+# Times infra_scanner.py and scan_network.py end-to-end against fake
+# infrastructure, so performance can be measured (and regressions caught)
+# without real Pis, a NAS or a live NetBox.
+#
+# WHAT IT DOES:
+# 1. Starts a fake NetBox (fake_netbox.py) with configurable latency and a
+#    fake SSH server (fake_ssh.py) where every loopback address is a host
+# 2. Writes a temporary inventory.json/credentials.json for N hosts and runs
+#    infra_scanner.py twice: "cold" (empty NetBox and state) and "warm"
+#    (nothing changed since the cold run)
+# 3. Runs scan_network.py twice with the fake nmap (bin/nmap) on PATH,
+#    N devices spread over /24 subnets, half of them known in NetBox
+# 4. Prints wall time, NetBox requests and SSH connections/commands per run
+#    and optionally compares them with a saved baseline
+#
+# DEPENDENCIES:
+#    - The scanners' own dependencies (pynetbox, paramiko, python-dotenv)
+#
+# USAGE:
+#    python3 benchmarks/run_benchmarks.py                  # 10, 100, 1000 hosts
+#    python3 benchmarks/run_benchmarks.py --hosts 10 100 --netbox-latency 0.02
+#    python3 benchmarks/run_benchmarks.py --output baseline.json
+#    python3 benchmarks/run_benchmarks.py --baseline baseline.json
+#
+#    Scanner settings (SCAN_WORKERS, SCAN_COLLECTOR, ...) are taken from the
+#    environment, e.g. SCAN_COLLECTOR=true python3 benchmarks/run_benchmarks.py
+#    NetBox API throttling is off unless --netbox-rate is given, so the runs
+#    measure the scripts rather than the token bucket.
+#
+# OUTPUT:
+#    - Result table on stdout, optional JSON file (--output)
+#    - Exit code 1 when a run failed or is slower than the baseline allows
+#
+# ==============================================================================
+# Copyright (C) 2026 Henk van Hoek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses.
+# ==============================================================================
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import resource
+import tempfile
+import ipaddress
+import subprocess
+from collections import Counter
+
+from fake_netbox import FakeNetBox
+from fake_ssh import FakeSSHServer, host_address
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+FAKE_TOKEN = "0123456789abcdef0123456789abcdef01234567"
+HOSTS_PER_SUBNET = 250
+
+
+def raise_fd_limit():
+    """Every scanned host keeps an SSH connection open until the run ends."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def fake_mac(ip):
+    """Same MAC the fake nmap reports for an address."""
+    return "02:00:" + ":".join(f"{b:02X}" for b in ipaddress.ip_address(ip).packed)
+
+
+def run_script(script, env, workdir, log_name, timeout):
+    """Run a repo script in `workdir`; return (seconds, return code, log)."""
+    log_path = os.path.join(workdir, f"{log_name}.log")
+    started = time.perf_counter()
+    with open(log_path, "w") as log:
+        try:
+            proc = subprocess.run(
+                [sys.executable, os.path.join(REPO_ROOT, script)],
+                cwd=workdir,
+                env=env,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                timeout=timeout,
+            )
+            returncode = proc.returncode
+        except subprocess.TimeoutExpired:
+            returncode = "timeout"
+    return time.perf_counter() - started, returncode, log_path
+
+
+def measure(target, hosts, run, script, env, workdir, netbox, ssh, timeout):
+    """Run a script once and return its result record."""
+    requests_before = Counter(netbox.request_counts())
+    ssh_before = Counter(ssh.stats) if ssh else Counter()
+    seconds, returncode, log_path = run_script(
+        script, env, workdir, f"{target}-{hosts}-{run}", timeout
+    )
+    requests = Counter(netbox.request_counts()) - requests_before
+    ssh_stats = (Counter(ssh.stats) - ssh_before) if ssh else Counter()
+    return {
+        "target": target,
+        "hosts": hosts,
+        "run": run,
+        "seconds": round(seconds, 3),
+        "ok": returncode == 0,
+        "log": log_path,
+        "netbox_requests": dict(requests),
+        "ssh_connections": ssh_stats["connections"],
+        "ssh_commands": ssh_stats["commands"],
+    }
+
+
+def bench_infra_scanner(hosts, args, workdir):
+    netbox = FakeNetBox(latency=args.netbox_latency).start()
+    ssh = FakeSSHServer(
+        vms=args.vms,
+        containers=args.containers,
+        latency=args.ssh_latency,
+        windows=args.windows,
+    ).start()
+    try:
+        inventory = {
+            "hosts": [
+                {
+                    "name": f"bench-{i:04d}",
+                    "ip": host_address(i),
+                    "ssh_port": ssh.port,
+                    "probe": args.probe,
+                    "type": "windows" if i < args.windows else "linux",
+                }
+                for i in range(hosts)
+            ]
+        }
+        credentials = {"default": {"ssh_user": "bench", "ssh_pass": "bench"}}
+        with open(os.path.join(workdir, "inventory.json"), "w") as f:
+            json.dump(inventory, f)
+        with open(os.path.join(workdir, "credentials.json"), "w") as f:
+            json.dump(credentials, f)
+
+        env = dict(
+            os.environ,
+            NETBOX_URL=netbox.url,
+            NETBOX_API_TOKEN=FAKE_TOKEN,
+            NETBOX_RATE_LIMIT=str(args.netbox_rate),
+            NETBOX_MAX_CONCURRENCY=str(args.netbox_concurrency),
+            SCAN_STATE_FILE=os.path.join(workdir, "state", "scan_state.json"),
+            DISK_HISTORY_FILE=os.path.join(workdir, "state", "disk_history.sqlite"),
+            METRICS_TEXTFILE="",
+            SCAN_TRACE_FILE="",
+        )
+        return [
+            measure(
+                "infra_scanner",
+                hosts,
+                run,
+                "infra_scanner.py",
+                env,
+                workdir,
+                netbox,
+                ssh,
+                args.timeout,
+            )
+            for run in ("cold", "warm")
+        ]
+    finally:
+        ssh.stop()
+        netbox.stop()
+
+
+def bench_scan_network(hosts, args, workdir):
+    subnet_count = -(-hosts // HOSTS_PER_SUBNET)
+    per_subnet = -(-hosts // subnet_count)
+    subnets = [f"10.77.{k}.0/24" for k in range(subnet_count)]
+
+    netbox = FakeNetBox(latency=args.netbox_latency).start()
+    try:
+        # Half of the devices are already documented with their MAC address
+        for subnet in subnets:
+            network = ipaddress.ip_network(subnet)
+            for i, ip in enumerate(list(network.hosts())[:per_subnet]):
+                if i % 2:
+                    continue
+                device_id = netbox.add("dcim/devices", name=f"dev-{ip}")
+                interface_id = netbox.add(
+                    "dcim/interfaces",
+                    name="eth0",
+                    device=device_id,
+                    mac_address=fake_mac(ip),
+                )
+                netbox.add(
+                    "dcim/mac-addresses",
+                    mac_address=fake_mac(ip),
+                    assigned_object_type="dcim.interface",
+                    assigned_object_id=interface_id,
+                )
+
+        env = dict(
+            os.environ,
+            PATH=os.path.join(BENCH_DIR, "bin") + os.pathsep + os.environ["PATH"],
+            NETBOX_URL=netbox.url,
+            NETBOX_API_TOKEN=FAKE_TOKEN,
+            NETBOX_RATE_LIMIT=str(args.netbox_rate),
+            NETBOX_MAX_CONCURRENCY=str(args.netbox_concurrency),
+            NETWORK_SCAN_SUBNETS=",".join(subnets),
+            NETWORK_SCAN_BACKEND="nmap",
+            FAKE_NMAP_HOSTS=str(per_subnet),
+            FAKE_NMAP_DELAY=str(args.nmap_delay),
+        )
+        return [
+            measure(
+                "scan_network",
+                hosts,
+                run,
+                "scan_network.py",
+                env,
+                workdir,
+                netbox,
+                None,
+                args.timeout,
+            )
+            for run in ("cold", "warm")
+        ]
+    finally:
+        netbox.stop()
+
+
+BENCHMARKS = {"infra_scanner": bench_infra_scanner, "scan_network": bench_scan_network}
+
+
+def print_table(results):
+    print(
+        f"{'Target':<14} {'Hosts':>6} {'Run':<5} {'Seconds':>9} "
+        f"{'NetBox GET/POST/PATCH':>22} {'SSH conn/cmds':>14}  Status"
+    )
+    print("-" * 86)
+    for r in results:
+        req = r["netbox_requests"]
+        netbox_col = f"{req.get('GET', 0)}/{req.get('POST', 0)}/{req.get('PATCH', 0)}"
+        ssh_col = (
+            f"{r['ssh_connections']}/{r['ssh_commands']}"
+            if r["target"] == "infra_scanner"
+            else "-"
+        )
+        status = "ok" if r["ok"] else f"FAILED (see {r['log']})"
+        print(
+            f"{r['target']:<14} {r['hosts']:>6} {r['run']:<5} {r['seconds']:>9.2f} "
+            f"{netbox_col:>22} {ssh_col:>14}  {status}"
+        )
+
+
+def compare(results, baseline_path, tolerance):
+    """Return the runs that are slower than the baseline plus tolerance."""
+    with open(baseline_path) as f:
+        baseline = {
+            (r["target"], r["hosts"], r["run"]): r for r in json.load(f)["results"]
+        }
+    regressions = []
+    for r in results:
+        old = baseline.get((r["target"], r["hosts"], r["run"]))
+        if old and r["seconds"] > old["seconds"] * (1 + tolerance):
+            regressions.append((r, old))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sovereign Stack benchmarks")
+    parser.add_argument("--hosts", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument(
+        "--targets", nargs="+", choices=sorted(BENCHMARKS), default=sorted(BENCHMARKS)
+    )
+    parser.add_argument("--vms", type=int, default=2, help="VMs per host")
+    parser.add_argument("--containers", type=int, default=5, help="per host")
+    parser.add_argument(
+        "--windows", type=int, default=0, help="hosts scanned as Windows (wmic)"
+    )
+    parser.add_argument("--ssh-latency", type=float, default=0.0)
+    parser.add_argument("--netbox-latency", type=float, default=0.0)
+    parser.add_argument("--nmap-delay", type=float, default=0.001)
+    parser.add_argument(
+        "--netbox-rate",
+        type=float,
+        default=0,
+        help="NETBOX_RATE_LIMIT for the scripts (default: 0 = unthrottled)",
+    )
+    parser.add_argument(
+        "--netbox-concurrency",
+        type=int,
+        default=4,
+        help="NETBOX_MAX_CONCURRENCY for the scripts (default: 4)",
+    )
+    parser.add_argument(
+        "--probe", action="store_true", help="include HTTP service probing"
+    )
+    parser.add_argument("--timeout", type=float, default=1800)
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="compare with a previous --output file")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="allowed slowdown against the baseline (default: 0.2 = 20%%)",
+    )
+    parser.add_argument("--keep", action="store_true", help="keep the work dirs")
+    args = parser.parse_args(argv)
+
+    # A scanner process can exit before the server side of a closed SSH
+    # connection has shut down, which paramiko logs as "Socket exception:
+    # Connection reset by peer" without any effect on the results
+    logging.getLogger("paramiko").setLevel(logging.CRITICAL)
+    raise_fd_limit()
+    results = []
+    for hosts in args.hosts:
+        for target in args.targets:
+            workdir = tempfile.mkdtemp(prefix=f"sovereign-bench-{target}-{hosts}-")
+            print(f"Running {target} with {hosts} hosts...", flush=True)
+            runs = BENCHMARKS[target](hosts, args, workdir)
+            results.extend(runs)
+            if not args.keep and all(r["ok"] for r in runs):
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    print()
+    rate = f"{args.netbox_rate:g} req/s" if args.netbox_rate else "unthrottled"
+    print(
+        f"NetBox API: {rate}, {args.netbox_concurrency} request(s) in flight, "
+        f"{args.netbox_latency * 1000:g} ms latency"
+    )
+    print_table(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "created": time.time(),
+                    "netbox_rate": args.netbox_rate,
+                    "netbox_concurrency": args.netbox_concurrency,
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+    failed = not all(r["ok"] for r in results)
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        for r, old in regressions:
+            print(
+                f"REGRESSION: {r['target']} {r['hosts']} hosts ({r['run']}): "
+                f"{r['seconds']:.2f}s vs. {old['seconds']:.2f}s"
+            )
+        failed = failed or bool(regressions)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,17 +5,20 @@
 #
 # DESCRIPTION:
 # Renames placeholder devices in NetBox based on discovered hostnames.
-# Reads from nmap_flat.txt (format: hostname;ip;mac) and updates
-# devices with temporary names to their discovered hostnames.
+# Reads Nmap XML output or nmap_flat.txt (format: hostname;ip;mac) and
+# updates devices with temporary names to their discovered hostnames.
 #
 # WHAT IT DOES:
-# 1. Reads nmap_flat.txt for hostname/ip/mac mappings
-# 2. Finds devices with temporary names (New-Device-XXXX)
-# 3. Updates device names to discovered hostnames
+# 1. Reads the hostname/ip/mac mappings
+# 2. Prefetches all devices and the IPs of the scanned subnets
+# 3. Plans the renames of devices with temporary names (New-Device-XXXX)
+#    to discovered hostnames, handling duplicates by appending MAC suffix
 # 4. Assigns primary IP addresses where missing
-# 5. Handles duplicates by appending MAC suffix
+# 5. Prints the plan and applies it as bulk PATCH requests
+#    (skipped with --dry-run)
 #
 # INPUT:
+#    Nmap XML (nmap -sn -PR -oX scan.xml ...), or
 #    nmap_flat.txt - Semicolon-separated: hostname;ip;mac
 #
 # DEPENDENCIES:
@@ -31,13 +34,14 @@
 #
 # USAGE:
 #    # 1. Run nmap scan first
-#    nmap -sn -PR 192.168.178.0/24 > nmap_flat.txt
+#    nmap -sn -PR -oX scan.xml 192.168.178.0/24
 #
-#    # 2. Format the output
-#    # (manual step to create hostname;ip;mac format)
+#    # 2. Review the plan, then run the renamer
+#    python3 bulk_rename_from_nmap.py scan.xml --dry-run
+#    python3 bulk_rename_from_nmap.py scan.xml
 #
-#    # 3. Run the renamer
-#    ./run_task.sh bulk_rename_from_nmap.py
+#    # Without arguments (e.g. via ./run_task.sh) nmap_flat.txt is read,
+#    # which may hold either format
 #
 # ==============================================================================
 # Copyright (C) 2026 Henk van Hoek
@@ -57,71 +61,168 @@
 # ==============================================================================
 
 import os
-import pynetbox
+import argparse
+import ipaddress
+import xml.etree.ElementTree as ET
+
 from dotenv import load_dotenv
 
+from netbox_sync import BulkWriter, SyncStats, connect
+from scan_network import parse_nmap_host
 
-def main():
-    load_dotenv()
-    nb = pynetbox.api(
-        os.getenv("NETBOX_URL").strip().rstrip("/"),
-        token=os.getenv("NETBOX_API_TOKEN").strip(),
-    )
 
-    file_path = "nmap_flat.txt"
-    print("--- Starting Unique Device Rename ---")
+def short_mac(mac):
+    return mac.replace(":", "").replace("-", "").replace(".", "").upper()[-4:]
 
-    # Keep track of used names in this run to avoid duplicates
-    used_names = []
 
+def read_flat_file(file_path):
+    """Read hostname;ip;mac lines into [{"hostname", "ip", "mac"}]."""
+    entries = []
     with open(file_path, "r", encoding="utf-8") as f:
         for line in f:
             line = line.strip()
             if not line or ";" not in line:
                 continue
-
             hostname, ip, mac = line.split(";")
-            short_mac = (
-                mac.replace(":", "").replace("-", "").replace(".", "").upper()[-4:]
-            )
-            temp_name = f"New-Device-{short_mac}"
+            entries.append({"hostname": hostname, "ip": ip, "mac": mac})
+    return entries
 
-            # Clean up the name
-            raw_name = hostname.replace(".fritz.box", "").strip()
 
-            # If the name is 'Unknown' or already used, append MAC suffix
-            if raw_name == "Unknown" or raw_name in used_names:
-                new_name = f"{raw_name}-{short_mac}"
-            else:
-                new_name = raw_name
-
-            used_names.append(new_name)
-
-            device = nb.dcim.devices.get(name=temp_name)
-            if device:
-                update_data = {}
-                if device.name != new_name:
-                    update_data["name"] = new_name
-
-                if not device.primary_ip4:
-                    ip_addr = nb.ipam.ip_addresses.get(address=f"{ip}/24")
-                    if ip_addr:
-                        update_data["primary_ip4"] = ip_addr.id
-
-                if update_data:
-                    try:
-                        print(f"UPDATING {temp_name} -> {new_name}")
-                        device.update(update_data)
-                    except Exception as e:
-                        print(f"FAILED to update {temp_name}: {e}")
+def read_nmap_xml(file_path):
+    """Read hosts with a MAC address from Nmap XML output (-oX)."""
+    entries = []
+    for host in ET.parse(file_path).getroot().iter("host"):
+        device = parse_nmap_host(host)
+        if device:
+            device["hostname"] = device["hostname"] or "Unknown"
+            entries.append(device)
+    return entries
+
+
+def read_entries(file_path):
+    with open(file_path, "r", encoding="utf-8") as f:
+        head = f.read(512).lstrip()
+    if head.startswith("<?xml") or head.startswith("<nmaprun"):
+        return read_nmap_xml(file_path)
+    return read_flat_file(file_path)
+
+
+def load_netbox(nb, entries):
+    """Prefetch all devices by name and the IPs of the input subnets."""
+    devices = {d.name: d for d in nb.dcim.devices.all()}
+    subnets = {
+        str(ipaddress.ip_network(f"{e['ip']}/24", strict=False)) for e in entries
+    }
+    ips = {}
+    for subnet in sorted(subnets):
+        for ip_obj in nb.ipam.ip_addresses.filter(parent=subnet):
+            ips[str(ip_obj.address)] = ip_obj.id
+    return devices, ips
+
+
+def build_plan(entries, devices, ips):
+    """Resolve new names and primary IPs locally; return (plan, notes)."""
+    plan = []
+    notes = []
+    # Names of existing devices and of the renames planned so far; a bulk
+    # PATCH with a duplicate name would be rejected as a whole
+    used_names = set(devices)
+    # Devices already handled; concatenated input files repeat MACs
+    planned = set()
+
+    def taken(name, device):
+        return name in used_names and name != device.name
+
+    for entry in entries:
+        suffix = short_mac(entry["mac"])
+        temp_name = f"New-Device-{suffix}"
+
+        # Clean up the name
+        raw_name = entry["hostname"].replace(".fritz.box", "").strip()
+
+        device = devices.get(temp_name)
+        if not device:
+            # Device might have been renamed in a previous run
+            if (raw_name != "Unknown" and raw_name in devices) or (
+                f"{raw_name}-{suffix}" in devices
+            ):
+                notes.append(f"ALREADY UPDATED: {raw_name}")
             else:
-                # Device might have been renamed in a previous run
-                # Check if the new name already exists
-                check_exists = nb.dcim.devices.get(name=new_name)
-                if check_exists:
-                    print(f"ALREADY UPDATED: {new_name}")
-                else:
-                    print(f"NOT FOUND: {temp_name}")
+                notes.append(f"NOT FOUND: {temp_name}")
+            continue
+        if device.id in planned:
+            notes.append(f"DUPLICATE: {temp_name} ({entry['ip']}) ignored")
+            continue
+        planned.add(device.id)
+
+        # If the name is 'Unknown' or already used, append MAC suffix
+        if raw_name == "Unknown" or taken(raw_name, device):
+            new_name = f"{raw_name}-{suffix}"
+        else:
+            new_name = raw_name
+        if taken(new_name, device):
+            notes.append(f"NAME TAKEN: {temp_name} -> {new_name}, not renamed")
+            new_name = device.name
+
+        used_names.add(new_name)
+
+        update_data = {}
+        if device.name != new_name:
+            update_data["name"] = new_name
+
+        if not device.primary_ip4:
+            ip_id = ips.get(f"{entry['ip']}/24")
+            if ip_id:
+                update_data["primary_ip4"] = ip_id
+
+        if update_data:
+            plan.append({"device": device, "changes": update_data})
+    return plan, notes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sovereign Stack Bulk Renamer")
+    parser.add_argument(
+        "input",
+        nargs="?",
+        default="nmap_flat.txt",
+        help="hostname;ip;mac file or Nmap XML output (default: nmap_flat.txt)",
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="only print the rename plan"
+    )
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    nb = connect(
+        os.getenv("NETBOX_URL").strip().rstrip("/"),
+        os.getenv("NETBOX_API_TOKEN").strip(),
+    )
+
+    print("--- Starting Unique Device Rename ---")
+    entries = read_entries(args.input)
+    devices, ips = load_netbox(nb, entries)
+    plan, notes = build_plan(entries, devices, ips)
+
+    for note in notes:
+        print(note)
+    for item in plan:
+        temp_name = item["device"].name
+        new_name = item["changes"].get("name", temp_name)
+        extra = " (+ primary IP)" if "primary_ip4" in item["changes"] else ""
+        print(
+            f"{'PLAN' if args.dry_run else 'UPDATING'} {temp_name} -> {new_name}{extra}"
+        )
+
+    if plan and not args.dry_run:
+        stats = SyncStats()
+        writer = BulkWriter(nb, stats=stats)
+        for item in plan:
+            writer.update("dcim.devices", item["device"].id, item["changes"])
+        writer.flush()
+        if writer.failed:
+            print(f"FAILED to update {writer.failed} devices")
+        print(f"NetBox sync: {stats.summary()}")
 
     print("\n--- Finished ---")
 
@@ -0,0 +1,215 @@
+# ==============================================================================
+# Sovereign Stack - Disk Usage History
+# ==============================================================================
+#
+# DESCRIPTION:
+# Append-only time-series store for the host disk figures collected by
+# infra_scanner.py, so the NetBox device comment can show how fast a disk
+# fills up instead of only its current state.
+#
+# WHAT IT DOES:
+# 1. Appends every scan's size/free figures per device and mount to an
+#    embedded SQLite database
+# 2. Maintains hourly and daily rollups (min/avg/max free space) on insert
+#    and prunes raw samples and hourly rollups after a retention period
+# 3. Answers range queries at the best available resolution
+# 4. Projects the days until a disk is full from a least-squares fit of
+#    the free space over a recent window
+#
+# DEPENDENCIES:
+#    - Python standard library only (sqlite3)
+#
+# OUTPUT:
+#    - SQLite database (see DISK_HISTORY_FILE in infra_scanner.py)
+#
+# ==============================================================================
+# Copyright (C) 2026 Henk van Hoek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses.
+# ==============================================================================
+
+import os
+import time
+import sqlite3
+
+HOUR = 3600
+DAY = 86400
+
+# Rollup tables and their bucket size in seconds
+ROLLUPS = {"hourly": HOUR, "daily": DAY}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    device TEXT NOT NULL,
+    mount TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    size_gb REAL NOT NULL,
+    free_gb REAL NOT NULL,
+    PRIMARY KEY (device, mount, ts)
+) WITHOUT ROWID;
+"""
+
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS {table} (
+    device TEXT NOT NULL,
+    mount TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    size_gb REAL NOT NULL,
+    free_min REAL NOT NULL,
+    free_max REAL NOT NULL,
+    free_sum REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (device, mount, bucket)
+) WITHOUT ROWID;
+"""
+
+ROLLUP_UPSERT = """
+INSERT INTO {table} VALUES (?, ?, ?, ?, ?, ?, ?, 1)
+ON CONFLICT (device, mount, bucket) DO UPDATE SET
+    size_gb = excluded.size_gb,
+    free_min = min(free_min, excluded.free_min),
+    free_max = max(free_max, excluded.free_max),
+    free_sum = free_sum + excluded.free_sum,
+    count = count + 1
+"""
+
+
+def days_until_full(points):
+    """Project the days until free space reaches zero.
+
+    `points` are (timestamp, free_gb) pairs. Fits a least-squares line and
+    returns None when there are too few points or free space is not
+    decreasing.
+    """
+    if len(points) < 2:
+        return None
+    n = len(points)
+    mean_t = sum(t for t, _ in points) / n
+    mean_f = sum(f for _, f in points) / n
+    var_t = sum((t - mean_t) ** 2 for t, _ in points)
+    if var_t == 0:
+        return None
+    slope = sum((t - mean_t) * (f - mean_f) for t, f in points) / var_t
+    if slope >= 0:
+        return None
+    # Project from the fitted value at the latest point
+    last_t = points[-1][0]
+    free_now = mean_f + slope * (last_t - mean_t)
+    return max(0.0, free_now / -slope / DAY)
+
+
+class DiskHistory:
+    """SQLite-backed history of host disk figures per device and mount.
+
+    Raw samples are kept for `raw_days`, hourly rollups for `hourly_days`
+    and daily rollups forever.
+    """
+
+    def __init__(self, path, raw_days=30, hourly_days=365):
+        self.path = path
+        self.raw_days = raw_days
+        self.hourly_days = hourly_days
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(path)
+        try:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.executescript(SCHEMA)
+            for table in ROLLUPS:
+                self.db.executescript(ROLLUP_SCHEMA.format(table=table))
+        except sqlite3.Error:
+            self.db.close()
+            raise
+
+    def close(self):
+        self.db.close()
+
+    def record(self, device, host_disks, ts=None):
+        """Append one scan's disk figures of a device."""
+        ts = int(time.time() if ts is None else ts)
+        with self.db:
+            for d in host_disks:
+                mount = d.get("mount") or d.get("disk")
+                row = (device, mount, ts, d["size_gb"], d["free_gb"])
+                self.db.execute(
+                    "INSERT OR REPLACE INTO samples VALUES (?,?,?,?,?)", row
+                )
+                for table, size in ROLLUPS.items():
+                    self.db.execute(
+                        ROLLUP_UPSERT.format(table=table),
+                        (device, mount, ts - ts % size, d["size_gb"])
+                        + (d["free_gb"],) * 3,
+                    )
+
+    def prune(self, now=None):
+        """Drop raw samples and hourly rollups past their retention."""
+        now = time.time() if now is None else now
+        with self.db:
+            self.db.execute(
+                "DELETE FROM samples WHERE ts < ?", (now - self.raw_days * DAY,)
+            )
+            self.db.execute(
+                "DELETE FROM hourly WHERE bucket < ?", (now - self.hourly_days * DAY,)
+            )
+
+    def query(self, device, mount, start, end=None, resolution=None):
+        """Return [(timestamp, size_gb, free_gb)] for a range, oldest first.
+
+        `resolution` is "raw", "hourly" or "daily"; by default the finest
+        resolution that still covers `start` is used. Rollups return the
+        average free space per bucket.
+        """
+        end = time.time() if end is None else end
+        if resolution is None:
+            age = time.time() - start
+            if age <= self.raw_days * DAY:
+                resolution = "raw"
+            elif age <= self.hourly_days * DAY:
+                resolution = "hourly"
+            else:
+                resolution = "daily"
+        if resolution == "raw":
+            sql = (
+                "SELECT ts, size_gb, free_gb FROM samples "
+                "WHERE device = ? AND mount = ? AND ts BETWEEN ? AND ? ORDER BY ts"
+            )
+        elif resolution in ROLLUPS:
+            sql = (
+                f"SELECT bucket, size_gb, free_sum / count FROM {resolution} "
+                "WHERE device = ? AND mount = ? AND bucket BETWEEN ? AND ? "
+                "ORDER BY bucket"
+            )
+        else:
+            raise ValueError(f"Unknown resolution: {resolution}")
+        return self.db.execute(sql, (device, mount, int(start), int(end))).fetchall()
+
+    def trend(self, device, mount, window_days=30, now=None):
+        """Return {"change_7d", "days_until_full"} for a mount.
+
+        The projection uses hourly averages over the last `window_days`, so a
+        burst of scans does not outweigh quiet periods.
+        """
+        now = time.time() if now is None else now
+        rows = self.query(
+            device, mount, now - window_days * DAY, now, resolution="hourly"
+        )
+        if not rows:
+            return {"change_7d": None, "days_until_full": None}
+        week = [free for ts, _, free in rows if ts >= now - 7 * DAY]
+        change = round(week[-1] - week[0], 1) if len(week) > 1 else None
+        return {
+            "change_7d": change,
+            "days_until_full": days_until_full([(ts, free) for ts, _, free in rows]),
+        }
@@ -0,0 +1,291 @@
+# ==============================================================================
+# Sovereign Stack - Docker Engine API over SSH
+# ==============================================================================
+#
+# DESCRIPTION:
+# Talks to the Docker Engine API of a remote host through its Unix socket,
+# forwarded over an existing (pooled) SSH transport. Used by
+# infra_scanner.py instead of parsing `docker ps` text output.
+#
+# WHAT IT DOES:
+# 1. Opens one SSH channel that bridges stdin/stdout to the remote Docker
+#    socket (socat, or a python3 one-liner when socat is missing)
+# 2. Sends HTTP/1.1 requests with keep-alive over that single channel:
+#    /version to negotiate the API version, one /containers/json call, plus
+#    optional one-shot /stats per container
+# 3. Maps the structured API data (port bindings, labels, networks, state,
+#    health) to infra_scanner's container records
+#
+# DEPENDENCIES:
+#    - paramiko (via ssh_pool.py)
+#    - Remote: access to /var/run/docker.sock (docker group) and socat or
+#      python3
+#
+# ==============================================================================
+# Copyright (C) 2026 Henk van Hoek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses.
+# ==============================================================================
+
+import re
+import json
+import base64
+import shlex
+from datetime import datetime, timezone
+
+DOCKER_SOCKET = "/var/run/docker.sock"
+# Newest API version this client was written against. The daemon's own
+# version is used when it is older; its MinAPIVersion when that is newer
+# (Docker 29 rejects anything below 1.44).
+API_VERSION = "1.47"
+
+# Fallback bridge for hosts without socat: copies stdin to the socket and the
+# socket to stdout until either side closes.
+_PY_BRIDGE = """
+import os, socket, sys, threading
+s = socket.socket(socket.AF_UNIX)
+s.connect(sys.argv[1])
+def upstream():
+    while True:
+        data = os.read(0, 65536)
+        if not data:
+            break
+        s.sendall(data)
+    s.shutdown(socket.SHUT_WR)
+threading.Thread(target=upstream, daemon=True).start()
+while True:
+    data = s.recv(65536)
+    if not data:
+        break
+    os.write(1, data)
+"""
+
+
+class DockerAPIError(Exception):
+    pass
+
+
+def bridge_command(socket_path=DOCKER_SOCKET):
+    """Return the remote shell command that bridges stdio to the socket."""
+    sock = shlex.quote(socket_path)
+    code = base64.b64encode(_PY_BRIDGE.encode()).decode()
+    python = f"python3 -c \"import base64; exec(base64.b64decode('{code}'))\" {sock}"
+    return (
+        "if command -v socat >/dev/null 2>&1; then "
+        f"exec socat - UNIX-CONNECT:{sock}; else exec {python}; fi"
+    )
+
+
+class DockerEngine:
+    """Minimal HTTP/1.1 client for the Docker API on one SSH channel."""
+
+    def __init__(self, session, socket_path=DOCKER_SOCKET):
+        self.channel = session.open_channel(bridge_command(socket_path))
+        self._buffer = b""
+        self.api_version = None
+
+    def close(self):
+        self.channel.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _fill(self):
+        data = self.channel.recv(65536)
+        if not data:
+            raise DockerAPIError("Docker socket bridge closed the connection")
+        self._buffer += data
+
+    def _read_line(self):
+        while b"\r\n" not in self._buffer:
+            self._fill()
+        line, self._buffer = self._buffer.split(b"\r\n", 1)
+        return line.decode("latin-1")
+
+    def _read_exact(self, size):
+        while len(self._buffer) < size:
+            self._fill()
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def get(self, path):
+        """GET a versioned API path and return the decoded JSON body."""
+        if self.api_version is None:
+            self.api_version = negotiate_version(self.request("/version"))
+        return self.request(f"/v{self.api_version}{path}")
+
+    def request(self, path):
+        """GET a raw path and return the decoded JSON body."""
+        self.channel.sendall(
+            (
+                f"GET {path} HTTP/1.1\r\nHost: docker\r\n"
+                "User-Agent: SovereignStack-InfraScanner\r\n\r\n"
+            ).encode()
+        )
+
+        status_line = self._read_line()
+        parts = status_line.split(" ", 2)
+        if len(parts) < 2 or not parts[1].isdigit():
+            raise DockerAPIError(f"Unexpected response: {status_line!r}")
+        status = int(parts[1])
+
+        headers = {}
+        while True:
+            line = self._read_line()
+            if not line:
+                break
+            key, _, value = line.partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            body = b""
+            while True:
+                size = int(self._read_line().split(";")[0], 16)
+                if size == 0:
+                    # Skip optional trailers up to the final empty line
+                    while self._read_line():
+                        pass
+                    break
+                body += self._read_exact(size)
+                self._read_exact(2)
+        else:
+            body = self._read_exact(int(headers.get("content-length", "0")))
+
+        if status >= 400:
+            raise DockerAPIError(f"GET {path}: HTTP {status} {body[:200]!r}")
+        return json.loads(body or b"null")
+
+    def containers(self):
+        return self.get("/containers/json")
+
+    def stats(self, container_id):
+        return self.get(f"/containers/{container_id}/stats?stream=false&one-shot=1")
+
+
+def _version_key(version):
+    return tuple(int(part) for part in str(version).split("."))
+
+
+def negotiate_version(info):
+    """Pick the API version to use from the daemon's /version document."""
+    version = API_VERSION
+    server = (info or {}).get("ApiVersion")
+    if server and _version_key(server) < _version_key(version):
+        version = server
+    minimum = (info or {}).get("MinAPIVersion")
+    if minimum and _version_key(minimum) > _version_key(version):
+        version = minimum
+    return version
+
+
+def format_ports(ports):
+    """Render API port bindings like the `docker ps` Ports column."""
+    rendered = []
+    for port in sorted(
+        ports or [], key=lambda p: (p.get("PrivatePort", 0), p.get("IP", ""))
+    ):
+        target = f"{port.get('PrivatePort')}/{port.get('Type', 'tcp')}"
+        if port.get("PublicPort"):
+            host_ip = port.get("IP") or "0.0.0.0"
+            if ":" in host_ip:
+                host_ip = f"[{host_ip}]"
+            rendered.append(f"{host_ip}:{port['PublicPort']}->{target}")
+        elif target not in rendered:
+            rendered.append(target)
+    return ", ".join(rendered)
+
+
+def _health(status):
+    match = re.search(r"\((healthy|unhealthy|health: starting)\)", status or "")
+    return match.group(1).replace("health: ", "") if match else None
+
+
+def summarize_stats(stats):
+    """Reduce a one-shot /stats document to a few figures."""
+    cpu = stats.get("cpu_stats", {})
+    precpu = stats.get("precpu_stats", {})
+    cpu_delta = cpu.get("cpu_usage", {}).get("total_usage", 0) - precpu.get(
+        "cpu_usage", {}
+    ).get("total_usage", 0)
+    system_delta = cpu.get("system_cpu_usage", 0) - precpu.get("system_cpu_usage", 0)
+    online = cpu.get("online_cpus") or len(
+        cpu.get("cpu_usage", {}).get("percpu_usage") or []
+    )
+    cpu_percent = 0.0
+    if cpu_delta > 0 and system_delta > 0:
+        cpu_percent = cpu_delta / system_delta * (online or 1) * 100
+
+    memory = stats.get("memory_stats", {})
+    # Page cache is not counted as used memory (same as `docker stats`)
+    mem_stats = memory.get("stats", {})
+    cache = mem_stats.get("inactive_file", mem_stats.get("total_inactive_file", 0))
+    networks = (stats.get("networks") or {}).values()
+    blkio = stats.get("blkio_stats", {}).get("io_service_bytes_recursive") or []
+    return {
+        "cpu_percent": round(cpu_percent, 2),
+        "mem_bytes": max(0, memory.get("usage", 0) - cache),
+        "mem_limit": memory.get("limit", 0),
+        "net_rx_bytes": sum(n.get("rx_bytes", 0) for n in networks),
+        "net_tx_bytes": sum(n.get("tx_bytes", 0) for n in networks),
+        "blk_read_bytes": sum(
+            e.get("value", 0) for e in blkio if e.get("op", "").lower() == "read"
+        ),
+        "blk_write_bytes": sum(
+            e.get("value", 0) for e in blkio if e.get("op", "").lower() == "write"
+        ),
+    }
+
+
+def container_record(data):
+    """Map a /containers/json entry to infra_scanner's container record."""
+    created = datetime.fromtimestamp(data.get("Created", 0), tz=timezone.utc)
+    names = data.get("Names") or [""]
+    networks = (data.get("NetworkSettings") or {}).get("Networks") or {}
+    return {
+        "name": names[0].lstrip("/"),
+        "image": data.get("Image"),
+        "created": created.strftime("%Y-%m-%d %H:%M:%S %z UTC"),
+        "ports": format_ports(data.get("Ports")),
+        "port_bindings": [
+            {
+                "ip": p.get("IP"),
+                "public": p.get("PublicPort"),
+                "private": p.get("PrivatePort"),
+                "type": p.get("Type"),
+            }
+            for p in data.get("Ports") or []
+        ],
+        "labels": data.get("Labels") or {},
+        "networks": sorted(networks),
+        "state": data.get("State"),
+        "health": _health(data.get("Status")),
+    }
+
+
+def collect_containers(session, with_stats=False, socket_path=DOCKER_SOCKET):
+    """Return container records of the running containers of a host.
+
+    Everything, including the optional per-container stats, is requested
+    over one bridged SSH channel.
+    """
+    with DockerEngine(session, socket_path) as engine:
+        listing = engine.containers()
+        records = [container_record(data) for data in listing]
+        if with_stats:
+            for data, record in zip(listing, records):
+                record["stats"] = summarize_stats(engine.stats(data["Id"]))
+    return records
@@ -0,0 +1,203 @@
+# ==============================================================================
+# Sovereign Stack - HTTP Service Prober
+# ==============================================================================
+#
+# DESCRIPTION:
+# Asyncio-based HTTP(S) probe engine used by infra_scanner.py to recognise
+# web applications (OctoPrint, Home Assistant, Synology DSM, ...) on hosts.
+#
+# WHAT IT DOES:
+# 1. Builds the set of (scheme, port) endpoints from the fingerprint table
+# 2. Requests every endpoint of every host concurrently, limited by a
+#    global connection semaphore, following same-host redirects
+# 3. Matches the headers and bodies of 200 and redirect responses against
+#    the fingerprint markers
+#
+# DEPENDENCIES:
+#    - Python standard library only (asyncio, ssl)
+#
+# ==============================================================================
+# Copyright (C) 2026 Henk van Hoek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses.
+# ==============================================================================
+
+import ssl
+import asyncio
+import logging
+from urllib.parse import urljoin, urlsplit
+
+logger = logging.getLogger("HTTPProbe")
+
+# Fingerprint table: a service matches when any marker occurs in the response
+# (headers or body) of one of its endpoints. Add entries here to detect more.
+FINGERPRINTS = [
+    {
+        "service": "octoprint",
+        "endpoints": [("http", 80), ("http", 5000), ("https", 443), ("https", 5000)],
+        "markers": ["<title>OctoPrint", "permissions=STATUS"],
+    },
+    {
+        "service": "home_assistant",
+        "endpoints": [("http", 8123), ("https", 8123)],
+        "markers": ["<title>Home Assistant", "home-assistant-main"],
+    },
+    {
+        "service": "synology_dsm",
+        "endpoints": [("http", 5000), ("https", 5001)],
+        "markers": ["<title>Synology", "SYNO.SDS", "webman/"],
+    },
+    {
+        "service": "portainer",
+        "endpoints": [("http", 9000), ("https", 9443)],
+        "markers": ["<title>Portainer", "portainer.js", 'ng-app="portainer"'],
+    },
+    {
+        "service": "proxmox",
+        "endpoints": [("https", 8006)],
+        "markers": ["Proxmox Virtual Environment", "pve-manager"],
+    },
+    {
+        "service": "grafana",
+        "endpoints": [("http", 3000)],
+        "markers": ["<title>Grafana", "grafana-app"],
+    },
+]
+
+MAX_REDIRECTS = 3
+MAX_RESPONSE_BYTES = 64 * 1024
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+# Only these responses are matched against the markers; error pages (e.g. a
+# reverse proxy's 404/502) may echo the path or name other services
+MATCH_CODES = (200,) + REDIRECT_CODES
+
+
+def _ssl_context():
+    # Home lab services mostly use self-signed certificates
+    ctx = ssl.create_default_context()
+    ctx.check_hostname = False
+    ctx.verify_mode = ssl.CERT_NONE
+    return ctx
+
+
+async def _http_get(ip, scheme, port, path, timeout, ssl_ctx):
+    """Minimal HTTP/1.0 GET; returns (status, headers, text) or None."""
+    writer = None
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(
+                ip, port, ssl=ssl_ctx if scheme == "https" else None
+            ),
+            timeout,
+        )
+        writer.write(
+            (
+                f"GET {path} HTTP/1.0\r\nHost: {ip}:{port}\r\n"
+                "User-Agent: SovereignStack-InfraScanner\r\n"
+                "Accept: */*\r\nConnection: close\r\n\r\n"
+            ).encode()
+        )
+        await writer.drain()
+
+        raw = b""
+        while len(raw) < MAX_RESPONSE_BYTES:
+            chunk = await asyncio.wait_for(reader.read(8192), timeout)
+            if not chunk:
+                break
+            raw += chunk
+    except (OSError, asyncio.TimeoutError, ssl.SSLError):
+        return None
+    finally:
+        if writer is not None:
+            writer.close()
+
+    head, _, body = raw.partition(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        status = int(lines[0].split()[1])
+    except (IndexError, ValueError):
+        return None
+    headers = {}
+    for line in lines[1:]:
+        key, _, value = line.partition(":")
+        headers[key.strip().lower()] = value.strip()
+    return status, headers, body.decode("utf-8", errors="replace")
+
+
+async def _probe_endpoint(ip, scheme, port, semaphore, timeout, ssl_ctx):
+    """Fetch an endpoint, following same-host redirects; return seen text."""
+    seen = []
+    path = "/"
+    async with semaphore:
+        for _ in range(MAX_REDIRECTS + 1):
+            response = await _http_get(ip, scheme, port, path, timeout, ssl_ctx)
+            if response is None:
+                break
+            status, headers, text = response
+            location = headers.get("location", "")
+            if status in MATCH_CODES:
+                seen.append(location)
+                seen.append(text)
+            if status not in REDIRECT_CODES or not location:
+                break
+
+            target = urlsplit(urljoin(f"{scheme}://{ip}:{port}{path}", location))
+            if target.hostname != ip:
+                break
+            scheme = target.scheme
+            port = target.port or (443 if scheme == "https" else 80)
+            path = target.path or "/"
+            if target.query:
+                path = f"{path}?{target.query}"
+    return "\n".join(seen)
+
+
+async def probe_hosts_async(ips, fingerprints=None, concurrency=64, timeout=3.0):
+    """Probe all endpoints of all hosts concurrently.
+
+    Returns {ip: [service, ...]} with the matched fingerprint names.
+    """
+    fingerprints = FINGERPRINTS if fingerprints is None else fingerprints
+    semaphore = asyncio.Semaphore(concurrency)
+    ssl_ctx = _ssl_context()
+
+    endpoints = sorted({ep for fp in fingerprints for ep in fp["endpoints"]})
+    jobs = [(ip, scheme, port) for ip in ips for scheme, port in endpoints]
+    texts = await asyncio.gather(
+        *(
+            _probe_endpoint(ip, scheme, port, semaphore, timeout, ssl_ctx)
+            for ip, scheme, port in jobs
+        )
+    )
+
+    seen = {(ip, scheme, port): text for (ip, scheme, port), text in zip(jobs, texts)}
+    services = {ip: [] for ip in ips}
+    for ip in ips:
+        for fp in fingerprints:
+            if any(
+                marker in seen[(ip, scheme, port)]
+                for scheme, port in fp["endpoints"]
+                for marker in fp["markers"]
+            ):
+                services[ip].append(fp["service"])
+    return services
+
+
+def probe_hosts(ips, fingerprints=None, concurrency=64, timeout=3.0):
+    """Blocking wrapper around probe_hosts_async()."""
+    if not ips:
+        return {}
+    return asyncio.run(
+        probe_hosts_async(ips, fingerprints, concurrency=concurrency, timeout=timeout)
+    )
@@ -9,10 +9,19 @@
 #
 # WHAT IT DOES:
 # 1. Validates safety guards (not root, path exists, verify_env.sh passes)
-# 2. Reads docker-compose.yaml to extract service names and images
-# 3. Creates/updates Virtual Machines in NetBox
-# 4. Sets custom fields for docker_image and docker_port
-# 5. Adds Markdown documentation in VM comments
+# 2. Hashes docker-compose.yaml with its override and include files and .env
+#    stops early when nothing changed since the last successful sync
+# 3. Reads the (merged) compose files, resolves ${VAR} interpolation from
+#    .env and extracts image, published ports, networks, volume mounts,
+#    restart policy, profiles and healthcheck per service
+# 4. Compares every service with the last synced state and only
+#    creates/updates added or modified services in NetBox with bulk
+#    requests (only changed fields are sent, see netbox_sync.py)
+# 5. Marks VMs of removed services as "decommissioning"
+# 6. Sets these as custom fields (docker_image, docker_port,
+#    docker_networks, docker_volumes, docker_restart, docker_profiles,
+#    docker_healthcheck) in the same bulk request
+# 7. Adds Markdown documentation in VM comments
 #
 # DEPENDENCIES:
 #    - pynetbox, yaml, python-dotenv
@@ -22,6 +31,8 @@
 #    See .env for:
 #    - NETBOX_URL: Full URL of NetBox instance
 #    - NETBOX_API_TOKEN: API token for authentication
+#    - IMPORT_STATE_FILE: Hashes of the last synced compose files/services
+#      (default: state/import_inventory_state.json in the active root)
 #
 # OUTPUT:
 #    - NetBox Virtual Machine records
@@ -29,6 +40,8 @@
 #
 # USAGE:
 #    ./run_task.sh import_inventory.py
+#    python3 import_inventory.py --force   (sync all services regardless
+#                                           of the stored state)
 #
 # SCHEDULED:
 #    Via cron: 0 1 * * * cd /home/$USER/docker && ./run_task.sh import_inventory.py
@@ -51,13 +64,34 @@
 # ==============================================================================
 
 import os
+import re
 import sys
+import json
 import fcntl
+import argparse
 import subprocess
 import yaml
-import pynetbox
 from datetime import datetime
-from dotenv import load_dotenv
+from dotenv import dotenv_values, load_dotenv
+
+from netbox_sync import (
+    BulkWriter,
+    NetBoxCache,
+    SyncStats,
+    connect,
+    ensure_custom_fields,
+)
+from scan_state import content_hash
+
+VM_ENDPOINT = "virtualization.virtual_machines"
+STATE_VERSION = 1
+OVERRIDE_FILES = ("docker-compose.override.yaml", "docker-compose.override.yml")
+
+# $$, ${VAR}, ${VAR:-default}, ${VAR-default}, ${VAR:?err}, ${VAR:+alt}, $VAR
+INTERPOLATION = re.compile(
+    r"\$(?:(\$)|\{([A-Za-z_][A-Za-z0-9_]*)(?:(:?[-?+])([^}]*))?\}"
+    r"|([A-Za-z_][A-Za-z0-9_]*))"
+)
 
 
 def log_message(message):
@@ -93,26 +127,222 @@ def check_safety_guards(active_root):
         fatal_error("Pre-flight check (verify_env.sh) failed.")
 
 
-def get_docker_services_with_images(compose_path):
-    """Extract service names and images from the compose file."""
+def load_yaml(path):
+    with open(path, "r") as f:
+        try:
+            return yaml.safe_load(f) or {}
+        except yaml.YAMLError as exc:
+            fatal_error(f"Error parsing YAML in {path}: {exc}")
+
+
+def merge_compose(base, override):
+    """Merge compose mappings the way 'docker compose' layers files."""
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_compose(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def _with_includes(compose_path):
+    """Return the files included by a compose file (recursively), then itself."""
+    compose_dir = os.path.dirname(compose_path)
+    files = []
+    for entry in load_yaml(compose_path).get("include") or []:
+        paths = entry.get("path", []) if isinstance(entry, dict) else entry
+        for path in [paths] if isinstance(paths, str) else paths:
+            full_path = os.path.join(compose_dir, path)
+            if os.path.exists(full_path):
+                files.extend(_with_includes(full_path))
+            else:
+                log_message(f"Warning: Included compose file {path} not found.")
+    return files + [compose_path]
+
+
+def get_compose_files(compose_path):
+    """Return the compose file, its included files and its override file.
+
+    Files are returned in the order they are layered: includes first, then
+    the main file, then the override.
+    """
     if not os.path.exists(compose_path):
         fatal_error(f"Compose file not found at {compose_path}")
 
-    with open(compose_path, "r") as f:
-        try:
-            data = yaml.safe_load(f)
-            services_data = data.get("services", {})
-            # Create a mapping of service name to its docker image
-            return {
-                name: config.get("image", "unknown")
-                for name, config in services_data.items()
-            }
-        except yaml.YAMLError as exc:
-            fatal_error(f"Error parsing YAML: {exc}")
+    files = _with_includes(compose_path)
+    for name in OVERRIDE_FILES:
+        override = os.path.join(os.path.dirname(compose_path), name)
+        if os.path.exists(override):
+            files.append(override)
+            break
+    return files
+
+
+def hash_files(paths, root):
+    """Content hash over a list of files (paths relative to root, contents)."""
+    contents = []
+    for path in paths:
+        with open(path, "rb") as f:
+            data = f.read().decode(errors="replace")
+        contents.append([os.path.relpath(path, root), data])
+    return content_hash(contents)
+
+
+def load_compose_env(env_path):
+    """Variables for interpolation: .env, overridden by the environment."""
+    env = dotenv_values(env_path) if os.path.exists(env_path) else {}
+    env.update(os.environ)
+    return env
+
+
+def interpolate(value, env):
+    """Resolve ${VAR} style variables in all strings of a compose value."""
+    if isinstance(value, dict):
+        return {k: interpolate(v, env) for k, v in value.items()}
+    if isinstance(value, list):
+        return [interpolate(v, env) for v in value]
+    if not isinstance(value, str):
+        return value
+
+    def replace(match):
+        escaped, name, op, arg, bare = match.groups()
+        if escaped:
+            return "$"
+        if bare:
+            return env.get(bare) or ""
+        current = env.get(name)
+        is_set = current is not None and (current != "" or ":" not in (op or ""))
+        if op in ("-", ":-"):
+            return current if is_set else arg
+        if op in ("+", ":+"):
+            return arg if is_set else ""
+        if op in ("?", ":?") and not is_set:
+            log_message(f"Warning: Required variable {name} is not set: {arg}")
+        return current or ""
+
+    return INTERPOLATION.sub(replace, value)
+
+
+def get_compose_services(compose_files, env=None):
+    """Return the merged (and interpolated) service definitions."""
+    services = {}
+    for path in compose_files:
+        data = load_yaml(path).get("services") or {}
+        if env is not None:
+            data = interpolate(data, env)
+        for name, config in data.items():
+            services[name] = merge_compose(services.get(name, {}), config or {})
+    return services
+
+
+def _port_sort_key(port):
+    first = port.split("-")[0]
+    return (0, int(first), port) if first.isdigit() else (1, 0, port)
+
 
+def extract_ports(config):
+    """Published host ports, formatted like infra_scanner's docker_port."""
+    published = set()
+    for entry in config.get("ports") or []:
+        if isinstance(entry, dict):
+            host_port = entry.get("published")
+        else:
+            # [ip:]host:container[/proto]; a bare container port is not
+            # published on a fixed host port
+            mapping = str(entry).split("/")[0]
+            host_port = (
+                mapping.rsplit(":", 1)[0].rsplit(":", 1)[-1] if ":" in mapping else None
+            )
+        if host_port not in (None, ""):
+            published.add(str(host_port))
+    return ", ".join(sorted(published, key=_port_sort_key))
 
-def main():
+
+def extract_networks(config):
+    if config.get("network_mode"):
+        return f"mode: {config['network_mode']}"
+    networks = config.get("networks") or ["default"]
+    return ", ".join(sorted(networks))
+
+
+def extract_volumes(config):
+    mounts = []
+    for entry in config.get("volumes") or []:
+        if isinstance(entry, dict):
+            source = entry.get("source") or entry.get("type", "volume")
+            mount = f"{source}:{entry.get('target', '')}"
+            if entry.get("read_only"):
+                mount += ":ro"
+        else:
+            mount = str(entry)
+        mounts.append(mount)
+    return "\n".join(mounts)
+
+
+def extract_healthcheck(config):
+    healthcheck = config.get("healthcheck") or {}
+    if healthcheck.get("disable"):
+        return "disabled"
+    test = healthcheck.get("test")
+    if isinstance(test, list):
+        if test and test[0] in ("CMD", "CMD-SHELL", "NONE"):
+            test = test[1:] if test[0] != "NONE" else ["disabled"]
+        test = " ".join(str(part) for part in test)
+    return test or ""
+
+
+def extract_service_fields(config):
+    """Map a compose service definition to VM custom fields."""
+    fields = {
+        "docker_image": config.get("image", "unknown"),
+        "docker_port": extract_ports(config),
+        "docker_networks": extract_networks(config),
+        "docker_volumes": extract_volumes(config),
+        "docker_restart": config.get("restart", ""),
+        "docker_profiles": ", ".join(config.get("profiles") or []),
+        "docker_healthcheck": extract_healthcheck(config),
+    }
+    # Empty strings are stored as empty (null) custom fields
+    return {name: value or None for name, value in fields.items()}
+
+
+def load_state(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            state = json.load(f)
+        return state if state.get("version") == STATE_VERSION else {}
+    except (OSError, ValueError) as e:
+        log_message(f"Warning: Ignoring unreadable state file {path}: {e}")
+        return {}
+
+
+def save_state(path, state):
+    """Write the state atomically (write to a temp file, then rename)."""
+    directory = os.path.dirname(path)
+    tmp_path = f"{path}.tmp"
+    try:
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(tmp_path, "w") as f:
+            json.dump(dict(state, version=STATE_VERSION), f, indent=2)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        log_message(f"Warning: Could not write state file {path}: {e}")
+
+
+def main(argv=None):
     """Main execution flow for inventory sync."""
+    parser = argparse.ArgumentParser(description="Sovereign Stack Inventory Import")
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="sync all services, even when the compose files did not change",
+    )
+    args = parser.parse_args(argv)
+
     load_dotenv()
 
     # 4. Anti-Stacking (Flock)
@@ -141,12 +371,39 @@ def main():
         fatal_error("NETBOX_URL or NETBOX_API_TOKEN not set in .env")
 
     # Initialize NetBox API
-    nb = pynetbox.api(nb_url, token=nb_token)
+    nb = connect(nb_url, nb_token)
     compose_file = os.path.join(active_root, "docker-compose.yaml")
 
-    log_message(f"Starting NetBox sync from {compose_file}")
+    state_file = os.getenv("IMPORT_STATE_FILE", "").strip('"').strip("'")
+    if not state_file:
+        state_file = os.path.join(active_root, "state", "import_inventory_state.json")
+    state = {} if args.force else load_state(state_file)
+
+    # Short-circuit: nothing to do when no compose file (or .env) changed
+    compose_files = get_compose_files(compose_file)
+    env_file = os.path.join(active_root, ".env")
+    hashed_files = compose_files + ([env_file] if os.path.exists(env_file) else [])
+    files_hash = hash_files(hashed_files, active_root)
+    if state.get("files_hash") == files_hash:
+        log_message("Compose files unchanged since the last sync. Nothing to do.")
+        return
+
+    log_message(f"Starting NetBox sync from {', '.join(compose_files)}")
 
-    services_dict = get_docker_services_with_images(compose_file)
+    services = get_compose_services(compose_files, load_compose_env(env_file))
+    service_hashes = {name: content_hash(cfg) for name, cfg in services.items()}
+    synced = state.get("services", {})
+
+    added = [n for n in service_hashes if n not in synced]
+    modified = [
+        n for n in service_hashes if n in synced and synced[n] != service_hashes[n]
+    ]
+    removed = [n for n in synced if n not in service_hashes]
+    log_message(
+        f"Services: {len(added)} added, {len(modified)} modified, "
+        f"{len(removed)} removed, "
+        f"{len(service_hashes) - len(added) - len(modified)} unchanged"
+    )
 
     # Ensure the target cluster exists in NetBox
     cluster = nb.virtualization.clusters.get(name="Sovereign-Pi-Cluster")
@@ -155,34 +412,52 @@ def main():
             "Cluster 'Sovereign-Pi-Cluster' not found. Create it in NetBox GUI first."
         )
 
-    # 5. Sync Loop
-    for service_name, image_name in services_dict.items():
+    ensure_custom_fields(nb)
+
+    # 5. Sync Loop: changes are queued and sent as bulk requests
+    cache = NetBoxCache(nb)
+    stats = SyncStats()
+    writer = BulkWriter(nb, stats=stats)
+
+    for service_name in added + modified:
+        custom_fields = extract_service_fields(services[service_name])
+        image_name = custom_fields["docker_image"]
         log_message(f"Syncing service: {service_name} (Image: {image_name})")
 
         vm_payload = {
             "name": service_name,
             "cluster": cluster.id,
             "status": "active",
-            "custom_fields": {"docker_image": image_name},
+            "custom_fields": custom_fields,
             "comments": f"Automated import from Sovereign Stack on {datetime.now().date()}",
         }
 
-        # Check for existing VM within the specific cluster
-        vm = nb.virtualization.virtual_machines.get(
-            name=service_name, cluster_id=cluster.id
-        )
+        # Check for existing VM within the specific cluster (prefetched)
+        vm = cache.get_vm(service_name, cluster.id)
 
-        try:
-            if vm:
-                # Update existing VM entry
-                vm.update(vm_payload)
-                log_message(f"Successfully updated VM: {service_name}")
-            else:
-                # Create new VM entry
-                nb.virtualization.virtual_machines.create(**vm_payload)
-                log_message(f"Successfully created VM: {service_name}")
-        except Exception as e:
-            log_message(f"Warning: Failed to sync {service_name}. Error: {e}")
+        if vm:
+            # Queue an update with only the changed fields
+            writer.update_record(VM_ENDPOINT, vm, vm_payload)
+        else:
+            # Queue a new VM entry
+            writer.create(VM_ENDPOINT, vm_payload)
+
+    # Removed services are not deleted, but marked for decommissioning
+    for service_name in removed:
+        vm = cache.get_vm(service_name, cluster.id)
+        if vm:
+            log_message(f"Decommissioning removed service: {service_name}")
+            writer.update_record(VM_ENDPOINT, vm, {"status": "decommissioning"})
+
+    log_message(f"Sending {writer.pending()} queued changes to NetBox...")
+    writer.flush()
+    log_message(f"NetBox sync summary: {stats.summary()}")
+    log_message(f"NetBox API: {nb.http_session.throttle.summary()}")
+
+    # Only remember the state when everything was written
+    if writer.failed:
+        fatal_error(f"{writer.failed} NetBox changes failed; state not updated.")
+    save_state(state_file, {"files_hash": files_hash, "services": service_hashes})
 
     log_message("Inventory synchronization completed successfully.")
 
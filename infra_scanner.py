@@ -23,15 +23,73 @@
 #    - NETBOX_API_TOKEN: API token for authentication
 #    - NETBOX_CLUSTER_MAPPING: Comma-separated IP:cluster pairs
 #    - REMOTE_HOSTS: Space-separated list of SSH hosts
+#      (hosts listening on another port than 22 set "ssh_port" in
+#      inventory.json)
+#    - SCAN_WORKERS: Number of hosts scanned in parallel (default: 8)
+#    - SCAN_HOST_DEADLINE: Seconds before a host scan is abandoned (default: 120)
+#    - SSH_COMMAND_TIMEOUT: Seconds a single remote command may block (default: 30)
+#    - SCAN_COLLECTOR: Collect all remote facts in one SSH round-trip (default: false)
+#    - SSH_KEEPALIVE: Keepalive interval of pooled SSH transports (default: 30)
+#    - SSH_MAX_CHANNELS: Concurrent SSH channels per host (default: 4)
+#    - SCAN_DOCKER_API: Read containers from the Docker Engine API over the
+#      SSH transport instead of `docker ps` (default: false); override per
+#      host with "docker_api" in inventory.json
+#    - SCAN_DOCKER_STATS: Also fetch one-shot /stats per container via the
+#      Docker API (default: false)
+#    - SCAN_SAMPLES: Resource samples (docker stats, vboxmanage metrics,
+#      /proc/loadavg) taken per host during the scan; 0 disables sampling
+#      (default: 0); override per host with "samples" in inventory.json
+#    - SCAN_SAMPLE_INTERVAL: Seconds between two samples (default: 2)
+#    - SCAN_VBOX_METRICS_SETUP: When sampling finds no VirtualBox metrics,
+#      run `vboxmanage metrics setup` on the host (default: false). Note:
+#      this changes the host's VirtualBox metrics configuration (1s period,
+#      until VBoxSVC restarts) and overrides settings made there.
+#    - PROBE_CONCURRENCY: Max. simultaneous HTTP probe connections (default: 64)
+#    - PROBE_TIMEOUT: Seconds per HTTP probe request (default: 3)
+#      Hosts with "probe": false in inventory.json are not probed.
+#    - SCAN_INTERVAL: Default seconds between scans of a host in daemon mode
+#      (default: 3600); override per host with "scan_interval" in inventory.json
+#    - SCAN_JITTER: Random spread applied to each interval, as a fraction
+#      (default: 0.1)
+#    - NETBOX_CACHE_TTL: Seconds the NetBox lookup cache is reused in daemon
+#      mode (default: 900)
+#    - NETBOX_RATE_LIMIT, NETBOX_MAX_CONCURRENCY, ...: NetBox API throttling,
+#      see netbox_sync.py
+#    - SCAN_STATE_FILE: Snapshot of the last synced results; only changed
+#      hosts/objects are synced (default: state/infra_scanner_state.json next
+#      to inventory.json)
+#    - SCAN_STATE_MAX_AGE: Seconds after which a host is synced in full again
+#      (default: 604800)
+#    - DISK_HISTORY_FILE: SQLite history of the host disk figures, used for
+#      the trend columns in the device comment (default:
+#      state/disk_history.sqlite next to inventory.json)
+#    - DISK_HISTORY_RAW_DAYS: Days raw disk samples are kept (default: 30)
+#    - DISK_HISTORY_HOURLY_DAYS: Days hourly rollups are kept (default: 365);
+#      daily rollups are kept forever
+#    - METRICS_PORT: Serve Prometheus metrics on this port in daemon mode
+#      (default: 0 = off); METRICS_ADDRESS sets the bind address
+#      (default: 0.0.0.0)
+#    - METRICS_TEXTFILE: Write Prometheus metrics to this file after a cron
+#      run, for the node_exporter textfile collector (default: off)
+#    - SCAN_TRACE_FILE: Write a Chrome trace JSON of every span of a run to
+#      this file (default: off); the per-phase timing table is always logged
 #
 # OUTPUT:
 #    - NetBox Virtual Machine updates
 #    - Detailed Markdown comments in NetBox
+#    - Optional Prometheus metrics (per-host scan duration, online status,
+#      SSH and NetBox request counts/latencies, disk space, containers, VMs)
 #
 # USAGE:
 #    # Cronjob (see crontab for timing):
 #    ./run_task.sh infra_scanner.py
 #
+#    # Long-running service with its own per-host scheduler:
+#    python3 infra_scanner.py --daemon
+#
+#    # Ignore the snapshot and push every object to NetBox once:
+#    python3 infra_scanner.py --full-sync
+#
 # SCHEDULED:
 #    Via cron: 0 1 * * * cd /home/$USER/docker && ./run_task.sh infra_scanner.py
 #
@@ -54,13 +112,38 @@
 
 import os
 import json
+import base64
+import time
+import heapq
+import sqlite3
+import random
+import signal
 import logging
-import paramiko
-import pynetbox
+import argparse
+import itertools
+import threading
 import requests
 import urllib3
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dotenv import load_dotenv
 
+from disk_history import DiskHistory
+from docker_api import collect_containers
+from http_probe import probe_hosts
+from metrics import MetricsRegistry
+from resource_sampler import format_resources, sample_resources
+from netbox_sync import (
+    BulkWriter,
+    NetBoxCache,
+    SyncStats,
+    apply_changes,
+    connect,
+    diff_record,
+    ensure_custom_fields,
+)
+from scan_state import ScanSnapshot
+from ssh_pool import SSHPool
+from tracing import TRACER, span, traced
 from version import __version__
 
 # Suppress insecure request warnings for self-signed certificates
@@ -96,87 +179,169 @@ if CLUSTER_MAP_ENV:
 
 logger.info(f"[Init] Parsed CLUSTER_MAPPING dictionary: {CLUSTER_MAPPING}")
 
+# Scan concurrency: hosts are scanned in parallel, NetBox writes stay serial.
+SCAN_WORKERS = max(1, int(os.getenv("SCAN_WORKERS", "8")))
+SCAN_HOST_DEADLINE = float(os.getenv("SCAN_HOST_DEADLINE", "120"))
+SSH_COMMAND_TIMEOUT = float(os.getenv("SSH_COMMAND_TIMEOUT", "30"))
+
+# Collector mode: gather all remote facts with one payload per host.
+# Can be overridden per host with "collector": true/false in inventory.json.
+SCAN_COLLECTOR = os.getenv("SCAN_COLLECTOR", "false").lower() in ("1", "true", "yes")
+
+# SSH session pool: keepalive interval and concurrent channels per host
+SSH_KEEPALIVE = int(os.getenv("SSH_KEEPALIVE", "30"))
+SSH_MAX_CHANNELS = int(os.getenv("SSH_MAX_CHANNELS", "4"))
+SCAN_DOCKER_API = os.getenv("SCAN_DOCKER_API", "false").lower() in ("1", "true", "yes")
+SCAN_DOCKER_STATS = os.getenv("SCAN_DOCKER_STATS", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+# Hosts whose Docker API failed before (the fallback is warned about once)
+DOCKER_API_FALLBACKS = set()
+
+# Resource sampling (see resource_sampler.py); runs alongside the collection
+SCAN_SAMPLES = int(os.getenv("SCAN_SAMPLES", "0"))
+SCAN_SAMPLE_INTERVAL = float(os.getenv("SCAN_SAMPLE_INTERVAL", "2"))
+SCAN_VBOX_METRICS_SETUP = os.getenv("SCAN_VBOX_METRICS_SETUP", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+# HTTP service probing (see http_probe.py for the fingerprint table)
+PROBE_CONCURRENCY = int(os.getenv("PROBE_CONCURRENCY", "64"))
+PROBE_TIMEOUT = float(os.getenv("PROBE_TIMEOUT", "3"))
+
+# Daemon mode scheduling
+SCAN_INTERVAL = float(os.getenv("SCAN_INTERVAL", "3600"))
+SCAN_JITTER = float(os.getenv("SCAN_JITTER", "0.1"))
+NETBOX_CACHE_TTL = float(os.getenv("NETBOX_CACHE_TTL", "900"))
+DAEMON_POLL_SECONDS = 30
+
+# Incremental sync: snapshot of the last synced scan results
+SCAN_STATE_FILE = os.getenv("SCAN_STATE_FILE", "")
+SCAN_STATE_MAX_AGE = float(os.getenv("SCAN_STATE_MAX_AGE", str(7 * 86400)))
+
+# Disk usage history (see disk_history.py)
+DISK_HISTORY_FILE = os.getenv("DISK_HISTORY_FILE", "")
+DISK_HISTORY_RAW_DAYS = float(os.getenv("DISK_HISTORY_RAW_DAYS", "30"))
+DISK_HISTORY_HOURLY_DAYS = float(os.getenv("DISK_HISTORY_HOURLY_DAYS", "365"))
+
+# Prometheus metrics (see metrics.py)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_ADDRESS = os.getenv("METRICS_ADDRESS", "0.0.0.0")
+METRICS_TEXTFILE = os.getenv("METRICS_TEXTFILE", "")
+
+# Span tracing (see tracing.py): keep every span only for a trace file
+SCAN_TRACE_FILE = os.getenv("SCAN_TRACE_FILE", "")
+TRACER.keep_events = bool(SCAN_TRACE_FILE)
+
+SCANNER_METRICS = [
+    ("sovereign_scanner_host_up", "gauge", "1 if the host answered the last scan"),
+    (
+        "sovereign_scanner_host_scan_duration_seconds",
+        "gauge",
+        "Duration of the last scan of the host",
+    ),
+    (
+        "sovereign_scanner_host_last_scan_timestamp_seconds",
+        "gauge",
+        "Unix time of the last successful scan of the host",
+    ),
+    ("sovereign_scanner_host_containers", "gauge", "Containers found on the host"),
+    ("sovereign_scanner_host_vms", "gauge", "VirtualBox VMs found on the host"),
+    ("sovereign_scanner_host_disk_size_bytes", "gauge", "Size of a host disk"),
+    ("sovereign_scanner_host_disk_free_bytes", "gauge", "Free space of a host disk"),
+    ("sovereign_scanner_ssh_handshakes_total", "counter", "SSH connections opened"),
+    (
+        "sovereign_scanner_ssh_handshake_seconds_total",
+        "counter",
+        "Time spent connecting and authenticating over SSH",
+    ),
+    ("sovereign_scanner_ssh_commands_total", "counter", "Remote commands executed"),
+    (
+        "sovereign_scanner_ssh_command_seconds_total",
+        "counter",
+        "Time spent running remote commands",
+    ),
+    (
+        "sovereign_scanner_netbox_concurrency_window",
+        "gauge",
+        "NetBox requests allowed in flight (shrinks when NetBox is overloaded)",
+    ),
+    (
+        "sovereign_scanner_netbox_retries_total",
+        "counter",
+        "NetBox requests retried after a 429, 5xx or connection error",
+    ),
+    (
+        "sovereign_scanner_netbox_throttle_seconds_total",
+        "counter",
+        "Time requests waited for the NetBox rate limit",
+    ),
+    (
+        "sovereign_scanner_cycle_duration_seconds",
+        "gauge",
+        "Duration of the last scan and sync cycle",
+    ),
+    (
+        "sovereign_scanner_last_cycle_timestamp_seconds",
+        "gauge",
+        "Unix time the last scan and sync cycle finished",
+    ),
+]
+
+METRICS = MetricsRegistry()
+for metric_name, metric_type, metric_help in SCANNER_METRICS:
+    METRICS.describe(metric_name, metric_type, metric_help)
+
 nb_client = None
 if NETBOX_URL and NETBOX_TOKEN and not DRY_RUN:
     try:
-        nb_client = pynetbox.api(NETBOX_URL, token=NETBOX_TOKEN)
+        nb_client = connect(NETBOX_URL, NETBOX_TOKEN)
         nb_client.http_session.timeout = 10
+        METRICS.instrument_session(nb_client.http_session, "sovereign_scanner_netbox")
+        TRACER.instrument_session(nb_client.http_session, "netbox")
     except Exception as init_err:
         logger.error(f"NetBox Init Error: {init_err}")
 
 
-def ensure_custom_fields(nb):
-    """Ensure required custom fields exist in NetBox for Virtual Machines."""
-    if not nb:
-        return
-    try:
-        fields_to_create = [
-            {
-                "name": "docker_port",
-                "label": "Docker Port",
-                "type": "text",
-                "weight": 100,
-                "description": "External port(s) mapped on the host",
-                "filter_logic": "loose",
-                "ui_visibility": "read-write",
-                "object_types": ["virtualization.virtualmachine"],
-            },
-            {
-                "name": "public_url",
-                "label": "Public URL",
-                "type": "url",
-                "weight": 110,
-                "description": "Direct link to the web interface",
-                "filter_logic": "loose",
-                "ui_visibility": "read-write",
-                "object_types": ["virtualization.virtualmachine"],
-            },
-            {
-                "name": "docker_image",
-                "label": "Docker Image",
-                "type": "text",
-                "weight": 120,
-                "description": "The container image name",
-                "filter_logic": "loose",
-                "ui_visibility": "read-write",
-                "object_types": ["virtualization.virtualmachine"],
-            },
-        ]
-        for f in fields_to_create:
-            try:
-                if not nb.extras.custom_fields.get(name=f["name"]):
-                    nb.extras.custom_fields.create(f)
-                    logger.info(f"  [NetBox] Custom Field '{f['name']}' created.")
-            except Exception as cf_err:
-                logger.warning(f"  [NetBox] Skipped creating '{f['name']}': {cf_err}")
-    except Exception as e:
-        logger.warning(f"  [NetBox] Could not setup Custom Fields: {e}")
+def new_ssh_pool():
+    """Create an SSH session pool with the configured timeouts."""
+    return SSHPool(
+        connect_timeout=5,
+        command_timeout=SSH_COMMAND_TIMEOUT,
+        keepalive=SSH_KEEPALIVE,
+        max_channels=SSH_MAX_CHANNELS,
+    )
 
 
-# noinspection HttpUrlsUsage
-def verify_octoprint_html(ip):
-    """Check for OctoPrint over both HTTP and HTTPS, handling redirects."""
-    endpoints = [
-        f"http://{ip}:80",
-        f"http://{ip}:5000",
-        f"https://{ip}:443",
-        f"https://{ip}:5000",
-    ]
-    for url in endpoints:
-        try:
-            # noinspection HttpUrlsUsage
-            response = requests.get(url, timeout=3, verify=False, allow_redirects=True)
-
-            # Check for either the standard title or the specific redirect URI
-            if response.status_code in [200, 302]:
-                if (
-                    "<title>OctoPrint" in response.text
-                    or "permissions=STATUS" in response.text
-                ):
-                    return True
-        except requests.RequestException:
-            continue
-    return False
+@traced()
+def probe_services(ips, fingerprints=None):
+    """Detect web services on the given IPs with the async probe engine."""
+    return probe_hosts(
+        ips, fingerprints, concurrency=PROBE_CONCURRENCY, timeout=PROBE_TIMEOUT
+    )
+
+
+def apply_probe_results(host_info, scan_results, services):
+    """Record matched service fingerprints in a host's scan results.
+
+    A host that could not be scanned but answers with a known web interface
+    (e.g. OctoPrint) is still reported, as offline.
+    """
+    if scan_results is None:
+        if not services:
+            return None
+        logger.info(
+            f"  [Scan] {host_info['name']} could not be scanned, but web "
+            f"services were found on {host_info['ip']}: {', '.join(services)}."
+        )
+        scan_results = {"vms": [], "containers": [], "host_disks": [], "online": False}
+    scan_results["services"] = services
+    scan_results["octoprint"] = "octoprint" in services
+    return scan_results
 
 
 def parse_docker_ports(raw_ports):
@@ -199,13 +364,78 @@ def parse_docker_ports(raw_ports):
     return ""
 
 
-def load_local_config():
+def local_config_paths():
     inv_path = "/app/inventory.json"
     creds_path = "/app/credentials.json"
 
     if not os.path.exists(inv_path):
         inv_path = "inventory.json"
         creds_path = "credentials.json"
+    return inv_path, creds_path
+
+
+def local_config_stamp():
+    """Return the modification times of the config files (None if missing)."""
+    try:
+        return tuple(os.path.getmtime(path) for path in local_config_paths())
+    except OSError:
+        return None
+
+
+def new_snapshot(full_sync=False):
+    """Open the scan snapshot; it lives next to inventory.json by default."""
+    path = SCAN_STATE_FILE
+    if not path:
+        inv_dir = os.path.dirname(local_config_paths()[0])
+        path = os.path.join(inv_dir, "state", "infra_scanner_state.json")
+    return ScanSnapshot(path, max_age=SCAN_STATE_MAX_AGE, full_sync=full_sync)
+
+
+def new_disk_history():
+    """Open the disk history; it lives next to inventory.json by default.
+
+    Returns None (and scans run without trends) when it cannot be opened.
+    """
+    path = DISK_HISTORY_FILE
+    if not path:
+        inv_dir = os.path.dirname(local_config_paths()[0])
+        path = os.path.join(inv_dir, "state", "disk_history.sqlite")
+    try:
+        return DiskHistory(
+            path, raw_days=DISK_HISTORY_RAW_DAYS, hourly_days=DISK_HISTORY_HOURLY_DAYS
+        )
+    except (OSError, sqlite3.Error) as hist_err:
+        logger.warning(f"[History] Could not open {path}: {hist_err}")
+        return None
+
+
+def format_full_in(days):
+    """Render a days-until-full projection coarsely, so it rarely changes."""
+    if days is None or days > 730:
+        return "stable"
+    if days < 1:
+        return "< 1 day"
+    if days < 14:
+        return f"~{round(days)} days"
+    if days < 90:
+        return f"~{round(days / 7)} weeks"
+    return f"~{round(days / 30)} months"
+
+
+def record_disk_history(history, name, host_disks):
+    """Append a host's disk figures to the history and attach the trends."""
+    history.record(name, host_disks)
+    for d in host_disks:
+        trend = history.trend(name, d.get("mount") or d.get("disk"))
+        change = trend["change_7d"]
+        d["trend"] = {
+            "change_7d": round(change) if change is not None else None,
+            "full_in": format_full_in(trend["days_until_full"]),
+        }
+
+
+def load_local_config():
+    inv_path, creds_path = local_config_paths()
 
     try:
         with open(inv_path, "r") as f_inv:
@@ -229,141 +459,453 @@ def get_connection_details(host_name, creds_config):
     }
 
 
-def scan_host(host_info, auth_creds):
+# --- Remote fact parsers ---
+# Shared by the per-command scan and the single-round-trip collector payload.
+
+
+def parse_vm_list(text):
+    """Return the accessible VM names from `vboxmanage list vms`."""
+    names = []
+    for line in text.splitlines():
+        if '"' in line and "<inaccessible>" not in line:
+            names.append(line.split('"')[1])
+    return names
+
+
+def parse_vm_info(text):
+    """Return (memory, vcpus, disk_uuid) from `showvminfo --machinereadable`."""
+    memory, vcpus, disk_uuid = None, None, None
+    for line in text.splitlines():
+        if line.startswith("memory="):
+            memory = int(line.split("=")[1])
+        elif line.startswith("cpus="):
+            vcpus = float(line.split("=")[1])
+        elif "ImageUUID-0-0" in line:
+            uuid_val = line.split("=")[1].strip('"')
+            if uuid_val != "none":
+                disk_uuid = uuid_val
+    return memory, vcpus, disk_uuid
+
+
+def parse_medium_capacity(text):
+    """Return the disk capacity in GB from `vboxmanage showmediuminfo`."""
+    for line in text.splitlines():
+        if line.startswith("Capacity:"):
+            try:
+                cap_str = line.split(":")[1].strip().split()[0]
+                return int(cap_str) // 1024
+            except (ValueError, IndexError):
+                return None
+    return None
+
+
+def parse_guest_ip(text):
+    """Return the guest IPv4 address from `vboxmanage guestproperty get`."""
+    text = text.strip()
+    if "Value: " in text:
+        return text.split("Value: ")[1]
+    return None
+
+
+def parse_docker_ps(text):
+    """Parse JSON lines from `docker ps --format` into container records.
+
+    Accepts both our own template and Docker's native `{{json .}}` output.
+    """
+    containers = []
+    for line in text.splitlines():
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if "Names" in data:
+            data = {
+                "name": data.get("Names"),
+                "image": data.get("Image"),
+                "created": data.get("CreatedAt"),
+                "ports": data.get("Ports", ""),
+            }
+        containers.append(data)
+    return containers
+
+
+def parse_df(text):
+    """Parse `df -BG` lines for /dev/ filesystems into host disk records."""
+    disks = []
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) >= 6 and parts[0].startswith("/dev/"):
+            disks.append(
+                {
+                    "disk": parts[0],
+                    "size_gb": parts[1].replace("G", ""),
+                    "free_gb": parts[3].replace("G", ""),
+                    "mount": parts[5],
+                }
+            )
+    return disks
+
+
+def parse_wmic(text):
+    """Parse `wmic logicaldisk get Caption,FreeSpace,Size` into disk records."""
+    disks = []
+    for line in text.splitlines():
+        parts = line.strip().split()
+        if len(parts) >= 3 and parts[0] != "Caption":
+            try:
+                drive = parts[0]
+                free_b = int(parts[1])
+                size_b = int(parts[2])
+                disks.append(
+                    {
+                        "disk": drive,
+                        "size_gb": size_b // (1024**3),
+                        "free_gb": free_b // (1024**3),
+                        "mount": drive,
+                    }
+                )
+            except (ValueError, IndexError):
+                continue
+    return disks
+
+
+# --- Remote fact collection ---
+# Both collection paths return the same raw document:
+#   {"vm_list": str, "vms": {name: {"info", "medium", "guestip"}},
+#    "docker": str, "df": str, "wmic": str}
+# which build_scan_results() decodes with the parsers above.
+
+DOCKER_PS_CMD = (
+    'docker ps --format \'{"name": "{{.Names}}", '
+    '"image": "{{.Image}}", "created": "{{.CreatedAt}}", '
+    '"ports": "{{.Ports}}"}\''
+)
+
+COLLECTOR_BEGIN = "@@SOVEREIGN-COLLECT-BEGIN@@"
+COLLECTOR_END = "@@SOVEREIGN-COLLECT-END@@"
+COLLECTOR_SECTION = "@@SOVEREIGN-SECTION@@ "
+
+COLLECTOR_SH = r"""
+frame() { printf '\n@@SOVEREIGN-SECTION@@ %s\n' "$1"; }
+echo '@@SOVEREIGN-COLLECT-BEGIN@@'
+if command -v vboxmanage >/dev/null 2>&1; then
+    vms=$(vboxmanage list vms 2>/dev/null)
+    frame vms
+    printf '%s\n' "$vms"
+    printf '%s\n' "$vms" | grep -v '<inaccessible>' | sed -n 's/^"\(.*\)" {.*}$/\1/p' |
+    while IFS= read -r vm; do
+        info=$(vboxmanage showvminfo "$vm" --machinereadable 2>/dev/null)
+        frame "vminfo $vm"
+        printf '%s\n' "$info"
+        uuid=$(printf '%s\n' "$info" | grep 'ImageUUID-0-0' | head -n 1 | cut -d= -f2 | tr -d '"')
+        if [ -n "$uuid" ] && [ "$uuid" != "none" ]; then
+            frame "medium $vm"
+            vboxmanage showmediuminfo disk "$uuid" 2>/dev/null
+        fi
+        frame "guestip $vm"
+        vboxmanage guestproperty get "$vm" "/VirtualBox/GuestInfo/Net/0/V4/IP" 2>/dev/null
+    done
+fi
+if [ -z "$SOVEREIGN_SKIP_DOCKER" ] && command -v docker >/dev/null 2>&1; then
+    frame docker
+    docker ps --format '{{json .}}' 2>/dev/null
+fi
+frame df
+df -BG 2>/dev/null | grep '^/dev/'
+echo
+echo '@@SOVEREIGN-COLLECT-END@@'
+"""
+
+COLLECTOR_PS = r"""
+$ErrorActionPreference = 'SilentlyContinue'
+function Frame($n) { Write-Output "@@SOVEREIGN-SECTION@@ $n" }
+Write-Output '@@SOVEREIGN-COLLECT-BEGIN@@'
+if (Get-Command vboxmanage) {
+    $vms = & vboxmanage list vms
+    Frame 'vms'
+    $vms
+    foreach ($line in $vms) {
+        if ($line -match '^"(.+)" \{' -and $line -notmatch '<inaccessible>') {
+            $vm = $Matches[1]
+            $info = & vboxmanage showvminfo "$vm" --machinereadable
+            Frame "vminfo $vm"
+            $info
+            $uuid = ($info | Select-String 'ImageUUID-0-0="(.+)"' |
+                Select-Object -First 1).Matches.Groups[1].Value
+            if ($uuid -and $uuid -ne 'none') {
+                Frame "medium $vm"
+                & vboxmanage showmediuminfo disk "$uuid"
+            }
+            Frame "guestip $vm"
+            & vboxmanage guestproperty get "$vm" "/VirtualBox/GuestInfo/Net/0/V4/IP"
+        }
+    }
+}
+if (Get-Command docker) {
+    Frame 'docker'
+    & docker ps --format '{{json .}}'
+}
+Frame 'wmic'
+& wmic logicaldisk get Caption,FreeSpace,Size
+Write-Output '@@SOVEREIGN-COLLECT-END@@'
+"""
+
+
+def _empty_raw_document():
+    return {"vm_list": "", "vms": {}, "docker": "", "df": "", "wmic": ""}
+
+
+@traced()
+def collect_per_command(session, docker=True):
+    """Gather remote facts with one SSH channel per command.
+
+    Independent commands (per-VM queries, docker/df) run concurrently as
+    channels on the session's shared transport. With docker=False the
+    `docker ps` query is skipped (containers come from the Docker API).
+    """
+    doc = _empty_raw_document()
+    doc["vm_list"], doc["docker"], doc["df"] = session.run_many(
+        [
+            "vboxmanage list vms",
+            DOCKER_PS_CMD if docker else "true",
+            "df -BG | grep '^/dev/'",
+        ]
+    )
+
+    vm_names = parse_vm_list(doc["vm_list"])
+    with span("vboxmanage showvminfo"):
+        infos = session.run_many(
+            [
+                f'vboxmanage showvminfo "{vm_name}" --machinereadable'
+                for vm_name in vm_names
+            ]
+        )
+
+    follow_up = []
+    for vm_name, info in zip(vm_names, infos):
+        doc["vms"][vm_name] = {"info": info, "medium": "", "guestip": ""}
+        disk_uuid = parse_vm_info(info)[2]
+        if disk_uuid:
+            follow_up.append(
+                (vm_name, "medium", f'vboxmanage showmediuminfo disk "{disk_uuid}"')
+            )
+        follow_up.append(
+            (
+                vm_name,
+                "guestip",
+                f'vboxmanage guestproperty get "{vm_name}" '
+                '"/VirtualBox/GuestInfo/Net/0/V4/IP"',
+            )
+        )
+    with span("vboxmanage medium/guestip"):
+        outputs = session.run_many([cmd for _, _, cmd in follow_up])
+    for (vm_name, field, _), output in zip(follow_up, outputs):
+        doc["vms"][vm_name][field] = output
+
+    if not doc["df"].strip():
+        doc["wmic"] = session.run("wmic logicaldisk get Caption,FreeSpace,Size")
+    return doc
+
+
+def decode_collector_output(raw):
+    """Split the framed collector output into a raw fact document."""
+    if COLLECTOR_BEGIN not in raw or COLLECTOR_END not in raw:
+        raise ValueError("collector output is missing its frame markers")
+    body = raw.split(COLLECTOR_BEGIN, 1)[1].split(COLLECTOR_END, 1)[0]
+
+    sections = []
+    for line in body.splitlines():
+        line = line.rstrip("\r")
+        if line.startswith(COLLECTOR_SECTION):
+            sections.append((line.partition(COLLECTOR_SECTION)[2], []))
+        elif sections:
+            sections[-1][1].append(line)
+
+    doc = _empty_raw_document()
+    for header, lines in sections:
+        text = "\n".join(lines).strip("\n")
+        kind, _, vm_name = header.partition(" ")
+        if kind == "vms":
+            doc["vm_list"] = text
+        elif kind in ("vminfo", "medium", "guestip"):
+            vm_doc = doc["vms"].setdefault(
+                vm_name, {"info": "", "medium": "", "guestip": ""}
+            )
+            vm_doc["info" if kind == "vminfo" else kind] = text
+        elif kind in ("docker", "df", "wmic"):
+            doc[kind] = text
+    return doc
+
+
+@traced()
+def collect_with_payload(session, host_type, docker=True):
+    """Gather all remote facts in a single round-trip.
+
+    Linux hosts get a POSIX shell payload on stdin, Windows hosts an encoded
+    PowerShell payload. Section framing keeps the output parseable even when
+    the login shell prints a banner or MOTD.
+    """
+    if host_type == "windows":
+        encoded = base64.b64encode(COLLECTOR_PS.encode("utf-16-le")).decode()
+        raw = session.run(
+            f"powershell -NoProfile -NonInteractive -EncodedCommand {encoded}"
+        )
+    else:
+        skip = "" if docker else "SOVEREIGN_SKIP_DOCKER=1 "
+        raw = session.run(f"{skip}sh -s", stdin_data=COLLECTOR_SH)
+    return decode_collector_output(raw)
+
+
+def build_scan_results(doc, results):
+    """Decode a raw fact document into the scan results structure."""
+    for vm_name in parse_vm_list(doc["vm_list"]):
+        vm_doc = doc["vms"].get(vm_name, {})
+        memory, vcpus, _ = parse_vm_info(vm_doc.get("info", ""))
+        results["vms"].append(
+            {
+                "name": vm_name,
+                "memory": memory,
+                "vcpus": vcpus,
+                "disk": parse_medium_capacity(vm_doc.get("medium", "")),
+                "ip": parse_guest_ip(vm_doc.get("guestip", "")),
+            }
+        )
+
+    results["containers"].extend(parse_docker_ps(doc["docker"]))
+    results["host_disks"].extend(parse_df(doc["df"]) or parse_wmic(doc["wmic"]))
+    return results
+
+
+def use_collector(host_info):
+    """Return True when the host should be scanned with the collector payload."""
+    return bool(host_info.get("collector", SCAN_COLLECTOR))
+
+
+def use_docker_api(host_info):
+    """Return True when containers should be read from the Docker API."""
+    if host_info.get("type", "linux") == "windows":
+        return False
+    return bool(host_info.get("docker_api", SCAN_DOCKER_API))
+
+
+def sample_count(host_info):
+    """Return the number of resource samples to take of a host (0 = off)."""
+    if host_info.get("type", "linux") == "windows":
+        return 0
+    return int(host_info.get("samples", SCAN_SAMPLES))
+
+
+def apply_resources(results, resources):
+    """Attach aggregated resource usage to the container and VM records."""
+    results["host_load"] = resources["host"]
+    for kind in ("containers", "vms"):
+        for record in results[kind]:
+            usage = resources[kind].get(record.get("name"))
+            if usage:
+                record["resources"] = usage
+
+
+@traced()
+def scan_host(host_info, auth_creds, pool=None, probe=True):
     ip = host_info["ip"]
     name = host_info["name"]
+    ssh_port = int(host_info.get("ssh_port", 22))
+
+    # Execute the HTTP scan regardless of the SSH status. scan_inventory()
+    # probes all hosts at once and passes probe=False.
+    services = probe_services([ip]).get(ip, []) if probe else []
     results = {
         "vms": [],
         "containers": [],
         "host_disks": [],
-        "octoprint": verify_octoprint_html(ip),
+        "octoprint": "octoprint" in services,
+        "services": services,
         "online": False,
     }
 
-    # Execute the HTTP scan regardless of the SSH status
-
-    ssh = paramiko.SSHClient()
-    ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    own_pool = pool is None
+    if own_pool:
+        pool = new_ssh_pool()
+    sampler = None
     try:
         logger.info(f"Connecting to {name} ({ip})...")
-        ssh.connect(
-            ip, username=auth_creds["user"], password=auth_creds["pass"], timeout=5
-        )
+        with span("ssh.connect", host=name):
+            session = pool.session(
+                ip, auth_creds["user"], auth_creds["pass"], port=ssh_port
+            )
         results["online"] = True
 
-        _, stdout, _ = ssh.exec_command("vboxmanage list vms")
-        vm_lines = stdout.read().decode().splitlines()
-        for line in vm_lines:
-            if '"' in line and "<inaccessible>" not in line:
-                vm_name = line.split('"')[1]
-                vm_data = {
-                    "name": vm_name,
-                    "memory": None,
-                    "vcpus": None,
-                    "disk": None,
-                    "ip": None,
-                }
+        # The samples are spread over a window, so take them in parallel
+        # with the collection on a separate channel of the same transport.
+        samples = sample_count(host_info)
+        if samples > 0:
+            sampler = ThreadPoolExecutor(max_workers=1)
+            sampled = sampler.submit(
+                traced()(sample_resources),
+                session,
+                samples,
+                SCAN_SAMPLE_INTERVAL,
+                SCAN_VBOX_METRICS_SETUP,
+            )
 
-                info_cmd = f'vboxmanage showvminfo "{vm_name}" --machinereadable'
-                _, info_out, _ = ssh.exec_command(info_cmd)
-                disk_uuid = None
-
-                for iline in info_out.read().decode().splitlines():
-                    if iline.startswith("memory="):
-                        vm_data["memory"] = int(iline.split("=")[1])
-                    elif iline.startswith("cpus="):
-                        vm_data["vcpus"] = float(iline.split("=")[1])
-                    elif "ImageUUID-0-0" in iline:
-                        uuid_val = iline.split("=")[1].strip('"')
-                        if uuid_val != "none":
-                            disk_uuid = uuid_val
-
-                if disk_uuid:
-                    disk_cmd = f'vboxmanage showmediuminfo disk "{disk_uuid}"'
-                    _, disk_out, _ = ssh.exec_command(disk_cmd)
-                    for dline in disk_out.read().decode().splitlines():
-                        if dline.startswith("Capacity:"):
-                            try:
-                                cap_str = dline.split(":")[1].strip().split()[0]
-                                vm_data["disk"] = int(cap_str) // 1024
-                            except (ValueError, IndexError):
-                                pass
-                            break
-
-                ip_cmd = (
-                    f'vboxmanage guestproperty get "{vm_name}" '
-                    '"/VirtualBox/GuestInfo/Net/0/V4/IP"'
+        containers = None
+        if use_docker_api(host_info):
+            try:
+                with span("docker_api", host=name):
+                    containers = collect_containers(
+                        session, with_stats=SCAN_DOCKER_STATS
+                    )
+            except Exception as api_err:
+                # Warn once per host; in daemon mode the cause rarely changes
+                log = logger.debug if name in DOCKER_API_FALLBACKS else logger.warning
+                DOCKER_API_FALLBACKS.add(name)
+                log(f"  [Docker API] {name}: {api_err}. Falling back to docker ps.")
+        docker_ps = containers is None
+
+        doc = None
+        if use_collector(host_info):
+            try:
+                doc = collect_with_payload(
+                    session, host_info.get("type", "linux"), docker=docker_ps
                 )
-                _, ip_out, _ = ssh.exec_command(ip_cmd)
-                ip_resp = ip_out.read().decode().strip()
-                if "Value: " in ip_resp:
-                    vm_data["ip"] = ip_resp.split("Value: ")[1]
-
-                results["vms"].append(vm_data)
+            except Exception as col_err:
+                logger.warning(
+                    f"  [Collector] {name}: {col_err}. Falling back to per-command scan."
+                )
+        if doc is None:
+            doc = collect_per_command(session, docker=docker_ps)
 
-        docker_cmd = (
-            'docker ps --format \'{"name": "{{.Names}}", '
-            '"image": "{{.Image}}", "created": "{{.CreatedAt}}", '
-            '"ports": "{{.Ports}}"}\''
-        )
-        _, stdout, _ = ssh.exec_command(docker_cmd)
+        build_scan_results(doc, results)
+        if containers is not None:
+            results["containers"] = containers
 
-        for line in stdout.read().decode().splitlines():
+        if sampler is not None:
             try:
-                results["containers"].append(json.loads(line))
-            except json.JSONDecodeError:
-                continue
-
-        _, stdout_df, _ = ssh.exec_command("df -BG | grep '^/dev/'")
-        df_out = stdout_df.read().decode().splitlines()
-        if df_out:
-            for line in df_out:
-                parts = line.split()
-                if len(parts) >= 6:
-                    results["host_disks"].append(
-                        {
-                            "disk": parts[0],
-                            "size_gb": parts[1].replace("G", ""),
-                            "free_gb": parts[3].replace("G", ""),
-                            "mount": parts[5],
-                        }
-                    )
-        else:
-            cmd = "wmic logicaldisk get Caption,FreeSpace,Size"
-            _, stdout_wmic, _ = ssh.exec_command(cmd)
-            wmic_out = stdout_wmic.read().decode().splitlines()
-            for line in wmic_out:
-                parts = line.strip().split()
-                if len(parts) >= 3 and parts[0] != "Caption":
-                    try:
-                        drive = parts[0]
-                        free_b = int(parts[1])
-                        size_b = int(parts[2])
-                        results["host_disks"].append(
-                            {
-                                "disk": drive,
-                                "size_gb": size_b // (1024**3),
-                                "free_gb": free_b // (1024**3),
-                                "mount": drive,
-                            }
-                        )
-                    except (ValueError, IndexError):
-                        continue
+                apply_resources(results, sampled.result())
+            except Exception as sample_err:
+                logger.warning(f"  [Sampling] {name}: {sample_err}")
 
         logger.info(f"  [Scan] Found {len(results['host_disks'])} host disks.")
+        logger.info(f"  [SSH] {name}: {pool.summary(ip)}")
         return results
     except Exception as e:
         logger.warning(f"  [Offline] {name}: {e}")
-        if results["octoprint"]:
+        pool.discard(ip, auth_creds["user"], port=ssh_port)
+        if results["services"]:
             logger.info(
-                f"  [Scan] SSH failed, but OctoPrint web interface found on {ip}."
+                f"  [Scan] SSH failed, but web services were found on {ip}: "
+                f"{', '.join(results['services'])}."
             )
             return results
         return None
     finally:
-        ssh.close()
+        if sampler is not None:
+            sampler.shutdown(wait=False)
+        if own_pool:
+            pool.close_all()
 
 
+@traced()
 def scan_synology_nas(host_info, api_creds):
     """Scan Synology NAS using DSM API for storage/volume info."""
     ip = host_info["ip"]
@@ -447,7 +989,8 @@ def scan_synology_nas(host_info, api_creds):
         return None
 
 
-def sync_device_to_netbox(nb, name, host_disks):
+@traced()
+def sync_device_to_netbox(nb, name, host_disks, stats=None):
     if not host_disks:
         return
 
@@ -458,16 +1001,30 @@ def sync_device_to_netbox(nb, name, host_disks):
         logger.warning(f"  [NetBox] Device EXACT MATCH for '{name}' NOT FOUND.")
         return
 
-    logger.info(f"  [NetBox] Device '{name}' found. Updating comments...")
+    logger.info(f"  [NetBox] Device '{name}' found. Comparing comments...")
 
-    md_lines = [
-        "### Host Disk Storage",
-        "| Drive/Mount | Total Size (GB) | Free Space (GB) |",
-        "|---|---|---|",
-    ]
+    with_trend = all("trend" in d for d in host_disks)
+    if with_trend:
+        md_lines = [
+            "### Host Disk Storage",
+            "| Drive/Mount | Total Size (GB) | Free Space (GB) "
+            "| 7-Day Change (GB) | Full In |",
+            "|---|---|---|---|---|",
+        ]
+    else:
+        md_lines = [
+            "### Host Disk Storage",
+            "| Drive/Mount | Total Size (GB) | Free Space (GB) |",
+            "|---|---|---|",
+        ]
 
     for d in host_disks:
-        md_lines.append(f"| `{d['disk']}` | {d['size_gb']} | {d['free_gb']} |")
+        row = f"| `{d['disk']}` | {d['size_gb']} | {d['free_gb']} |"
+        if with_trend:
+            change = d["trend"]["change_7d"]
+            change = "n/a" if change is None else f"{change:+d}"
+            row += f" {change} | {d['trend']['full_in']} |"
+        md_lines.append(row)
 
     if name.lower() == "mail":
         md_lines.append(
@@ -478,23 +1035,29 @@ def sync_device_to_netbox(nb, name, host_disks):
 
     md_lines.append("\n*Auto-discovered by Sovereign Stack Infra-Scanner.*")
 
-    device.comments = "\n".join(md_lines)
-    device.save()
-    logger.info(f"  [NetBox] Host disks successfully synced to Device '{name}'.")
+    if apply_changes(device, {"comments": "\n".join(md_lines)}, stats, "devices"):
+        logger.info(f"  [NetBox] Host disks successfully synced to Device '{name}'.")
+    else:
+        logger.info(f"  [NetBox] Host disks of Device '{name}' unchanged.")
+
+
+VM_ENDPOINT = "virtualization.virtual_machines"
+VM_INTERFACE_ENDPOINT = "virtualization.interfaces"
+IP_ENDPOINT = "ipam.ip_addresses"
 
 
-def sync_vm_to_netbox(
-    nb,
+def build_vm_params(
     name,
     cluster_id,
     comments,
     vcpus=None,
     memory=None,
     disk=None,
-    ip_address=None,
     docker_ports=None,
     docker_image=None,
+    resources=None,
 ):
+    """Build the desired NetBox state of a Virtual Machine."""
     vm_params = {
         "name": name,
         "cluster": cluster_id,
@@ -513,65 +1076,154 @@ def sync_vm_to_netbox(
         vm_params["custom_fields"]["docker_port"] = docker_ports
     if docker_image:
         vm_params["custom_fields"]["docker_image"] = docker_image
+    if resources:
+        cpu_usage, memory_usage = format_resources(resources)
+        vm_params["custom_fields"]["cpu_usage"] = cpu_usage
+        vm_params["custom_fields"]["memory_usage"] = memory_usage
+    return vm_params
 
-    vm = nb.virtualization.virtual_machines.get(name=name, cluster_id=cluster_id)
-    if not vm:
-        vm = nb.virtualization.virtual_machines.create(vm_params)
-    else:
-        for key, value in vm_params.items():
-            if key == "custom_fields":
-                current_cfs = getattr(vm, "custom_fields", {})
-                if isinstance(current_cfs, dict):
-                    current_cfs.update(value)
-                    setattr(vm, "custom_fields", current_cfs)
-            else:
-                setattr(vm, key, value)
-        vm.save()
-
-    if ip_address and not ip_address.startswith("10.0.2."):
-        if "/" not in ip_address:
-            ip_address = f"{ip_address}/24"
 
+def normalize_vm_ip(ip_address):
+    """Return the address in CIDR notation, or None for unset/NAT addresses."""
+    if not ip_address or ip_address.startswith("10.0.2."):
+        return None
+    if "/" not in ip_address:
+        ip_address = f"{ip_address}/24"
+    return ip_address
+
+
+@traced()
+def sync_vms_to_netbox(nb, cluster_id, vm_specs, cache=None, stats=None):
+    """Sync the VMs of one cluster using bulk requests.
+
+    `vm_specs` is a list of (vm_params, ip_address) tuples. The sync runs in
+    batches so that ids created in one batch can be referenced by the next:
+    VMs, eth0 interfaces, IP addresses and finally the primary IPs. Returns
+    False if any bulk request failed.
+    """
+    cache = cache or NetBoxCache(nb)
+    writer = BulkWriter(nb, stats=stats)
+    vms, interfaces, ips = {}, {}, {}
+
+    def keep_vm(record):
+        vms[record.name] = record
+        cache.add_vm(record, cluster_id)
+
+    def keep_interface(record):
+        cache.add_vm_interface(record)
+        interfaces[record.virtual_machine.id] = record
+
+    def keep_ip(vm_id):
+        def callback(record):
+            cache.add_ip(record)
+            ips[vm_id] = record
+
+        return callback
+
+    # 1. Virtual Machines
+    for vm_params, _ in vm_specs:
+        vm = cache.get_vm(vm_params["name"], cluster_id)
+        if vm:
+            vms[vm.name] = vm
+            writer.update_record(VM_ENDPOINT, vm, vm_params, keep_vm)
+        else:
+            writer.create(VM_ENDPOINT, vm_params, keep_vm)
+    writer.flush()
+
+    wanted = []
+    for vm_params, ip_address in vm_specs:
+        address = normalize_vm_ip(ip_address)
+        if address and vm_params["name"] in vms:
+            wanted.append((vm_params["name"], address))
+
+    # 2. eth0 interfaces
+    for vm_name, _ in wanted:
+        vm_id = vms[vm_name].id
+        interface = cache.get_vm_interface(vm_id, "eth0")
+        if interface:
+            interfaces[vm_id] = interface
+        else:
+            writer.create(
+                VM_INTERFACE_ENDPOINT,
+                {"virtual_machine": vm_id, "name": "eth0"},
+                keep_interface,
+            )
+    writer.flush()
+
+    # 3. IP addresses. A primary IP that has to move is released first.
+    moves = []
+    for vm_name, address in wanted:
+        vm = vms[vm_name]
+        interface = interfaces.get(vm.id)
+        if not interface:
+            continue
+        assignment = {
+            "assigned_object_type": "virtualization.vminterface",
+            "assigned_object_id": interface.id,
+        }
         try:
-            interface = nb.virtualization.interfaces.get(
-                virtual_machine_id=vm.id, name="eth0"
+            ip_obj = cache.get_ip(address)
+        except Exception as ip_err:
+            logger.warning(f"  [NetBox Warning] IP {address} issue: {ip_err}")
+            continue
+
+        if not ip_obj:
+            writer.create(
+                IP_ENDPOINT, {"address": address, **assignment}, keep_ip(vm.id)
             )
-            if not interface:
-                interface = nb.virtualization.interfaces.create(
-                    virtual_machine=vm.id, name="eth0"
-                )
+            continue
 
-            ip_obj = nb.ipam.ip_addresses.get(address=ip_address)
-            if not ip_obj:
-                ip_obj = nb.ipam.ip_addresses.create(
-                    address=ip_address,
-                    assigned_object_type="virtualization.vminterface",
-                    assigned_object_id=interface.id,
-                )
-            elif ip_obj.assigned_object_id != interface.id:
-                vm_primary = getattr(vm, "primary_ip4", None)
-                if vm_primary and getattr(vm_primary, "id", None) == ip_obj.id:
-                    vm.primary_ip4 = None
-                    vm.save()
-
-                ip_obj.assigned_object_type = "virtualization.vminterface"
-                ip_obj.assigned_object_id = interface.id
-                ip_obj.save()
-
-            current_primary = getattr(vm, "primary_ip4", None)
-            if (
-                current_primary is None
-                or getattr(current_primary, "id", None) != ip_obj.id
-            ):
-                vm.primary_ip4 = ip_obj.id
-                vm.save()
-        except Exception as ip_err:
-            logger.warning(f"  [NetBox Warning] IP {ip_address} issue: {ip_err}")
+        ips[vm.id] = ip_obj
+        if ip_obj.assigned_object_id != interface.id:
+            vm_primary = getattr(vm, "primary_ip4", None)
+            if vm_primary and getattr(vm_primary, "id", None) == ip_obj.id:
+                writer.update(VM_ENDPOINT, vm.id, {"primary_ip4": None}, keep_vm)
+        moves.append((vm.id, ip_obj, assignment))
+    writer.flush()
+
+    for vm_id, ip_obj, assignment in moves:
+        writer.update_record(IP_ENDPOINT, ip_obj, assignment, keep_ip(vm_id))
+    writer.flush()
+
+    # 4. Primary IPs
+    for vm_name, _ in wanted:
+        vm = vms[vm_name]
+        ip_obj = ips.get(vm.id)
+        if ip_obj and diff_record(vm, {"primary_ip4": ip_obj.id}):
+            writer.update(VM_ENDPOINT, vm.id, {"primary_ip4": ip_obj.id}, keep_vm)
+    writer.flush()
+    return writer.failed == 0
+
+
+def get_or_create_cluster(cache, cluster_name, type_name, type_slug):
+    """Resolve (or create) a cluster type and cluster through the run cache."""
+    cluster_types = nb_client.virtualization.cluster_types
+    clusters = nb_client.virtualization.clusters
+
+    cluster_type = cache.lookup(cluster_types, name=type_name)
+    if not cluster_type:
+        cluster_type = cache.remember(
+            cluster_types,
+            cluster_types.create(name=type_name, slug=type_slug),
+            name=type_name,
+        )
+
+    cluster = cache.lookup(clusters, name=cluster_name)
+    if not cluster:
+        cluster = cache.remember(
+            clusters,
+            clusters.create(name=cluster_name, type=cluster_type.id),
+            name=cluster_name,
+        )
+    return cluster
 
 
-def sync_to_netbox(host_info, scan_results):
+@traced()
+def sync_to_netbox(host_info, scan_results, cache=None, stats=None):
+    """Sync one host's scan results; return True if everything was written."""
     if DRY_RUN or not nb_client:
-        return
+        return False
+    cache = cache or NetBoxCache(nb_client)
 
     name = host_info["name"]
     ip = host_info["ip"]
@@ -585,54 +1237,43 @@ def sync_to_netbox(host_info, scan_results):
             f"  [Mapping] IP {ip} NOT FOUND. Fallback: '{resolved_cluster_name}'"
         )
 
+    synced = True
     try:
         if scan_results.get("host_disks"):
             sync_device_to_netbox(
-                nb=nb_client, name=name, host_disks=scan_results["host_disks"]
+                nb=nb_client,
+                name=name,
+                host_disks=scan_results["host_disks"],
+                stats=stats,
             )
 
         if scan_results.get("vms"):
-            vb_type = nb_client.virtualization.cluster_types.get(name="VirtualBox")
-            if not vb_type:
-                vb_type = nb_client.virtualization.cluster_types.create(
-                    name="VirtualBox", slug="virtualbox"
-                )
-
-            vb_cluster = nb_client.virtualization.clusters.get(
-                name=resolved_cluster_name
+            vb_cluster = get_or_create_cluster(
+                cache, resolved_cluster_name, "VirtualBox", "virtualbox"
             )
-            if not vb_cluster:
-                vb_cluster = nb_client.virtualization.clusters.create(
-                    name=resolved_cluster_name, type=vb_type.id
-                )
 
+            vm_specs = []
             for vm_data in scan_results["vms"]:
-                sync_vm_to_netbox(
-                    nb=nb_client,
+                vm_params = build_vm_params(
                     name=vm_data["name"],
                     cluster_id=vb_cluster.id,
                     comments="Auto-discovered VirtualBox VM by infra_scanner.py",
                     vcpus=vm_data.get("vcpus"),
                     memory=vm_data.get("memory"),
                     disk=vm_data.get("disk"),
-                    ip_address=vm_data.get("ip"),
+                    resources=vm_data.get("resources"),
                 )
+                vm_specs.append((vm_params, vm_data.get("ip")))
+            synced &= sync_vms_to_netbox(
+                nb_client, vb_cluster.id, vm_specs, cache, stats
+            )
 
         if scan_results.get("containers"):
-            docker_type = nb_client.virtualization.cluster_types.get(name="Docker")
-            if not docker_type:
-                docker_type = nb_client.virtualization.cluster_types.create(
-                    name="Docker", slug="docker"
-                )
-
-            docker_cluster = nb_client.virtualization.clusters.get(
-                name=resolved_cluster_name
+            docker_cluster = get_or_create_cluster(
+                cache, resolved_cluster_name, "Docker", "docker"
             )
-            if not docker_cluster:
-                docker_cluster = nb_client.virtualization.clusters.create(
-                    name=resolved_cluster_name, type=docker_type.id
-                )
 
+            container_specs = []
             for c_data in scan_results["containers"]:
                 c_name = c_data.get("name")
                 c_image = c_data.get("image", "N/A")
@@ -650,60 +1291,428 @@ def sync_to_netbox(host_info, scan_results):
                 else:
                     ports_md = "**Ports:** *No ports defined*"
 
+                # State, health and networks are only known via the Docker API
+                api_md = ""
+                if c_data.get("state"):
+                    health = c_data.get("health")
+                    api_md += f"- **State:** {c_data['state']}"
+                    api_md += f" ({health})\n" if health else "\n"
+                if c_data.get("networks"):
+                    api_md += f"- **Networks:** {', '.join(c_data['networks'])}\n"
+
                 markdown_comments = (
                     f"### Docker Container Details\n"
                     f"- **Image:** `{c_image}`\n"
                     f"- **Created on:** {c_created}\n"
+                    f"{api_md}"
                     f"- {ports_md}\n\n"
                     f"*Auto-discovered by Sovereign Stack Infra-Scanner.*"
                 )
 
-                sync_vm_to_netbox(
-                    nb=nb_client,
+                vm_params = build_vm_params(
                     name=c_name,
                     cluster_id=docker_cluster.id,
                     comments=markdown_comments,
                     docker_ports=parsed_ports,
                     docker_image=c_image,
+                    resources=c_data.get("resources"),
                 )
+                container_specs.append((vm_params, None))
+            synced &= sync_vms_to_netbox(
+                nb_client, docker_cluster.id, container_specs, cache, stats
+            )
 
         logger.info(f"  [NetBox] Sync completed for {name}")
+        return synced
     except Exception as sync_err:
         logger.error(f"  [NetBox Error] Failed to sync {name}: {sync_err}")
+        return False
+
 
+def scan_inventory_host(host, credentials_data, pool=None, probe=True):
+    """Scan a single inventory host with the scanner matching its type."""
+    creds = get_connection_details(host["name"], credentials_data)
+    if host.get("type", "linux") == "synology":
+        return scan_synology_nas(host, creds)
+    return scan_host(host, creds, pool=pool, probe=probe)
+
+
+def scan_inventory(
+    hosts,
+    credentials_data,
+    workers=SCAN_WORKERS,
+    deadline=SCAN_HOST_DEADLINE,
+    pool=None,
+):
+    """Scan all hosts in parallel and return their results in inventory order.
+
+    A host that has not finished within `deadline` seconds after its scan
+    started is treated as offline. Its worker thread cannot be killed, but it
+    is abandoned and ends on its own SSH/HTTP timeouts.
+
+    HTTP service probing for all hosts runs alongside the SSH/API scans.
+    """
+    results = [None] * len(hosts)
+    started = {}
+
+    def run(index, host):
+        started[index] = time.monotonic()
+        try:
+            return scan_inventory_host(host, credentials_data, pool=pool, probe=False)
+        finally:
+            METRICS.set(
+                "sovereign_scanner_host_scan_duration_seconds",
+                time.monotonic() - started[index],
+                host=host["name"],
+            )
+
+    logger.info(f"[Scan] Scanning {len(hosts)} hosts with {workers} workers...")
+    probe_ips = [h["ip"] for h in hosts if h.get("probe", True)]
+    probe_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="probe")
+    probe_future = probe_executor.submit(probe_services, probe_ips)
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scan")
+    futures = {executor.submit(run, i, h): i for i, h in enumerate(hosts)}
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = futures[future]
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    logger.error(f"  [Error] {hosts[index]['name']}: {e}")
+
+            now = time.monotonic()
+            for future in list(pending):
+                index = futures[future]
+                if index in started and now - started[index] > deadline:
+                    logger.warning(
+                        f"  [Timeout] {hosts[index]['name']}: no result within "
+                        f"{deadline:.0f}s, skipping host."
+                    )
+                    pending.discard(future)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    try:
+        services = probe_future.result(timeout=deadline)
+    except Exception as e:
+        logger.warning(f"  [Probe] HTTP service probing failed: {e}")
+        services = {}
+    finally:
+        probe_executor.shutdown(wait=False)
+
+    return [
+        apply_probe_results(host, scan_results, services.get(host["ip"], []))
+        for host, scan_results in zip(hosts, results)
+    ]
+
+
+def record_scan_metrics(hosts, all_results, pool):
+    """Update the per-host metrics from a cycle's scan results."""
+    now = time.time()
+    for host, scan_results in zip(hosts, all_results):
+        name = host["name"]
+        online = bool(scan_results and scan_results.get("online"))
+        METRICS.set("sovereign_scanner_host_up", int(online), host=name)
+        if not online:
+            continue
+        METRICS.set(
+            "sovereign_scanner_host_last_scan_timestamp_seconds", now, host=name
+        )
+        METRICS.set(
+            "sovereign_scanner_host_containers",
+            len(scan_results["containers"]),
+            host=name,
+        )
+        METRICS.set("sovereign_scanner_host_vms", len(scan_results["vms"]), host=name)
+
+        # Replace the disk series, so removed mounts disappear
+        METRICS.remove("sovereign_scanner_host_disk_size_bytes", host=name)
+        METRICS.remove("sovereign_scanner_host_disk_free_bytes", host=name)
+        # df reports the sizes as strings, wmic and the DSM API as integers
+        for d in scan_results["host_disks"]:
+            mount = d.get("mount") or d.get("disk")
+            METRICS.set(
+                "sovereign_scanner_host_disk_size_bytes",
+                float(d["size_gb"]) * 1024**3,
+                host=name,
+                mount=mount,
+            )
+            METRICS.set(
+                "sovereign_scanner_host_disk_free_bytes",
+                float(d["free_gb"]) * 1024**3,
+                host=name,
+                mount=mount,
+            )
+
+    # The pool counts per IP and for its whole lifetime
+    for host in hosts:
+        if host["ip"] not in pool.metrics:
+            continue
+        m = pool.metrics[host["ip"]]
+        for key in ("handshakes", "handshake_seconds", "commands", "command_seconds"):
+            METRICS.set(f"sovereign_scanner_ssh_{key}_total", m[key], host=host["name"])
+
+
+def record_throttle_metrics(throttle):
+    """Export the state of the NetBox API throttle."""
+    METRICS.set("sovereign_scanner_netbox_concurrency_window", int(throttle.window))
+    METRICS.set("sovereign_scanner_netbox_retries_total", throttle.stats["retries"])
+    METRICS.set(
+        "sovereign_scanner_netbox_throttle_seconds_total",
+        throttle.stats["wait_seconds"],
+    )
+
+
+def report_trace():
+    """Log the per-phase timing table (and write the trace file); reset."""
+    logger.info(f"[Trace] Time per phase:\n{TRACER.phase_table()}")
+    if SCAN_TRACE_FILE:
+        try:
+            TRACER.write_chrome_trace(SCAN_TRACE_FILE)
+            logger.info(f"[Trace] Chrome trace written to {SCAN_TRACE_FILE}")
+        except OSError as trace_err:
+            logger.warning(f"[Trace] Could not write {SCAN_TRACE_FILE}: {trace_err}")
+    TRACER.reset()
+
+
+def run_cycle(hosts, credentials_data, pool, cache, snapshot=None, history=None):
+    """Scan the given hosts and sync their results; return the report.
+
+    With a snapshot, only hosts and records whose content hash changed since
+    the last successful sync are sent to NetBox. With a disk history, every
+    scan's disk figures are recorded and their trends added to the results.
+    """
+    cycle_started = time.monotonic()
+    all_results = scan_inventory(hosts, credentials_data, pool=pool)
+    record_scan_metrics(hosts, all_results, pool)
+
+    # NetBox writes run serially, in inventory order, sharing one cache
+    full_report = {}
+    stats = SyncStats()
+    skipped = 0
+    for host, scan_results in zip(hosts, all_results):
+        if not scan_results:
+            continue
+        full_report[host["name"]] = scan_results
+        if history is not None and scan_results.get("host_disks"):
+            try:
+                record_disk_history(history, host["name"], scan_results["host_disks"])
+            except sqlite3.Error as hist_err:
+                logger.warning(f"  [History] {host['name']}: {hist_err}")
+
+        changed, host_state = scan_results, None
+        if snapshot is not None:
+            changed, host_state = snapshot.delta(host["name"], scan_results)
+            if changed is None:
+                skipped += 1
+                continue
+
+        if sync_to_netbox(host, changed, cache=cache, stats=stats) and host_state:
+            snapshot.commit(host["name"], host_state)
+
+    if snapshot is not None:
+        snapshot.save()
+    if history is not None:
+        try:
+            history.prune()
+        except sqlite3.Error as hist_err:
+            logger.warning(f"[History] Could not prune: {hist_err}")
+    METRICS.set(
+        "sovereign_scanner_cycle_duration_seconds", time.monotonic() - cycle_started
+    )
+    METRICS.set("sovereign_scanner_last_cycle_timestamp_seconds", time.time())
+    report_trace()
+    if nb_client and not DRY_RUN:
+        record_throttle_metrics(nb_client.http_session.throttle)
+        logger.info(
+            f"[NetBox] Sync summary: {stats.summary()}; "
+            f"{skipped} host(s) unchanged since last sync; "
+            f"API: {nb_client.http_session.throttle.summary()}"
+        )
+    return full_report
+
+
+def log_report(full_report, level=logging.INFO):
+    report_json = json.dumps(full_report, indent=4)
+    logger.log(
+        level,
+        "\n" + "*" * 60 + "\nDISCOVERY OUTPUT DATA:\n" + report_json + "\n" + "*" * 60,
+    )
+
+
+class HostScheduler:
+    """Schedules each inventory host on its own interval, with jitter.
+
+    The interval comes from the host's "scan_interval" (seconds) in
+    inventory.json, falling back to SCAN_INTERVAL. Each run is shifted by a
+    random +/- `jitter` fraction so hosts with equal intervals drift apart.
+    """
+
+    def __init__(self, default_interval=SCAN_INTERVAL, jitter=SCAN_JITTER):
+        self.default_interval = default_interval
+        self.jitter = jitter
+        self._queue = []
+        self._due = {}
+        self._seq = itertools.count()
+
+    def interval(self, host):
+        return float(host.get("scan_interval", self.default_interval))
+
+    def load(self, hosts, now):
+        """(Re)build the schedule, keeping due times of known hosts."""
+        previous, self._due, self._queue = self._due, {}, []
+        for host in hosts:
+            due = previous.get(host["name"])
+            if due is None:
+                # Spread the first runs instead of scanning everything at once
+                due = now + random.uniform(0, self.jitter * self.interval(host))
+            self._push(host, due)
+
+    def _push(self, host, due):
+        self._due[host["name"]] = due
+        heapq.heappush(self._queue, (due, next(self._seq), host))
+
+    def pop_due(self, now):
+        hosts = []
+        while self._queue and self._queue[0][0] <= now:
+            _, _, host = heapq.heappop(self._queue)
+            hosts.append(host)
+        return hosts
+
+    def reschedule(self, host, now):
+        spread = 1 + random.uniform(-self.jitter, self.jitter)
+        self._push(host, now + self.interval(host) * spread)
+
+    def seconds_until_next(self, now):
+        if not self._queue:
+            return DAEMON_POLL_SECONDS
+        return max(0.0, self._queue[0][0] - now)
+
+
+def run_daemon(full_sync=False):
+    """Keep scanning hosts on their own schedule until SIGTERM/SIGINT.
+
+    The NetBox client, SSH pool and (for NETBOX_CACHE_TTL seconds) the
+    NetBox lookup cache stay warm between runs. inventory.json and
+    credentials.json are reloaded when they change.
+    """
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    pool = new_ssh_pool()
+    snapshot = new_snapshot(full_sync)
+    history = new_disk_history()
+    scheduler = HostScheduler()
+    config_stamp = None
+    credentials_data = None
+    cache, cache_born = None, 0.0
+
+    metrics_server = None
+    if METRICS_PORT:
+        metrics_server = METRICS.serve(METRICS_PORT, METRICS_ADDRESS)
+        logger.info(
+            f"[Daemon] Metrics available on http://{METRICS_ADDRESS}:"
+            f"{METRICS_PORT}/metrics"
+        )
+
+    logger.info("[Daemon] Service mode started.")
+    try:
+        while not stop.is_set():
+            now = time.monotonic()
+            stamp = local_config_stamp()
+            if stamp != config_stamp:
+                inventory_data, new_credentials = load_local_config()
+                if inventory_data and new_credentials:
+                    credentials_data = new_credentials
+                    scheduler.load(inventory_data["hosts"], now)
+                    config_stamp = stamp
+                    logger.info(
+                        f"[Daemon] Inventory loaded: "
+                        f"{len(inventory_data['hosts'])} hosts scheduled."
+                    )
+
+            due_hosts = scheduler.pop_due(now)
+            if due_hosts:
+                if cache is None or now - cache_born > NETBOX_CACHE_TTL:
+                    cache, cache_born = NetBoxCache(nb_client), now
+                names = ", ".join(h["name"] for h in due_hosts)
+                logger.info(f"[Daemon] Scanning due hosts: {names}")
+                log_report(
+                    run_cycle(
+                        due_hosts, credentials_data, pool, cache, snapshot, history
+                    ),
+                    level=logging.DEBUG,
+                )
+                finished = time.monotonic()
+                for host in due_hosts:
+                    scheduler.reschedule(host, finished)
+
+            wait_s = scheduler.seconds_until_next(time.monotonic())
+            stop.wait(min(wait_s, DAEMON_POLL_SECONDS))
+    finally:
+        pool.close_all()
+        if history is not None:
+            history.close()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+    logger.info("[Daemon] Service mode stopped.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sovereign Stack Infra-Scanner")
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="run as a long-running service with a per-host scheduler",
+    )
+    parser.add_argument(
+        "--full-sync",
+        action="store_true",
+        help="ignore the scan snapshot and sync every object to NetBox",
+    )
+    args = parser.parse_args(argv)
 
-def main():
     log_msg = f"Sovereign Stack Infra-Scanner starting (Version: {__version__})"
     logger.info(log_msg)
 
     # Ensure Custom Fields are prepared in NetBox
     ensure_custom_fields(nb_client)
 
+    if args.daemon:
+        run_daemon(full_sync=args.full_sync)
+        return
+
     inventory_data, credentials_data = load_local_config()
-    full_report = {}
     if inventory_data and credentials_data:
-        for host in inventory_data["hosts"]:
-            creds = get_connection_details(host["name"], credentials_data)
-            host_type = host.get("type", "linux")
-
-            if host_type == "synology":
-                scan_results = scan_synology_nas(host, creds)
-            else:
-                scan_results = scan_host(host, creds)
-
-            if scan_results:
-                full_report[host["name"]] = scan_results
-                sync_to_netbox(host, scan_results)
-
-        report_json = json.dumps(full_report, indent=4)
-        logger.info(
-            "\n"
-            + "*" * 60
-            + "\nDISCOVERY OUTPUT DATA:\n"
-            + report_json
-            + "\n"
-            + "*" * 60
-        )
+        pool = new_ssh_pool()
+        history = new_disk_history()
+        try:
+            full_report = run_cycle(
+                inventory_data["hosts"],
+                credentials_data,
+                pool,
+                NetBoxCache(nb_client),
+                new_snapshot(args.full_sync),
+                history,
+            )
+        finally:
+            pool.close_all()
+            if history is not None:
+                history.close()
+        log_report(full_report)
+        if METRICS_TEXTFILE:
+            try:
+                METRICS.write_textfile(METRICS_TEXTFILE)
+                logger.info(f"[Metrics] Written to {METRICS_TEXTFILE}")
+            except OSError as metrics_err:
+                logger.warning(
+                    f"[Metrics] Could not write {METRICS_TEXTFILE}: {metrics_err}"
+                )
 
     logger.info("Scan cycle completed.")
 
@@ -0,0 +1,198 @@
+# ==============================================================================
+# Sovereign Stack - Prometheus Metrics
+# ==============================================================================
+#
+# DESCRIPTION:
+# Minimal, dependency-free metrics registry that renders the Prometheus text
+# exposition format. Used by infra_scanner.py to expose scan results and
+# timings, either on an HTTP endpoint (daemon mode) or as a file for the
+# node_exporter textfile collector (cron mode).
+#
+# WHAT IT DOES:
+# 1. Keeps gauges, counters and summaries (sum/count) with labels
+# 2. Renders them in the Prometheus text format (version 0.0.4)
+# 3. Serves /metrics from a background HTTP server thread
+# 4. Writes a .prom file atomically for the textfile collector
+# 5. Counts requests and latencies of a requests.Session via a
+#    response hook
+#
+# DEPENDENCIES:
+#    - Python standard library only
+#
+# ==============================================================================
+# Copyright (C) 2026 Henk van Hoek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses.
+# ==============================================================================
+
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+    return f"{{{pairs}}}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Thread-safe collection of metric families.
+
+    Families are declared once with describe(); samples are then set with
+    set() (gauge), inc() (counter) or observe() (summary).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._families = {}
+
+    def describe(self, name, metric_type, help_text):
+        with self._lock:
+            self._families.setdefault(
+                name, {"type": metric_type, "help": help_text, "samples": {}}
+            )
+
+    def _samples(self, name):
+        family = self._families.get(name)
+        if family is None:
+            raise KeyError(f"Metric {name} was not described")
+        return family["samples"]
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._samples(name)[tuple(sorted(labels.items()))] = value
+
+    def inc(self, name, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            samples = self._samples(name)
+            samples[key] = samples.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            samples = self._samples(name)
+            total, count = samples.get(key, (0.0, 0))
+            samples[key] = (total + value, count + 1)
+
+    def remove(self, name, **labels):
+        """Drop all samples of a family whose labels include `labels`."""
+        wanted = set(labels.items())
+        with self._lock:
+            samples = self._samples(name)
+            for key in [k for k in samples if wanted <= set(k)]:
+                del samples[key]
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, family in sorted(self._families.items()):
+                if not family["samples"]:
+                    continue
+                lines.append(f"# HELP {name} {family['help']}")
+                lines.append(f"# TYPE {name} {family['type']}")
+                for key, value in sorted(family["samples"].items()):
+                    labels = _format_labels(key)
+                    if family["type"] == "summary":
+                        total, count = value
+                        lines.append(f"{name}_sum{labels} {_format_value(total)}")
+                        lines.append(f"{name}_count{labels} {count}")
+                    else:
+                        lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        """Write the metrics for the node_exporter textfile collector.
+
+        The file is replaced atomically, so the collector never reads a
+        partially written file.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def serve(self, port, address="0.0.0.0"):
+        """Serve /metrics from a daemon thread; return the HTTP server."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # scrapes would flood the scanner log
+
+        server = ThreadingHTTPServer((address, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(
+            target=server.serve_forever, name="metrics", daemon=True
+        ).start()
+        return server
+
+    def instrument_session(self, session, name):
+        """Count the requests of a requests.Session and their latency.
+
+        Adds `<name>_requests_total{method,status}` and
+        `<name>_request_duration_seconds{method}` via a response hook.
+        """
+        self.describe(
+            f"{name}_requests_total", "counter", "HTTP requests by method and status"
+        )
+        self.describe(
+            f"{name}_request_duration_seconds", "summary", "HTTP request latency"
+        )
+
+        def hook(response, *args, **kwargs):
+            method = response.request.method
+            self.inc(
+                f"{name}_requests_total",
+                method=method,
+                status=str(response.status_code),
+            )
+            self.observe(
+                f"{name}_request_duration_seconds",
+                response.elapsed.total_seconds(),
+                method=method,
+            )
+
+        session.hooks["response"].append(hook)
@@ -0,0 +1,581 @@
+# ==============================================================================
+# Sovereign Stack - NetBox Sync Helpers
+# ==============================================================================
+#
+# DESCRIPTION:
+# Shared helpers for the scripts that write to NetBox (infra_scanner.py,
+# import_inventory.py, ...). Keeps the HTTP traffic per run low.
+#
+# WHAT IT DOES:
+# 1. Prefetches Virtual Machines, VM interfaces and IP addresses of a
+#    cluster in a few paginated list calls
+# 2. Indexes them by name, VM id and address for in-memory lookups
+# 3. Diffs desired state against fetched records and only PATCHes the
+#    fields that changed, counting created/updated/unchanged objects
+# 4. Groups pending creates/updates per endpoint and sends them as bulk
+#    list payloads in chunks of NETBOX_BULK_SIZE
+# 5. Throttles the API traffic of a script (connect()): a token bucket
+#    limits the request rate, an adaptive window caps the requests in
+#    flight and shrinks on slow, 429 or 5xx responses, and throttled or
+#    failed requests are retried with jittered backoff and Retry-After
+#
+# DEPENDENCIES:
+#    - pynetbox, requests
+#
+# CONFIGURATION:
+#    See .env for:
+#    - NETBOX_BULK_SIZE: Objects per bulk POST/PATCH request (default: 50)
+#    - NETBOX_RATE_LIMIT: Requests per second per script (default: 20, 0 = off)
+#    - NETBOX_RATE_BURST: Requests that may be sent at once (default: 10)
+#    - NETBOX_MAX_CONCURRENCY: Requests in flight per script (default: 4)
+#    - NETBOX_TARGET_LATENCY: Seconds; slower responses halve the number of
+#      requests in flight (default: 2)
+#    - NETBOX_MAX_RETRIES: Retries of a throttled/failed request (default: 4)
+#
+# ==============================================================================
+# Copyright (C) 2026 Henk van Hoek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses.
+# ==============================================================================
+
+import os
+import time
+import random
+import logging
+import threading
+from collections import Counter, defaultdict
+from email.utils import parsedate_to_datetime
+
+import pynetbox
+import requests
+
+logger = logging.getLogger("NetBoxSync")
+
+# Maximum number of ids passed in a single multi-value filter (URL length)
+FILTER_CHUNK_SIZE = 100
+
+# Retries: 429/503 mean "not processed, come back later" for any method;
+# other 5xx and connection errors are only retried for methods that can be
+# sent twice (PATCH included, NetBox just applies the same values again).
+RETRY_ALWAYS = {429, 503}
+RETRY_IDEMPOTENT = {500, 502, 504}
+RETRY_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "PATCH", "DELETE"}
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+RETRY_AFTER_MAX = 120.0
+
+
+def _vm_field(name, label, weight, description, field_type="text"):
+    return {
+        "name": name,
+        "label": label,
+        "type": field_type,
+        "weight": weight,
+        "description": description,
+        "filter_logic": "loose",
+        "ui_visibility": "read-write",
+        "object_types": ["virtualization.virtualmachine"],
+    }
+
+
+# Custom fields on Virtual Machines, filled by infra_scanner.py (live hosts)
+# and import_inventory.py (docker-compose.yaml)
+VM_CUSTOM_FIELDS = [
+    _vm_field("docker_port", "Docker Port", 100, "External port(s) mapped on the host"),
+    _vm_field(
+        "public_url", "Public URL", 110, "Direct link to the web interface", "url"
+    ),
+    _vm_field("docker_image", "Docker Image", 120, "The container image name"),
+    _vm_field("docker_networks", "Docker Networks", 130, "Compose networks"),
+    _vm_field(
+        "docker_volumes",
+        "Docker Volumes",
+        140,
+        "Volume and bind mounts (source:target[:mode])",
+        "longtext",
+    ),
+    _vm_field("docker_restart", "Docker Restart", 150, "Compose restart policy"),
+    _vm_field("docker_profiles", "Docker Profiles", 160, "Compose profiles"),
+    _vm_field("docker_healthcheck", "Docker Healthcheck", 170, "Healthcheck test"),
+    _vm_field("cpu_usage", "CPU Usage", 180, "Sampled CPU usage (avg, min / max)"),
+    _vm_field(
+        "memory_usage", "Memory Usage", 190, "Sampled memory usage (avg, min / max)"
+    ),
+]
+
+
+def ensure_custom_fields(nb, fields=None):
+    """Ensure the given (default: all VM) custom fields exist in NetBox."""
+    if not nb:
+        return
+    fields = VM_CUSTOM_FIELDS if fields is None else fields
+    try:
+        existing = {cf.name for cf in nb.extras.custom_fields.all()}
+    except Exception as e:
+        logger.warning(f"  [NetBox] Could not setup Custom Fields: {e}")
+        return
+    for f in fields:
+        if f["name"] in existing:
+            continue
+        try:
+            nb.extras.custom_fields.create(f)
+            logger.info(f"  [NetBox] Custom Field '{f['name']}' created.")
+        except Exception as cf_err:
+            logger.warning(f"  [NetBox] Skipped creating '{f['name']}': {cf_err}")
+
+
+def chunked(items, size):
+    """Yield successive lists of at most `size` items."""
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i : i + size]  # noqa: E203
+
+
+class NetBoxCache:
+    """Per-run, in-memory index of NetBox virtualization objects.
+
+    A cluster is prefetched on first use. Objects created or changed during
+    the run must be registered with the add_* methods to keep the index
+    current.
+    """
+
+    def __init__(self, nb):
+        self.nb = nb
+        self._loaded_clusters = set()
+        self._vms = {}
+        self._vm_interfaces = {}
+        self._ips = {}
+        self._lookups = {}
+
+    def load_cluster(self, cluster_id):
+        """Prefetch all VMs, VM interfaces and IPs of a cluster."""
+        if cluster_id in self._loaded_clusters:
+            return
+
+        vms = list(
+            self.nb.virtualization.virtual_machines.filter(cluster_id=cluster_id)
+        )
+        for vm in vms:
+            self.add_vm(vm, cluster_id)
+
+        for iface in self.nb.virtualization.interfaces.filter(cluster_id=cluster_id):
+            self.add_vm_interface(iface)
+
+        ip_count = 0
+        for vm_ids in chunked([vm.id for vm in vms], FILTER_CHUNK_SIZE):
+            for ip_obj in self.nb.ipam.ip_addresses.filter(virtual_machine_id=vm_ids):
+                self.add_ip(ip_obj)
+                ip_count += 1
+
+        self._loaded_clusters.add(cluster_id)
+        logger.info(
+            f"  [Cache] Cluster {cluster_id}: {len(vms)} VMs, "
+            f"{ip_count} IP addresses prefetched."
+        )
+
+    def get_vm(self, name, cluster_id):
+        self.load_cluster(cluster_id)
+        return self._vms.get((cluster_id, name))
+
+    def add_vm(self, vm, cluster_id):
+        self._vms[(cluster_id, vm.name)] = vm
+
+    def get_vm_interface(self, vm_id, name):
+        return self._vm_interfaces.get((vm_id, name))
+
+    def add_vm_interface(self, iface):
+        vm_id = getattr(iface.virtual_machine, "id", iface.virtual_machine)
+        self._vm_interfaces[(vm_id, iface.name)] = iface
+
+    def get_ip(self, address):
+        """Return the IP address object, asking NetBox only on a cache miss.
+
+        Addresses assigned outside the prefetched clusters are looked up
+        individually and remembered.
+        """
+        ip_obj = self._ips.get(address)
+        if ip_obj is None:
+            ip_obj = self.nb.ipam.ip_addresses.get(address=address)
+            if ip_obj:
+                self.add_ip(ip_obj)
+        return ip_obj
+
+    def add_ip(self, ip_obj):
+        self._ips[ip_obj.address] = ip_obj
+
+    def lookup(self, endpoint, **filters):
+        """Memoized `endpoint.get(**filters)` for small reference objects."""
+        key = (endpoint.url, tuple(sorted(filters.items())))
+        if key not in self._lookups:
+            self._lookups[key] = endpoint.get(**filters)
+        return self._lookups[key]
+
+    def remember(self, endpoint, record, **filters):
+        """Store a freshly created reference object for later lookups."""
+        key = (endpoint.url, tuple(sorted(filters.items())))
+        self._lookups[key] = record
+        return record
+
+
+def _same_value(current, desired):
+    """Compare a serialized NetBox value with a desired payload value.
+
+    NetBox returns decimals (vcpus) and some numbers as strings or floats,
+    so numeric values are compared numerically.
+    """
+    if current == desired:
+        return True
+    if isinstance(current, bool) or isinstance(desired, bool):
+        return False
+    try:
+        return float(current) == float(desired)
+    except (TypeError, ValueError):
+        return False
+
+
+def diff_record(record, desired):
+    """Return the part of `desired` that differs from the NetBox record.
+
+    Related objects compare by id and choice fields by value (as produced by
+    `Record.serialize()`). Custom fields are compared per key, and only the
+    changed keys are returned, since NetBox merges custom fields on PATCH.
+    """
+    current = record.serialize()
+    changes = {}
+    for key, value in desired.items():
+        if key == "custom_fields":
+            current_cfs = current.get("custom_fields") or {}
+            cf_changes = {
+                cf: cf_value
+                for cf, cf_value in value.items()
+                if not _same_value(current_cfs.get(cf), cf_value)
+            }
+            if cf_changes:
+                changes[key] = cf_changes
+        elif not _same_value(current.get(key), value):
+            changes[key] = value
+    return changes
+
+
+def apply_changes(record, desired, stats=None, kind="objects"):
+    """PATCH only the changed fields of a record; return the changes sent."""
+    changes = diff_record(record, desired)
+    if changes:
+        record.update(changes)
+    if stats is not None:
+        stats.record(kind, "updated" if changes else "unchanged")
+    return changes
+
+
+class SyncStats:
+    """Counts created, updated and unchanged NetBox objects per kind."""
+
+    OUTCOMES = ("created", "updated", "unchanged")
+
+    def __init__(self):
+        self.counts = defaultdict(Counter)
+
+    def record(self, kind, outcome, amount=1):
+        self.counts[kind][outcome] += amount
+
+    def summary(self):
+        if not self.counts:
+            return "no objects synced"
+        parts = []
+        for kind in sorted(self.counts):
+            counts = ", ".join(f"{self.counts[kind][o]} {o}" for o in self.OUTCOMES)
+            parts.append(f"{kind}: {counts}")
+        return "; ".join(parts)
+
+
+class BulkWriter:
+    """Queues NetBox creates and updates and sends them as bulk requests.
+
+    Endpoints are addressed as "app.endpoint" (e.g. "ipam.ip_addresses").
+    flush() sends everything queued so far, per endpoint, in chunks, and
+    hands each returned record to the callback registered for it, so that
+    dependent objects can reference the new ids in the next batch. NetBox
+    applies a bulk request atomically, so a chunk rejected as invalid is
+    sent again one object at a time; only the objects that still fail are
+    logged, counted in `failed` and have their callbacks skipped.
+    """
+
+    def __init__(self, nb, chunk_size=None, stats=None):
+        self.nb = nb
+        if chunk_size is None:
+            chunk_size = int(os.getenv("NETBOX_BULK_SIZE", "50"))
+        self.chunk_size = max(1, chunk_size)
+        self.stats = stats
+        self.failed = 0
+        self._creates = defaultdict(list)
+        self._updates = defaultdict(list)
+
+    def _endpoint(self, path):
+        app, name = path.split(".")
+        return getattr(getattr(self.nb, app), name)
+
+    def create(self, path, payload, callback=None):
+        self._creates[path].append((payload, callback))
+
+    def update(self, path, record_id, changes, callback=None):
+        self._updates[path].append(({"id": record_id, **changes}, callback))
+
+    def update_record(self, path, record, desired, callback=None):
+        """Queue a PATCH with the changed fields of `record`, if any."""
+        changes = diff_record(record, desired)
+        if changes:
+            self.update(path, record.id, changes, callback)
+        elif self.stats is not None:
+            self.stats.record(path.split(".")[1], "unchanged")
+        return changes
+
+    def pending(self):
+        return sum(len(v) for v in self._creates.values()) + sum(
+            len(v) for v in self._updates.values()
+        )
+
+    def flush(self):
+        """Send all queued creates, then all queued updates."""
+        creates, self._creates = self._creates, defaultdict(list)
+        updates, self._updates = self._updates, defaultdict(list)
+        for path, items in creates.items():
+            self._send(path, items, "created")
+        for path, items in updates.items():
+            self._send(path, items, "updated")
+
+    def _send(self, path, items, outcome):
+        endpoint = self._endpoint(path)
+        kind = path.split(".")[1]
+        for chunk in chunked(items, self.chunk_size):
+            self._send_chunk(endpoint, kind, chunk, outcome)
+
+    def _send_chunk(self, endpoint, kind, chunk, outcome):
+        payloads = [payload for payload, _ in chunk]
+        try:
+            if outcome == "created":
+                records = endpoint.create(payloads)
+            else:
+                records = endpoint.update(payloads)
+        except pynetbox.RequestError as e:
+            if len(chunk) == 1:
+                logger.warning(f"  [NetBox] {outcome[:-1]} of 1 {kind} failed: {e}")
+                self.failed += 1
+                return
+            # One invalid object (e.g. a duplicate name) rejects the whole
+            # chunk; retry the objects one by one so the others get through
+            logger.warning(
+                f"  [NetBox] Bulk {outcome[:-1]} of {len(payloads)} {kind} "
+                f"failed, retrying one by one: {e}"
+            )
+            for item in chunk:
+                self._send_chunk(endpoint, kind, [item], outcome)
+            return
+        except Exception as e:
+            logger.warning(
+                f"  [NetBox] Bulk {outcome[:-1]} of {len(payloads)} {kind} "
+                f"failed: {e}"
+            )
+            self.failed += len(payloads)
+            return
+
+        if self.stats is not None:
+            self.stats.record(kind, outcome, len(payloads))
+        for (_, callback), record in zip(chunk, records):
+            if callback:
+                callback(record)
+
+
+class NetBoxThrottle:
+    """Rate limit and adaptive concurrency cap for one script's requests.
+
+    A token bucket allows `rate` requests per second with bursts of `burst`.
+    The requests in flight are capped by a window that grows by one per
+    window's worth of fast responses and halves (at most once per round
+    trip) on responses slower than `target_latency`, 429s and 5xx: additive
+    increase, multiplicative decrease, like TCP. pause() holds back every
+    caller, e.g. for a Retry-After.
+    """
+
+    def __init__(
+        self, rate=None, burst=None, max_concurrency=None, target_latency=None
+    ):
+        if rate is None:
+            rate = float(os.getenv("NETBOX_RATE_LIMIT", "20"))
+        if burst is None:
+            burst = float(os.getenv("NETBOX_RATE_BURST", "10"))
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv("NETBOX_MAX_CONCURRENCY", "4"))
+        if target_latency is None:
+            target_latency = float(os.getenv("NETBOX_TARGET_LATENCY", "2"))
+        self.rate = max(0.0, rate)
+        self.burst = max(1.0, burst)
+        self.max_concurrency = max(1, max_concurrency)
+        self.target_latency = target_latency
+        self.window = float(self.max_concurrency)
+        self.stats = Counter()
+        self._tokens = self.burst
+        self._refilled = time.monotonic()
+        self._active = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def _refill(self, now):
+        if self.rate:
+            elapsed = now - self._refilled
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._refilled = now
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        started = time.monotonic()
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._paused_until:
+                    timeout = self._paused_until - now
+                elif self._active >= int(self.window):
+                    timeout = None  # release() wakes us up
+                elif self.rate and self._tokens < 1:
+                    timeout = (1 - self._tokens) / self.rate
+                else:
+                    break
+                self._cond.wait(timeout)
+            if self.rate:
+                self._tokens -= 1
+            self._active += 1
+            self.stats["requests"] += 1
+            self.stats["wait_seconds"] += time.monotonic() - started
+
+    def release(self, latency, overloaded=False):
+        """Return the slot of a finished request and adapt the window."""
+        with self._cond:
+            self._active -= 1
+            now = time.monotonic()
+            if overloaded or latency > self.target_latency:
+                # Responses to the same burst report the same overload
+                if now - self._last_decrease > latency:
+                    self.window = max(1.0, self.window / 2)
+                    self._last_decrease = now
+                    self.stats["decreases"] += 1
+            else:
+                self.window = min(
+                    float(self.max_concurrency), self.window + 1 / self.window
+                )
+            self._cond.notify_all()
+
+    def pause(self, seconds):
+        """Hold back all requests for `seconds`."""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+    def count(self, key, amount=1):
+        with self._cond:
+            self.stats[key] += amount
+
+    def summary(self):
+        with self._cond:
+            return (
+                f"{self.stats['requests']} request(s), "
+                f"{self.stats['retries']} retried, "
+                f"{self.stats['wait_seconds']:.1f}s throttled, "
+                f"window {int(self.window)}/{self.max_concurrency}"
+            )
+
+
+def backoff_delay(attempt):
+    """Exponential backoff with jitter: half fixed, half random."""
+    delay = min(BACKOFF_CAP, BACKOFF_BASE * 2**attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def retry_after(response):
+    """Return the Retry-After of a response in seconds (0 if absent)."""
+    value = response.headers.get("Retry-After", "").strip()
+    if not value:
+        return 0.0
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return 0.0
+    return min(RETRY_AFTER_MAX, max(0.0, seconds))
+
+
+class ThrottledSession(requests.Session):
+    """requests.Session that sends every request through a NetBoxThrottle.
+
+    Requests answered with 429/503 (or, when safe to repeat, another 5xx or
+    a connection error) are retried up to `max_retries` times after
+    backoff_delay() or the server's Retry-After, whichever is longer.
+    """
+
+    def __init__(self, throttle=None, max_retries=None):
+        super().__init__()
+        self.throttle = throttle or NetBoxThrottle()
+        if max_retries is None:
+            max_retries = int(os.getenv("NETBOX_MAX_RETRIES", "4"))
+        self.max_retries = max(0, max_retries)
+
+    def request(self, method, url, *args, **kwargs):
+        method = method.upper()
+        attempt = 0
+        while True:
+            self.throttle.acquire()
+            started = time.monotonic()
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.throttle.release(time.monotonic() - started, overloaded=True)
+                if attempt >= self.max_retries or method not in RETRY_METHODS:
+                    raise
+                delay = backoff_delay(attempt)
+                reason = type(e).__name__
+            except Exception:
+                self.throttle.release(time.monotonic() - started)
+                raise
+            else:
+                status = response.status_code
+                overloaded = status in RETRY_ALWAYS or status >= 500
+                self.throttle.release(time.monotonic() - started, overloaded)
+                retry = status in RETRY_ALWAYS or (
+                    status in RETRY_IDEMPOTENT and method in RETRY_METHODS
+                )
+                if not retry or attempt >= self.max_retries:
+                    return response
+                wait = retry_after(response)
+                if wait:
+                    self.throttle.pause(wait)
+                delay = max(backoff_delay(attempt), wait)
+                reason = f"HTTP {status}"
+                response.close()
+
+            attempt += 1
+            self.throttle.count("retries")
+            logger.debug(
+                f"  [NetBox] {method} {url}: {reason}, retry {attempt}/"
+                f"{self.max_retries} in {delay:.1f}s"
+            )
+            time.sleep(delay)
+
+
+def connect(url, token, throttle=None):
+    """Return a pynetbox API whose requests go through a ThrottledSession."""
+    nb = pynetbox.api(url, token=token)
+    nb.http_session = ThrottledSession(throttle)
+    return nb
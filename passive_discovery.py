@@ -0,0 +1,184 @@
+# ==============================================================================
+# Sovereign Stack - Passive Network Discovery
+# ==============================================================================
+#
+# DESCRIPTION:
+# Collects IP/MAC pairs without sending packets: from the kernel neighbour
+# (ARP) table and, optionally, from dnsmasq or ISC dhcpd lease files. Used by
+# scan_network.py --passive to keep NetBox current between active sweeps.
+#
+# WHAT IT DOES:
+# 1. Reads complete entries from /proc/net/arp
+# 2. Reads active leases from dnsmasq and ISC dhcpd lease files
+# 3. Keeps a time-stamped in-memory IP/MAC table and reports new or
+#    changed pairs
+# 4. Decides which subnets still need an active sweep to fill gaps
+#
+# DEPENDENCIES:
+#    - Python standard library only (Linux /proc)
+#
+# ==============================================================================
+# Copyright (C) 2026 Henk van Hoek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses.
+# ==============================================================================
+
+import re
+import time
+import ipaddress
+
+ATF_COM = 0x2  # neighbour entry is complete (MAC known)
+EMPTY_MAC = "00:00:00:00:00:00"
+
+
+def read_neighbor_table(path="/proc/net/arp"):
+    """Return [{"ip", "mac"}] for all complete neighbour table entries."""
+    devices = []
+    with open(path) as f:
+        next(f)  # header line
+        for line in f:
+            fields = line.split()
+            if len(fields) < 6 or not int(fields[2], 16) & ATF_COM:
+                continue
+            mac = fields[3].upper()
+            if mac != EMPTY_MAC:
+                devices.append({"ip": fields[0], "mac": mac})
+    return devices
+
+
+def read_dnsmasq_leases(path):
+    """Parse a dnsmasq lease file: "<expiry> <mac> <ip> <hostname> <id>"."""
+    devices = []
+    now = time.time()
+    with open(path) as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) < 4 or ":" not in fields[1]:
+                continue
+            expiry = int(fields[0]) if fields[0].isdigit() else 0
+            if expiry and expiry < now:
+                continue
+            devices.append(
+                {
+                    "ip": fields[2],
+                    "mac": fields[1].upper(),
+                    "hostname": None if fields[3] == "*" else fields[3],
+                }
+            )
+    return devices
+
+
+def read_isc_leases(path):
+    """Parse an ISC dhcpd.leases file; the last block per IP wins."""
+    leases = {}
+    with open(path) as f:
+        content = f.read()
+    for ip, body in re.findall(r"lease\s+([\d.]+)\s*\{(.*?)\}", content, re.S):
+        state = re.search(r"binding state (\w+);", body)
+        mac = re.search(r"hardware ethernet ([0-9a-fA-F:]{17});", body)
+        hostname = re.search(r'client-hostname "([^"]*)";', body)
+        if not mac or (state and state.group(1) != "active"):
+            leases.pop(ip, None)
+            continue
+        leases[ip] = {
+            "ip": ip,
+            "mac": mac.group(1).upper(),
+            "hostname": hostname.group(1) if hostname else None,
+        }
+    return list(leases.values())
+
+
+def read_lease_file(path):
+    """Read a dnsmasq or ISC dhcpd lease file, detected by its content."""
+    with open(path) as f:
+        head = f.read(4096)
+    if re.search(r"^\s*lease\s+[\d.]+\s*\{", head, re.M):
+        return read_isc_leases(path)
+    return read_dnsmasq_leases(path)
+
+
+class NeighborTable:
+    """Time-stamped IP/MAC table fed by passive (and active) observations."""
+
+    def __init__(self):
+        self.entries = {}
+
+    def observe(self, devices, source, now=None):
+        """Merge observations; return the devices that are new or changed."""
+        now = time.time() if now is None else now
+        changed = []
+        for dev in devices:
+            entry = self.entries.get(dev["ip"])
+            if entry is None or entry["mac"] != dev["mac"]:
+                entry = {"ip": dev["ip"], "mac": dev["mac"], "first_seen": now}
+                self.entries[dev["ip"]] = entry
+                changed.append(entry)
+            if dev.get("hostname"):
+                entry["hostname"] = dev["hostname"]
+            entry.pop("gone", None)
+            entry["last_seen"] = now
+            entry["source"] = source
+        return changed
+
+    def in_subnet(self, subnet):
+        network = ipaddress.ip_network(subnet, strict=False)
+        return [
+            entry
+            for ip, entry in self.entries.items()
+            if ipaddress.ip_address(ip) in network
+        ]
+
+    def stale(self, subnet, max_age, now=None):
+        """Return the entries of a subnet that were not seen for max_age."""
+        now = time.time() if now is None else now
+        return [
+            e
+            for e in self.in_subnet(subnet)
+            if not e.get("gone") and now - e["last_seen"] > max_age
+        ]
+
+    def mark_gone(self, subnet, since):
+        """Flag the entries of a subnet not seen since `since` as gone.
+
+        Called after an active sweep (with its start time): devices the
+        sweep did not confirm have left, and stale() skips them until they
+        are observed again. Returns the newly flagged entries.
+        """
+        gone = [
+            e
+            for e in self.in_subnet(subnet)
+            if not e.get("gone") and e["last_seen"] < since
+        ]
+        for entry in gone:
+            entry["gone"] = True
+        return gone
+
+
+def subnets_to_sweep(table, subnets, last_sweep, active_interval, max_age, now=None):
+    """Return the subnets where an active sweep has to fill gaps.
+
+    A subnet is swept when it was never swept, when its last sweep is older
+    than `active_interval`, or when known devices in it went quiet for longer
+    than `max_age` (at most once per `max_age`). Devices that an earlier
+    sweep did not find (NeighborTable.mark_gone) do not count.
+    """
+    now = time.time() if now is None else now
+    due = []
+    for subnet in subnets:
+        since_sweep = now - last_sweep.get(subnet, 0)
+        if since_sweep >= active_interval or (
+            since_sweep >= max_age and table.stale(subnet, max_age, now)
+        ):
+            due.append(subnet)
+    return due
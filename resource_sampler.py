@@ -0,0 +1,245 @@
+# ==============================================================================
+# Sovereign Stack - Resource Sampler
+# ==============================================================================
+#
+# DESCRIPTION:
+# Takes a few lightweight resource samples of a host over a short window
+# and aggregates them per container and VirtualBox VM, so infra_scanner.py
+# can report CPU, memory and I/O usage (the "noisy neighbours").
+#
+# WHAT IT DOES:
+# 1. Optionally (vbox_setup) enables VirtualBox metrics collection when a
+#    query returns no VM data; this changes the host's VirtualBox metrics
+#    configuration, so it is off unless the operator asks for it
+# 2. Takes N samples, each a single SSH round-trip running
+#    `docker stats --no-stream`, `vboxmanage metrics query` and reading
+#    /proc/loadavg
+# 3. Aggregates the samples into min/avg/max (CPU, memory, load) and
+#    rates over the window (network and block I/O)
+#
+# DEPENDENCIES:
+#    - ssh_pool.py (RemoteSession)
+#    - Remote: docker and/or vboxmanage on PATH (both optional)
+#
+# ==============================================================================
+# Copyright (C) 2026 Henk van Hoek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses.
+# ==============================================================================
+
+import re
+import json
+import time
+from collections import defaultdict
+
+SECTION = "@@SOVEREIGN-SECTION@@ "
+
+# Enables collection with a 1s period; VBoxSVC keeps it until it restarts and
+# it replaces any period/sample settings configured on the host
+VBOX_SETUP_CMD = (
+    "command -v vboxmanage >/dev/null 2>&1 && "
+    "vboxmanage metrics setup --period 1 --samples 1 '*' CPU/Load,RAM/Usage "
+    ">/dev/null 2>&1; true"
+)
+
+# Seconds to wait after the setup before the first metrics are available
+VBOX_SETUP_WAIT = 2.0
+
+SAMPLE_SH = r"""
+frame() { printf '\n@@SOVEREIGN-SECTION@@ %s\n' "$1"; }
+frame loadavg
+cat /proc/loadavg 2>/dev/null
+if command -v docker >/dev/null 2>&1; then
+    frame docker
+    docker stats --no-stream --format '{{json .}}' 2>/dev/null
+fi
+if command -v vboxmanage >/dev/null 2>&1; then
+    frame vbox
+    vboxmanage metrics query '*' CPU/Load/User,CPU/Load/Kernel,RAM/Usage/Used 2>/dev/null
+fi
+"""
+
+SIZE_UNITS = {
+    "b": 1,
+    "kb": 1000,
+    "mb": 1000**2,
+    "gb": 1000**3,
+    "tb": 1000**4,
+    "kib": 1024,
+    "mib": 1024**2,
+    "gib": 1024**3,
+    "tib": 1024**4,
+}
+VBOX_LINE = re.compile(
+    r"^(.+?)\s+(CPU/Load/User|CPU/Load/Kernel|RAM/Usage/Used)\s+(.+)$"
+)
+
+
+def parse_size(text):
+    """Convert a docker stats size ("10.5MiB", "1.2kB") to bytes."""
+    match = re.match(r"^\s*([\d.]+)\s*([A-Za-z]*)\s*$", text or "")
+    if not match:
+        return 0
+    return int(float(match.group(1)) * SIZE_UNITS.get(match.group(2).lower(), 1))
+
+
+def _split_pair(text):
+    left, _, right = (text or "").partition("/")
+    return parse_size(left), parse_size(right)
+
+
+def parse_docker_stats(text):
+    """Parse `docker stats --format '{{json .}}'` lines per container name."""
+    containers = {}
+    for line in text.splitlines():
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        net_rx, net_tx = _split_pair(data.get("NetIO"))
+        blk_read, blk_write = _split_pair(data.get("BlockIO"))
+        containers[data.get("Name")] = {
+            "cpu_percent": float(data.get("CPUPerc", "0").rstrip("%") or 0),
+            "mem_bytes": _split_pair(data.get("MemUsage"))[0],
+            "net_bytes": net_rx + net_tx,
+            "block_bytes": blk_read + blk_write,
+        }
+    return containers
+
+
+def parse_vbox_metrics(text):
+    """Parse `vboxmanage metrics query` output per VM (host is skipped)."""
+    vms = defaultdict(lambda: {"cpu_percent": 0.0, "mem_bytes": 0})
+    for line in text.splitlines():
+        match = VBOX_LINE.match(line.strip())
+        if not match or match.group(1) == "host":
+            continue
+        vm_name, metric, values = match.groups()
+        last = values.split(",")[-1].strip()
+        number = float(re.sub(r"[^\d.]", "", last) or 0)
+        if metric == "RAM/Usage/Used":
+            vms[vm_name]["mem_bytes"] = int(number * 1024)  # reported in kB
+        else:
+            vms[vm_name]["cpu_percent"] += number
+    return dict(vms)
+
+
+def parse_sample(raw):
+    sections = {}
+    current = None
+    for line in raw.splitlines():
+        line = line.rstrip("\r")
+        if line.startswith(SECTION):
+            current = line.partition(SECTION)[2]
+            sections[current] = []
+        elif current:
+            sections[current].append(line)
+    loadavg = "".join(sections.get("loadavg", [])).split()
+    return {
+        "time": time.monotonic(),
+        "load1": float(loadavg[0]) if loadavg else None,
+        "containers": parse_docker_stats("\n".join(sections.get("docker", []))),
+        "vms": parse_vbox_metrics("\n".join(sections.get("vbox", []))),
+        "vbox": "vbox" in sections,
+    }
+
+
+def take_samples(session, samples, interval, vbox_setup=False):
+    """Take `samples` samples, `interval` seconds apart (one round-trip each).
+
+    With `vbox_setup`, VirtualBox metrics collection is enabled when the
+    first query has no VM data, and that sample is taken again.
+    """
+    taken = []
+    for i in range(samples):
+        if i:
+            time.sleep(interval)
+        sample = parse_sample(session.run("sh -s", stdin_data=SAMPLE_SH))
+        if vbox_setup and not taken and sample["vbox"] and not sample["vms"]:
+            session.run(VBOX_SETUP_CMD)
+            time.sleep(VBOX_SETUP_WAIT)
+            sample = parse_sample(session.run("sh -s", stdin_data=SAMPLE_SH))
+        taken.append(sample)
+    return taken
+
+
+def _min_avg_max(values):
+    if not values:
+        return None
+    return {
+        "min": round(min(values), 2),
+        "avg": round(sum(values) / len(values), 2),
+        "max": round(max(values), 2),
+    }
+
+
+def _rate(points):
+    """Bytes per second between the first and last (time, counter) point."""
+    if len(points) < 2 or points[-1][0] <= points[0][0]:
+        return None
+    return round(max(0, points[-1][1] - points[0][1]) / (points[-1][0] - points[0][0]))
+
+
+def aggregate_samples(samples):
+    """Return {"host": ..., "containers": {name: ...}, "vms": {name: ...}}."""
+    report = {
+        "host": {
+            "samples": len(samples),
+            "load1": _min_avg_max(
+                [s["load1"] for s in samples if s["load1"] is not None]
+            ),
+        },
+        "containers": {},
+        "vms": {},
+    }
+    for kind in ("containers", "vms"):
+        names = {name for s in samples for name in s[kind]}
+        for name in sorted(names):
+            series = [(s["time"], s[kind][name]) for s in samples if name in s[kind]]
+            summary = {
+                "cpu_percent": _min_avg_max([v["cpu_percent"] for _, v in series]),
+                "mem_bytes": _min_avg_max([v["mem_bytes"] for _, v in series]),
+            }
+            if kind == "containers":
+                summary["net_bytes_per_s"] = _rate(
+                    [(t, v["net_bytes"]) for t, v in series]
+                )
+                summary["block_bytes_per_s"] = _rate(
+                    [(t, v["block_bytes"]) for t, v in series]
+                )
+            report[kind][name] = summary
+    return report
+
+
+def sample_resources(session, samples=3, interval=2.0, vbox_setup=False):
+    """Sample a host and return the aggregated resource report."""
+    return aggregate_samples(take_samples(session, samples, interval, vbox_setup))
+
+
+def format_resources(resources):
+    """One-line text for the NetBox custom fields: cpu, memory."""
+    cpu = resources.get("cpu_percent")
+    mem = resources.get("mem_bytes")
+    cpu_text = (
+        f"{cpu['avg']:.1f}% (min {cpu['min']:.1f} / max {cpu['max']:.1f})"
+        if cpu
+        else None
+    )
+    mem_text = (
+        f"{mem['avg'] / 1024**2:.0f} MiB (min {mem['min'] / 1024**2:.0f} / "
+        f"max {mem['max'] / 1024**2:.0f})"
+        if mem
+        else None
+    )
+    return cpu_text, mem_text
@@ -9,13 +9,23 @@
 #
 # WHAT IT DOES:
 # 1. Acquires exclusive lock to prevent concurrent scans
-# 2. Runs Nmap ARP scan on configured subnets
-# 3. Parses output to extract IP/MAC pairs
-# 4. For each discovered MAC:
-#    - Looks up interface in NetBox DCIM
-#    - Updates or creates IPAM entry with status and description
+# 2. Runs one Nmap ARP scan per configured subnet, all concurrently, with
+#    XML output (-oX -); results are merged and de-duplicated by MAC/IP
+# 3. Parses the XML incrementally while Nmap is still running, yielding
+#    IP, MAC, vendor, hostname and latency per host as it arrives
+# 4. Preloads all DCIM interfaces with a MAC address and all IPAM addresses
+#    in the scanned prefixes in a few paginated requests
+# 5. For each discovered MAC (as soon as it is reported):
+#    - Looks up the interface in the preloaded MAC index
+#    - Creates the IPAM entry, or updates it only when its assignment or
+#      status changed
 #    - Logs unregistered MACs for manual review
 #
+#    With --passive it keeps running instead and reads the kernel neighbour
+#    table (and optional DHCP lease files) every NETWORK_PASSIVE_INTERVAL
+#    seconds, syncing only new or changed IP/MAC pairs. Active sweeps are
+#    only run to fill gaps (see passive_discovery.py).
+#
 # DEPENDENCIES:
 #    - pynetbox, python-dotenv
 #    - nmap (system package)
@@ -25,8 +35,17 @@
 #    - NETBOX_URL: Full URL of NetBox instance
 #    - NETBOX_API_TOKEN: API token for authentication
 #
-#    Local:
-#    - subnets list (line 110): Add your network subnets
+#    - NETWORK_SCAN_SUBNETS: Comma-separated subnets to scan
+#      (default: 192.168.178.0/24,192.168.0.0/24)
+#    - NETWORK_SCAN_BACKEND: "nmap" (default) or "arp" for the built-in
+#      raw-socket ARP sweep (arp_sweep.py, directly attached subnets only)
+#    - ARP_INTERFACE: Interface for the ARP sweep (default: from routing table)
+#    - NETWORK_PASSIVE_INTERVAL: Seconds between passive reads (default: 30)
+#    - NETWORK_ACTIVE_INTERVAL: Max. seconds between active sweeps in
+#      passive mode (default: 3600)
+#    - NETWORK_STALE_AGE: Seconds after which a quiet device triggers an
+#      earlier active sweep of its subnet (default: 900)
+#    - DHCP_LEASE_FILES: Comma-separated dnsmasq/ISC dhcpd lease files
 #
 # OUTPUT:
 #    - Console logging of discovered devices
@@ -34,6 +53,7 @@
 #
 # USAGE:
 #    ./run_task.sh scan_network.py
+#    python3 scan_network.py --passive   (long-running, nmap-scanner container)
 #
 # ==============================================================================
 # Copyright (C) 2026 Henk van Hoek
@@ -55,12 +75,28 @@
 import os
 import sys
 import fcntl
+import argparse
+import ipaddress
 import subprocess
-import re
-import pynetbox
+import time
+import queue
+import threading
+import xml.etree.ElementTree as ET
 from datetime import datetime
 from dotenv import load_dotenv
 
+from arp_sweep import arp_sweep
+from netbox_sync import SyncStats, connect, diff_record
+from passive_discovery import (
+    NeighborTable,
+    read_lease_file,
+    read_neighbor_table,
+    subnets_to_sweep,
+)
+
+# Scans the Main Network and the dedicated Switch segment
+DEFAULT_SUBNETS = ["192.168.178.0/24", "192.168.0.0/24"]
+
 
 def log_message(message):
     """Log timestamped entries."""
@@ -74,44 +110,342 @@ def fatal_error(message):
     sys.exit(1)
 
 
-def run_nmap_scan(target_subnet):
-    """Execute Nmap ARP scan to discover IPs and MACs."""
+def parse_nmap_host(elem):
+    """Convert an Nmap XML <host> element into a device dict.
+
+    Returns None for hosts that are down or have no MAC address (e.g. the
+    scanning machine itself).
+    """
+    status = elem.find("status")
+    if status is not None and status.get("state") != "up":
+        return None
+
+    device = {"ip": None, "mac": None, "vendor": None, "hostname": None}
+    for address in elem.iter("address"):
+        addr_type = address.get("addrtype")
+        if addr_type == "ipv4":
+            device["ip"] = address.get("addr")
+        elif addr_type == "mac":
+            device["mac"] = address.get("addr", "").upper()
+            device["vendor"] = address.get("vendor")
+    if not device["ip"] or not device["mac"]:
+        return None
+
+    hostname = elem.find("hostnames/hostname")
+    if hostname is not None:
+        device["hostname"] = hostname.get("name")
+
+    # Nmap reports the smoothed round-trip time in microseconds
+    times = elem.find("times")
+    srtt = times.get("srtt") if times is not None else None
+    device["latency"] = int(srtt) / 1000 if srtt and srtt.isdigit() else None
+    return device
+
+
+def stream_nmap_scan(target_subnet):
+    """Run an Nmap ARP scan and yield discovered devices as they arrive.
+
+    Nmap writes XML to stdout (-oX -), which is parsed incrementally, so the
+    caller can process early hosts while the rest of the subnet is scanned.
+    """
     log_message(f"Scanning subnet: {target_subnet}")
-    # -sn: Ping scan (no port scan)
-    # -PR: ARP ping (reliable for local MAC discovery)
-    # --send-eth: Bypasses the IP layer to send raw ethernet frames
-    cmd = ["nmap", "-sn", "-PR", "--send-eth", target_subnet]
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    cmd = ["nmap", "-sn", "-PR", "--send-eth", "-oX", "-", target_subnet]
+    try:
+        # bufsize=0: iterparse must see each chunk as soon as Nmap flushes it
+        proc = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0
+        )
+    except OSError as e:
+        log_message(f"Warning: Scan failed for {target_subnet}: {e}")
+        return
+
+    finished = False
+    parse_error = None
+    try:
+        for _, elem in ET.iterparse(proc.stdout, events=("end",)):
+            if elem.tag != "host":
+                continue
+            device = parse_nmap_host(elem)
+            elem.clear()
+            if device:
+                yield device
+        finished = True
+    except ET.ParseError as e:
+        finished = True
+        parse_error = e
+    finally:
+        # Stop Nmap if the caller abandoned the generator early
+        if not finished:
+            proc.kill()
+        proc.stdout.close()
+        returncode = proc.wait()
+        stderr = proc.stderr.read().decode(errors="replace").strip()
+        proc.stderr.close()
+
+    if returncode != 0:
+        log_message(f"Warning: Scan failed for {target_subnet}: {stderr}")
+    elif parse_error:
+        log_message(f"Warning: Unreadable Nmap XML for {target_subnet}: {parse_error}")
+
+
+def scan_subnet(subnet):
+    """Yield the devices of one subnet using the configured scan backend."""
+    if os.getenv("NETWORK_SCAN_BACKEND", "nmap").strip().lower() == "arp":
+        log_message(f"ARP sweeping subnet: {subnet}")
+        interface = os.getenv("ARP_INTERFACE", "").strip() or None
+        try:
+            devices = arp_sweep(subnet, interface=interface)
+        except OSError as sweep_err:
+            # Not attached, no raw socket permission, ...
+            log_message(
+                f"ARP sweep of {subnet} failed ({sweep_err}); falling back to Nmap."
+            )
+        else:
+            yield from devices
+            return
+    yield from stream_nmap_scan(subnet)
+
+
+def get_scan_subnets(default=None):
+    """Return the subnets to scan from NETWORK_SCAN_SUBNETS."""
+    raw = os.getenv("NETWORK_SCAN_SUBNETS", "").strip('"').strip("'")
+    subnets = [s.strip() for s in raw.split(",") if s.strip()]
+    return subnets or list(default or DEFAULT_SUBNETS)
+
+
+def discover_subnets(subnets):
+    """Scan all subnets concurrently and yield devices as they arrive.
+
+    Every subnet gets its own Nmap process. A MAC/IP pair reported by more
+    than one subnet scan (e.g. overlapping ranges) is only yielded once; a
+    MAC with several IPs keeps all of them. Wall-clock time is logged per
+    subnet.
+    """
+    results = queue.Queue()
+    done = object()
+    started = time.monotonic()
 
-    if result.returncode != 0:
-        log_message(f"Warning: Scan failed for {target_subnet}: {result.stderr}")
-        return ""
+    def scan(subnet):
+        subnet_started = time.monotonic()
+        found = 0
+        try:
+            for dev in scan_subnet(subnet):
+                found += 1
+                results.put(dev)
+        except Exception as e:
+            log_message(f"Warning: Scan failed for {subnet}: {e}")
+        finally:
+            elapsed = time.monotonic() - subnet_started
+            log_message(f"Subnet {subnet}: {found} devices in {elapsed:.1f}s")
+            results.put(done)
+
+    for subnet in subnets:
+        threading.Thread(
+            target=scan, args=(subnet,), name=f"nmap-{subnet}", daemon=True
+        ).start()
+
+    seen = set()
+    remaining = len(subnets)
+    while remaining:
+        dev = results.get()
+        if dev is done:
+            remaining -= 1
+            continue
+        key = (dev["mac"].upper(), dev["ip"])
+        if key in seen:
+            continue
+        seen.add(key)
+        yield dev
+
+    log_message(
+        f"Scanned {len(subnets)} subnets in {time.monotonic() - started:.1f}s "
+        f"({len(seen)} unique devices)"
+    )
 
-    return result.stdout
 
+def load_mac_index(nb):
+    """Return {MAC: interface} for the DCIM interfaces with a MAC address.
 
-def parse_nmap_output(output):
-    """Extract IP and MAC address pairs from Nmap text output."""
-    devices = []
-    current_ip = None
+    NetBox 4.2+ stores MAC addresses as objects of their own, which carry
+    their interface; older versions filter the interfaces server-side.
+    Either way, interfaces without a MAC are never transferred.
+    """
+    version = tuple(int(part) for part in nb.version.split(".")[:2])
+    interfaces = {}
+    if version >= (4, 2):
+        macs = nb.dcim.mac_addresses.filter(assigned_object_type="dcim.interface")
+        for mac in macs:
+            if mac.assigned_object:
+                interfaces[str(mac.mac_address).upper()] = mac.assigned_object
+    else:
+        for iface in nb.dcim.interfaces.filter(mac_address__empty="false"):
+            if iface.mac_address:
+                interfaces[str(iface.mac_address).upper()] = iface
+    return interfaces
 
-    for line in output.splitlines():
-        # Identify the IP address line
-        ip_match = re.search(r"Nmap scan report for ([\d.]+)", line)
-        if ip_match:
-            current_ip = ip_match.group(1)
 
-        # Identify the MAC address line and pair it with the last found IP
-        mac_match = re.search(r"MAC Address: ([0-9A-F:]{17})", line)
-        if mac_match and current_ip:
-            devices.append({"ip": current_ip, "mac": mac_match.group(1)})
-            current_ip = None
+def load_netbox_index(nb, subnets):
+    """Preload NetBox data needed to match discovered devices.
+
+    Returns (interfaces_by_mac, ips_by_address): the DCIM interfaces that
+    have a MAC address, and all IP addresses inside the scanned prefixes
+    keyed by their bare address (without prefix length).
+    """
+    interfaces = load_mac_index(nb)
+
+    ips = {}
+    for subnet in subnets:
+        for ip_obj in nb.ipam.ip_addresses.filter(parent=subnet):
+            ips[str(ip_obj.address).split("/")[0]] = ip_obj
+
+    log_message(
+        f"Preloaded {len(interfaces)} interfaces with MAC and {len(ips)} IP addresses"
+    )
+    return interfaces, ips
 
-    return devices
 
+def sync_discovered_device(nb, dev, interfaces, ips, stats=None):
+    """Synchronize one discovered IP/MAC pair with NetBox."""
+    mac = dev["mac"].upper()
+    ip = dev["ip"]
 
-def main():
+    # Match discovered MAC against the preloaded DCIM interfaces
+    interface = interfaces.get(mac)
+
+    if interface:
+        device_name = interface.device.name
+        log_message(f"Matching device found: {device_name} ({ip})")
+
+        desired = {
+            "assigned_object_type": "dcim.interface",
+            "assigned_object_id": interface.id,
+            "status": "active",
+        }
+        description = f"Auto-synced by Sovereign Scan on {datetime.now().date()}"
+        try:
+            # Synchronize IPAM status; the description date alone is no change
+            existing = ips.get(ip)
+            if existing:
+                changes = diff_record(existing, desired)
+                if changes:
+                    existing.update(dict(changes, description=description))
+                outcome = "updated" if changes else "unchanged"
+            else:
+                ips[ip] = nb.ipam.ip_addresses.create(
+                    address=f"{ip}/24", description=description, **desired
+                )
+                outcome = "created"
+            if stats is not None:
+                stats.record("ip-addresses", outcome)
+        except Exception as e:
+            log_message(f"Failed to sync IP {ip} for {device_name}: {e}")
+    else:
+        details = ", ".join(
+            value for value in (dev.get("hostname"), dev.get("vendor")) if value
+        )
+        log_message(
+            f"Unregistered MAC discovered: {mac} at {ip}"
+            f"{f' ({details})' if details else ''}. Requires staging."
+        )
+
+
+def collect_passive(table, lease_files, failing):
+    """Read the neighbour table and lease files; return new/changed pairs.
+
+    `failing` holds the sources that could not be read last time, so a
+    missing file is only reported once.
+    """
+    sources = [("/proc/net/arp", read_neighbor_table, "arp")]
+    sources += [(path, read_lease_file, "lease") for path in lease_files]
+
+    changed = []
+    for path, reader, kind in sources:
+        try:
+            changed += table.observe(reader(path), kind)
+            failing.discard(path)
+        except (OSError, ValueError) as e:
+            if path not in failing:
+                log_message(f"Warning: Cannot read {path}: {e}")
+            failing.add(path)
+    return changed
+
+
+def run_passive(nb, subnets):
+    """Keep NetBox in sync from passive observations, sweeping only gaps."""
+    interval = int(os.getenv("NETWORK_PASSIVE_INTERVAL", "30"))
+    active_interval = int(os.getenv("NETWORK_ACTIVE_INTERVAL", "3600"))
+    stale_age = int(os.getenv("NETWORK_STALE_AGE", "900"))
+    lease_files = [
+        p.strip()
+        for p in os.getenv("DHCP_LEASE_FILES", "").strip('"').split(",")
+        if p.strip()
+    ]
+    networks = [ipaddress.ip_network(s, strict=False) for s in subnets]
+
+    table = NeighborTable()
+    last_sweep = {}
+    failing = set()
+    index_loaded = 0
+    log_message(f"Passive discovery started (every {interval}s).")
+
+    while True:
+        now = time.time()
+        changed = collect_passive(table, lease_files, failing)
+
+        due = subnets_to_sweep(table, subnets, last_sweep, active_interval, stale_age)
+        if due:
+            log_message(f"Filling gaps with an active sweep of: {', '.join(due)}")
+            sweep_started = time.time()
+            found = list(discover_subnets(due))
+            changed += table.observe(found, "active")
+            for subnet in due:
+                last_sweep[subnet] = now
+                network = ipaddress.ip_network(subnet, strict=False)
+                # No answers at all usually means the sweep failed; keep the
+                # entries rather than declaring the whole subnet gone
+                if not any(ipaddress.ip_address(d["ip"]) in network for d in found):
+                    continue
+                gone = table.mark_gone(subnet, sweep_started)
+                if gone:
+                    log_message(
+                        f"{len(gone)} device(s) in {subnet} did not answer the "
+                        "sweep; no longer waiting for them."
+                    )
+
+        # Refresh the NetBox index now and then, and re-check every known
+        # device against it (only actual changes are written)
+        if now - index_loaded >= active_interval:
+            try:
+                interfaces, ips = load_netbox_index(nb, subnets)
+                index_loaded = now
+                changed = list(table.entries.values())
+            except Exception as e:
+                log_message(f"Warning: Could not refresh NetBox index: {e}")
+
+        relevant = [
+            dev
+            for dev in changed
+            if any(ipaddress.ip_address(dev["ip"]) in n for n in networks)
+        ]
+        if relevant and index_loaded:
+            stats = SyncStats()
+            for dev in relevant:
+                sync_discovered_device(nb, dev, interfaces, ips, stats)
+            log_message(f"NetBox sync ({len(relevant)} devices): {stats.summary()}")
+
+        time.sleep(interval)
+
+
+def main(argv=None):
     """Main execution logic for network synchronization."""
+    parser = argparse.ArgumentParser(description="Sovereign Stack Network Scanner")
+    parser.add_argument(
+        "--passive",
+        action="store_true",
+        help="keep running and sync from the neighbour table and DHCP leases",
+    )
+    args = parser.parse_args(argv)
+
     load_dotenv()
 
     # 1. Anti-Stacking Protection
@@ -129,48 +463,33 @@ def main():
     if not nb_url or not nb_token:
         fatal_error("NETBOX_URL or NETBOX_API_TOKEN not found in environment.")
 
-    nb = pynetbox.api(nb_url, token=nb_token)
+    nb = connect(nb_url, nb_token)
 
     # 3. Define Target Subnets
-    # Scans the Main Network and the dedicated Switch segment
-    subnets = ["192.168.178.0/24", "192.168.0.0/24"]
-
-    all_discovered = []
-    for subnet in subnets:
-        raw_output = run_nmap_scan(subnet)
-        all_discovered.extend(parse_nmap_output(raw_output))
-
-    log_message(f"Total devices found across all subnets: {len(all_discovered)}")
-
-    # 4. NetBox Synchronization Loop
-    for dev in all_discovered:
-        mac = dev["mac"].upper()
-        ip = dev["ip"]
+    subnets = get_scan_subnets()
 
-        # Match discovered MAC against NetBox DCIM interfaces
-        interface = nb.dcim.interfaces.get(mac_address=mac)
+    if args.passive:
+        try:
+            run_passive(nb, subnets)
+        except KeyboardInterrupt:
+            log_message("Passive discovery stopped.")
+        return
 
-        if interface:
-            device_name = interface.device.name
-            log_message(f"Matching device found: {device_name} ({ip})")
+    # 4. Preload interfaces and IP addresses
+    try:
+        interfaces, ips = load_netbox_index(nb, subnets)
+    except Exception as e:
+        fatal_error(f"Could not load NetBox interfaces and IP addresses: {e}")
 
-            try:
-                # Synchronize IPAM status
-                full_ip = f"{ip}/24"
-                nb.ipam.ip_addresses.update_or_create(
-                    address=full_ip,
-                    assigned_object_type="dcim.interface",
-                    assigned_object_id=interface.id,
-                    status="active",
-                    description=f"Auto-synced by Sovereign Scan on {datetime.now().date()}",
-                )
-            except Exception as e:
-                log_message(f"Failed to sync IP {ip} for {device_name}: {e}")
-        else:
-            log_message(
-                f"Unregistered MAC discovered: {mac} at {ip}. Requires staging."
-            )
+    # 5. NetBox Synchronization, host by host while Nmap is still running
+    stats = SyncStats()
+    total = 0
+    for dev in discover_subnets(subnets):
+        total += 1
+        sync_discovered_device(nb, dev, interfaces, ips, stats)
 
+    log_message(f"Total devices found across all subnets: {total}")
+    log_message(f"NetBox sync: {stats.summary()}")
     log_message("Network discovery and synchronization complete.")
 
 
@@ -0,0 +1,189 @@
+# ==============================================================================
+# Sovereign Stack - Scan Snapshot State
+# ==============================================================================
+#
+# DESCRIPTION:
+# Persists a compact snapshot of the last successfully synced scan results
+# per host, so that the next run only pushes what actually changed to NetBox.
+#
+# WHAT IT DOES:
+# 1. Hashes every VM and container record and the host disk table
+# 2. Compares a new scan with the stored hashes and returns only the
+#    changed records (or records whose sampled resource usage drifted)
+# 3. Stores the new hashes once the host was synced successfully
+#
+# OUTPUT:
+#    - JSON state file (see SCAN_STATE_FILE in infra_scanner.py)
+#
+# ==============================================================================
+# Copyright (C) 2026 Henk van Hoek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses.
+# ==============================================================================
+
+import os
+import json
+import time
+import hashlib
+import logging
+
+logger = logging.getLogger("ScanState")
+
+STATE_VERSION = 1
+
+# Per-record fields that change on every scan (measurements) and must not
+# make a record look modified
+VOLATILE_KEYS = ("stats", "resources")
+
+# Sampled usage only marks a record as changed when it drifts further than
+# this from the synced value: CPU in percentage points, memory relative.
+CPU_DRIFT = 10.0
+MEMORY_DRIFT = 0.2
+
+
+def content_hash(value):
+    """Return a short, stable hash of a JSON-serialisable value."""
+    blob = json.dumps(value, sort_keys=True, default=str).encode()
+    return hashlib.sha256(blob).hexdigest()[:16]
+
+
+class ScanSnapshot:
+    """Per-host content hashes of the last synced scan results.
+
+    A host whose snapshot is older than `max_age` seconds is synced in full
+    again, so manual edits in NetBox are eventually corrected. With
+    `full_sync`, every host is synced in full once per process.
+    """
+
+    def __init__(self, path, max_age=7 * 86400, full_sync=False):
+        self.path = path
+        self.max_age = max_age
+        self.full_sync = full_sync
+        self.hosts = {}
+        self._full_synced = set()
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            if data.get("version") == STATE_VERSION:
+                self.hosts = data.get("hosts", {})
+        except (OSError, ValueError) as e:
+            logger.warning(f"[State] Ignoring unreadable state file {self.path}: {e}")
+
+    def save(self):
+        """Write the state atomically (write to a temp file, then rename)."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({"version": STATE_VERSION, "hosts": self.hosts}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"[State] Could not write state file {self.path}: {e}")
+
+    @staticmethod
+    def record_hash(record):
+        return content_hash({k: v for k, v in record.items() if k not in VOLATILE_KEYS})
+
+    @staticmethod
+    def usage(record):
+        """Return [avg cpu, avg memory] of a sampled record, or None."""
+        resources = record.get("resources")
+        if not resources:
+            return None
+        cpu = resources.get("cpu_percent") or {}
+        mem = resources.get("mem_bytes") or {}
+        return [cpu.get("avg", 0), mem.get("avg", 0)]
+
+    @staticmethod
+    def drifted(old, new):
+        if new is None:
+            return False
+        if old is None:
+            return True
+        if abs(new[0] - old[0]) > CPU_DRIFT:
+            return True
+        return abs(new[1] - old[1]) > MEMORY_DRIFT * max(old[1], 1)
+
+    @staticmethod
+    def host_state(scan_results):
+        return {
+            "host_disks": content_hash(scan_results.get("host_disks", [])),
+            "vms": {
+                vm["name"]: ScanSnapshot.record_hash(vm)
+                for vm in scan_results.get("vms", [])
+            },
+            "containers": {
+                c.get("name"): ScanSnapshot.record_hash(c)
+                for c in scan_results.get("containers", [])
+            },
+            "usage": {
+                kind: {
+                    r.get("name"): ScanSnapshot.usage(r)
+                    for r in scan_results.get(kind, [])
+                    if r.get("resources")
+                }
+                for kind in ("vms", "containers")
+            },
+        }
+
+    def delta(self, host_name, scan_results):
+        """Return (changed_results, new_state) for a host.
+
+        `changed_results` has the same shape as `scan_results` but only holds
+        records whose hash differs from the snapshot; it is None when nothing
+        changed at all.
+        """
+        new_state = self.host_state(scan_results)
+        old_state = self.hosts.get(host_name)
+        stale = (
+            old_state is None
+            or (self.full_sync and host_name not in self._full_synced)
+            or time.time() - old_state.get("synced_at", 0) > self.max_age
+        )
+        if stale:
+            return scan_results, new_state
+
+        changed = dict(scan_results)
+        if new_state["host_disks"] == old_state.get("host_disks"):
+            changed["host_disks"] = []
+        for kind in ("vms", "containers"):
+            old_hashes = old_state.get(kind, {})
+            old_usage = old_state.get("usage", {}).get(kind, {})
+            new_usage = new_state["usage"][kind]
+            changed[kind] = []
+            for record in scan_results.get(kind, []):
+                name = record.get("name")
+                if old_hashes.get(name) != new_state[kind][name] or self.drifted(
+                    old_usage.get(name), new_usage.get(name)
+                ):
+                    changed[kind].append(record)
+                elif name in old_usage:
+                    # Not synced: keep comparing against the synced usage
+                    new_usage[name] = old_usage[name]
+
+        if not (changed["host_disks"] or changed["vms"] or changed["containers"]):
+            return None, new_state
+        return changed, new_state
+
+    def commit(self, host_name, new_state):
+        """Record a host's state after it was synced successfully."""
+        self.hosts[host_name] = dict(new_state, synced_at=time.time())
+        self._full_synced.add(host_name)
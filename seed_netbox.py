@@ -8,13 +8,16 @@
 # devices that are discovered but not yet registered.
 #
 # WHAT IT DOES:
-# 1. Runs Nmap ARP scans on configured subnets
+# 1. Runs Nmap ARP scans on all configured subnets concurrently
 # 2. Creates required NetBox objects (Site, Role, Manufacturer, Device Type)
-# 3. For each discovered MAC:
+# 3. Prefetches all staged (New-Device-*) devices of the site and all IPs
+#    in the scanned subnets
+# 4. For each discovered MAC:
 #    - Checks if device already exists
-#    - Creates new device with temp name (New-Device-XXXX)
-#    - Creates interface and assigns IP address
+#    - Plans a new device with temp name (New-Device-XXXX)
 #    - Flags duplicate IPs for review
+# 5. Bulk-creates the devices, then their interfaces, then the IP
+#    addresses and journal entries (NETBOX_BULK_SIZE objects per request)
 #
 # DEPENDENCIES:
 #    - pynetbox, python-dotenv
@@ -25,8 +28,8 @@
 #    - NETBOX_URL: Full URL of NetBox instance
 #    - NETBOX_API_TOKEN: API token for authentication
 #
-#    Local:
-#    - subnets list (line 74): Add your network subnets
+#    - SEED_SUBNETS: Comma-separated subnets to seed from
+#      (default: 192.168.178.0/24)
 #
 # OUTPUT:
 #    - Creates staged devices in NetBox
@@ -53,9 +56,9 @@
 # ==============================================================================
 
 import os
-import pynetbox
 from dotenv import load_dotenv
-from scan_network import run_nmap_scan, parse_nmap_output
+from netbox_sync import BulkWriter, SyncStats, connect
+from scan_network import discover_subnets
 
 
 def log_message(message):
@@ -76,7 +79,7 @@ def main():
     token = os.getenv("NETBOX_API_TOKEN", "").replace('"', "").strip()
 
     # Initialize NetBox API
-    nb = pynetbox.api(nb_url, token=token)
+    nb = connect(nb_url, token)
 
     # Ensure mandatory objects exist
     try:
@@ -98,65 +101,109 @@ def main():
         log_message(f"Prerequisite setup failed: {e}")
         return
 
-    subnets = ["192.168.178.0/24"]
-    for subnet in subnets:
-        log_message(f"Scanning subnet: {subnet}")
-        raw_output = run_nmap_scan(subnet)
-        discovered = parse_nmap_output(raw_output)
-
-        for dev in discovered:
-            mac = dev["mac"].upper()
-            ip = dev["ip"]
-            short_mac = mac.replace(":", "")[-4:]
-            expected_name = f"New-Device-{short_mac}"
-
-            # 1. Search the device by name first (most reliable for unique constraint)
-            device = nb.dcim.devices.get(name=expected_name, site_id=site.id)
-
-            if device:
-                # Check if IP exists in IPAM
-                existing_ip = nb.ipam.ip_addresses.get(address=f"{ip}/24")
-
-                if not existing_ip:
-                    # Journal Entry for extra IPs (.202, .203 etc.)
-                    warning_msg = f"FLAG: Extra IP {ip} detected for this MAC. Current NetBox record shows this name is taken."
-                    log_message(f"ATTENTION: {warning_msg} ({expected_name})")
-
-                    nb.extras.journal_entries.create(
-                        assigned_object_type="dcim.device",
-                        assigned_object_id=device.id,
-                        kind="warning",
-                        comments=warning_msg,
-                    )
-                continue
-
-            # If MAC is unique, create new device
-            log_message(f"Seeding new unique device for MAC: {mac} ({ip})")
-            short_mac = mac.replace(":", "")[-4:]
-
-            try:
-                new_device = nb.dcim.devices.create(
-                    name=f"New-Device-{short_mac}",
-                    device_type=dtype.id,
-                    role=role.id,
-                    site=site.id,
-                    status="staged",
-                )
-
-                new_int = nb.dcim.interfaces.create(
-                    device=new_device.id, name="mgmt0", type="other", mac_address=mac
-                )
-
-                nb.ipam.ip_addresses.create(
-                    address=f"{ip}/24",
-                    assigned_object_type="dcim.interface",
-                    assigned_object_id=new_int.id,
-                    status="active",
-                    description="Initial IP discovered by scan",
-                )
-            except Exception as e:
-                log_message(f"Failed to create device for MAC {mac}: {e}")
+    raw_subnets = os.getenv("SEED_SUBNETS", "192.168.178.0/24").replace('"', "")
+    subnets = [s.strip() for s in raw_subnets.split(",") if s.strip()]
+    discovered = list(discover_subnets(subnets))
 
+    # Prefetch the staged devices of the site and the known IPs of the subnets
+    try:
+        staged = {
+            d.name: d
+            for d in nb.dcim.devices.filter(site_id=site.id, name__isw="New-Device-")
+        }
+        known_ips = set()
+        for subnet in subnets:
+            for ip_obj in nb.ipam.ip_addresses.filter(parent=subnet):
+                known_ips.add(str(ip_obj.address).split("/")[0])
+    except Exception as e:
+        log_message(f"Prefetch of existing devices and IPs failed: {e}")
+        return
+    log_message(f"Prefetched {len(staged)} staged devices and {len(known_ips)} IPs")
+
+    # Plan: new devices per name, journal warnings for extra IPs
+    new_devices = {}
+    journal = []
+    for dev in discovered:
+        mac = dev["mac"].upper()
+        ip = dev["ip"]
+        short_mac = mac.replace(":", "")[-4:]
+        expected_name = f"New-Device-{short_mac}"
+
+        # The name is taken (in NetBox or earlier in this run)
+        if expected_name in staged or expected_name in new_devices:
+            if ip not in known_ips:
+                # Journal Entry for extra IPs (.202, .203 etc.)
+                warning_msg = f"FLAG: Extra IP {ip} detected for this MAC. Current NetBox record shows this name is taken."
+                log_message(f"ATTENTION: {warning_msg} ({expected_name})")
+                journal.append((expected_name, warning_msg))
+            continue
+
+        # If MAC is unique, create new device
+        log_message(f"Seeding new unique device for MAC: {mac} ({ip})")
+        new_devices[expected_name] = {"mac": mac, "ip": ip}
+
+    # Create devices, then interfaces, then IPs, then journal entries, each
+    # as bulk requests
+    stats = SyncStats()
+    writer = BulkWriter(nb, stats=stats)
+    interfaces = {}
+
+    for name in new_devices:
+        writer.create(
+            "dcim.devices",
+            {
+                "name": name,
+                "device_type": dtype.id,
+                "role": role.id,
+                "site": site.id,
+                "status": "staged",
+            },
+            lambda record, name=name: staged.__setitem__(name, record),
+        )
+    writer.flush()
+
+    for name, dev in new_devices.items():
+        if name in staged:
+            writer.create(
+                "dcim.interfaces",
+                {
+                    "device": staged[name].id,
+                    "name": "mgmt0",
+                    "type": "other",
+                    "mac_address": dev["mac"],
+                },
+                lambda record, name=name: interfaces.__setitem__(name, record),
+            )
+    writer.flush()
+
+    for name, dev in new_devices.items():
+        if name in interfaces:
+            writer.create(
+                "ipam.ip_addresses",
+                {
+                    "address": f"{dev['ip']}/24",
+                    "assigned_object_type": "dcim.interface",
+                    "assigned_object_id": interfaces[name].id,
+                    "status": "active",
+                    "description": "Initial IP discovered by scan",
+                },
+            )
+    for name, warning_msg in journal:
+        if name in staged:
+            writer.create(
+                "extras.journal_entries",
+                {
+                    "assigned_object_type": "dcim.device",
+                    "assigned_object_id": staged[name].id,
+                    "kind": "warning",
+                    "comments": warning_msg,
+                },
+            )
+    writer.flush()
+
+    if writer.failed:
+        log_message(f"Failed to create {writer.failed} objects (see warnings).")
+    log_message(f"NetBox sync: {stats.summary()}")
     log_message("Seeding process completed.")
 
 
@@ -0,0 +1,183 @@
+# ==============================================================================
+# Sovereign Stack - SSH Session Pool
+# ==============================================================================
+#
+# DESCRIPTION:
+# Keeps authenticated SSH transports open per (host, port, user) so that
+# consecutive scans reuse them instead of paying a full key exchange and
+# password authentication every time.
+#
+# WHAT IT DOES:
+# 1. Opens (or reuses) one paramiko transport per host/user with keepalives
+# 2. Runs several commands concurrently as channels on that one transport
+# 3. Records handshake time vs. command time per host
+#
+# DEPENDENCIES:
+#    - paramiko
+#
+# ==============================================================================
+# Copyright (C) 2026 Henk van Hoek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses.
+# ==============================================================================
+
+import time
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import paramiko
+
+logger = logging.getLogger("SSHPool")
+
+
+def _new_metrics():
+    return {
+        "handshakes": 0,
+        "handshake_seconds": 0.0,
+        "reused": 0,
+        "commands": 0,
+        "command_seconds": 0.0,
+    }
+
+
+class SSHPool:
+    """Pool of authenticated SSH clients keyed by (host, port, user).
+
+    The pool is thread-safe: different hosts connect in parallel, and the
+    same host is never connected twice at the same time.
+    """
+
+    def __init__(
+        self, connect_timeout=5, command_timeout=30, keepalive=30, max_channels=4
+    ):
+        self.connect_timeout = connect_timeout
+        self.command_timeout = command_timeout
+        self.keepalive = keepalive
+        self.max_channels = max(1, max_channels)
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._key_locks = defaultdict(threading.Lock)
+        self.metrics = defaultdict(_new_metrics)
+
+    def _record(self, host, **values):
+        with self._lock:
+            metrics = self.metrics[host]
+            for name, value in values.items():
+                metrics[name] += value
+
+    def session(self, host, user, password, port=22):
+        """Return a RemoteSession on a live (possibly reused) transport."""
+        key = (host, port, user)
+        with self._lock:
+            key_lock = self._key_locks[key]
+
+        with key_lock:
+            client = self._clients.get(key)
+            transport = client.get_transport() if client else None
+            if transport is not None and transport.is_active():
+                self._record(host, reused=1)
+                return RemoteSession(self, host, client)
+            if client:
+                client.close()
+
+            client = paramiko.SSHClient()
+            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            started = time.monotonic()
+            try:
+                client.connect(
+                    host,
+                    port=port,
+                    username=user,
+                    password=password,
+                    timeout=self.connect_timeout,
+                    auth_timeout=self.connect_timeout,
+                )
+            except Exception:
+                client.close()
+                raise
+            self._record(
+                host, handshakes=1, handshake_seconds=time.monotonic() - started
+            )
+            client.get_transport().set_keepalive(self.keepalive)
+            self._clients[key] = client
+            return RemoteSession(self, host, client)
+
+    def discard(self, host, user, port=22):
+        """Close and forget a connection, e.g. after a failed command."""
+        with self._lock:
+            client = self._clients.pop((host, port, user), None)
+        if client:
+            client.close()
+
+    def close_all(self):
+        with self._lock:
+            clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            client.close()
+
+    def summary(self, host):
+        """Return a one-line timing summary for a host."""
+        m = self.metrics[host]
+        return (
+            f"{m['handshakes']} handshake(s) in {m['handshake_seconds']:.2f}s, "
+            f"{m['reused']} reused, {m['commands']} command(s) in "
+            f"{m['command_seconds']:.2f}s"
+        )
+
+
+class RemoteSession:
+    """Runs commands for one host over a pooled transport."""
+
+    def __init__(self, pool, host, client):
+        self.pool = pool
+        self.host = host
+        self.client = client
+
+    def run(self, cmd, stdin_data=None):
+        """Run a command in its own channel and return the decoded stdout."""
+        started = time.monotonic()
+        try:
+            stdin, stdout, _ = self.client.exec_command(
+                cmd, timeout=self.pool.command_timeout
+            )
+            if stdin_data is not None:
+                stdin.write(stdin_data)
+                stdin.channel.shutdown_write()
+            return stdout.read().decode(errors="replace")
+        finally:
+            self.pool._record(
+                self.host, commands=1, command_seconds=time.monotonic() - started
+            )
+
+    def open_channel(self, cmd):
+        """Start a command and return its channel for interactive I/O.
+
+        Used to bridge a remote socket over the pooled transport (see
+        docker_api.py); the caller closes the channel.
+        """
+        channel = self.client.get_transport().open_session()
+        channel.settimeout(self.pool.command_timeout)
+        channel.exec_command(cmd)
+        self.pool._record(self.host, commands=1)
+        return channel
+
+    def run_many(self, cmds):
+        """Run commands concurrently as channels on the shared transport."""
+        if len(cmds) <= 1:
+            return [self.run(cmd) for cmd in cmds]
+        workers = min(self.pool.max_channels, len(cmds))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(self.run, cmds))
@@ -0,0 +1,181 @@
+# ==============================================================================
+# Sovereign Stack - Span Tracing
+# ==============================================================================
+#
+# DESCRIPTION:
+# Lightweight span/timer layer for the scan and sync pipeline. Shows where
+# the time of a run goes (SSH, vboxmanage, HTTP probing, NetBox) without a
+# profiler or external tracing backend.
+#
+# WHAT IT DOES:
+# 1. Times named spans (context manager or decorator) on any thread
+# 2. Aggregates calls, total, average and maximum time per phase
+# 3. Optionally keeps every span for a Chrome trace JSON file
+#    (open in chrome://tracing or https://ui.perfetto.dev)
+# 4. Records the requests of a requests.Session as spans via a response
+#    hook
+#
+# DEPENDENCIES:
+#    - Python standard library only
+#
+# ==============================================================================
+# Copyright (C) 2026 Henk van Hoek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses.
+# ==============================================================================
+
+import os
+import json
+import time
+import functools
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+
+class Tracer:
+    """Collects span timings; events are only kept with `keep_events`."""
+
+    def __init__(self, keep_events=False):
+        self.keep_events = keep_events
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.phases = {}
+            self.events = []
+            self.threads = {}
+            self.origin = time.perf_counter()
+
+    def record(self, name, start, duration, args=None):
+        """Record a finished span; `start` is a time.perf_counter() value."""
+        with self._lock:
+            phase = self.phases.get(name)
+            if phase is None:
+                phase = self.phases[name] = {"calls": 0, "total": 0.0, "max": 0.0}
+            phase["calls"] += 1
+            phase["total"] += duration
+            phase["max"] = max(phase["max"], duration)
+            if self.keep_events:
+                thread = threading.current_thread()
+                self.threads[thread.ident] = thread.name
+                self.events.append(
+                    (name, start - self.origin, duration, thread.ident, args)
+                )
+
+    @contextmanager
+    def span(self, name, **args):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter() - start, args or None)
+
+    def traced(self, name=None):
+        """Decorator that times every call of a function as a span."""
+
+        def decorator(func):
+            span_name = name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(span_name, start, time.perf_counter() - start)
+
+            return wrapper
+
+        return decorator
+
+    def instrument_session(self, session, prefix="http"):
+        """Record every request of a requests.Session as a span.
+
+        The span name is "<prefix> <METHOD>"; the end of the span is the
+        moment the response hook runs, its length the request's elapsed time.
+        """
+
+        def hook(response, *args, **kwargs):
+            duration = response.elapsed.total_seconds()
+            path = urlsplit(response.request.url).path
+            self.record(
+                f"{prefix} {response.request.method}",
+                time.perf_counter() - duration,
+                duration,
+                {"path": path, "status": response.status_code},
+            )
+
+        session.hooks["response"].append(hook)
+
+    def phase_table(self):
+        """Return the per-phase breakdown as a text table, slowest first."""
+        with self._lock:
+            phases = sorted(self.phases.items(), key=lambda p: -p[1]["total"])
+        if not phases:
+            return "No spans recorded."
+        width = max(len("Phase"), *(len(name) for name, _ in phases))
+        lines = [
+            f"{'Phase':<{width}}  {'Calls':>6}  {'Total s':>9}  "
+            f"{'Avg ms':>9}  {'Max ms':>9}",
+            "-" * (width + 45),
+        ]
+        for name, p in phases:
+            lines.append(
+                f"{name:<{width}}  {p['calls']:>6}  {p['total']:>9.2f}  "
+                f"{p['total'] / p['calls'] * 1000:>9.1f}  {p['max'] * 1000:>9.1f}"
+            )
+        return "\n".join(lines)
+
+    def write_chrome_trace(self, path):
+        """Write the kept spans as a Chrome trace (Trace Event Format)."""
+        pid = os.getpid()
+        with self._lock:
+            events = [
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "tid": tid,
+                    "args": {"name": thread_name},
+                }
+                for tid, thread_name in self.threads.items()
+            ]
+            for name, start, duration, tid, args in self.events:
+                event = {
+                    "name": name,
+                    "ph": "X",
+                    "ts": round(start * 1e6),
+                    "dur": round(duration * 1e6),
+                    "pid": pid,
+                    "tid": tid,
+                }
+                if args:
+                    event["args"] = args
+                events.append(event)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        os.replace(tmp_path, path)
+
+
+# Process-wide tracer used by the scripts
+TRACER = Tracer()
+span = TRACER.span
+traced = TRACER.traced